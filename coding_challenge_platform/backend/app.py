@@ -1,18 +1,41 @@
 import os
-import random
-import requests
-import difflib
+import hmac
+import json
+import atexit
+import time
+import tempfile
 from datetime import datetime
 
-from flask import Flask, jsonify, request, send_from_directory
+import click
+from flask import Flask, Response, g, jsonify, request, send_file, send_from_directory, stream_with_context
 from flask_cors import CORS
-from pymongo import MongoClient
-from openpyxl import load_workbook
+
+from storage import create_storage
+from question_bank import QuestionBank
+from mcq_grader import answers_list, regrade
+from code_bank import CodeBank
+from assets import AssetStore
+import metrics
+from profiler import SamplingProfiler
+from auth import SessionTokens, RevocationList, PasswordHasher, InvalidToken, HasherBusy, load_secret
+from executor import create_executor
+from judge_client import JudgeClient
+from judge_queue import JudgeQueue, QueueFull, FINISHED_STATES
+from scramble_scorer import score_scramble
+from leaderboard import Leaderboard
+from score_writer import ScoreWriter
+from events import EventLog
+from exports import SCORE_COLUMNS, SUBMISSION_COLUMNS, SUBMISSION_TREES, iter_csv, iter_ndjson, iter_zip
+from submission_catalog import SubmissionCatalog, FRONTEND, SCRAMBLE, DEBUG_CORRECT, DEBUG_WRONG
+from plagiarism import SimilarityIndex
+from chunked_upload import ChunkedUploads, UploadError
+from blob_store import BlobStore
 
 # =====================================================
 # APP INITIALIZATION (MUST BE FIRST)
 # =====================================================
-app = Flask(__name__, static_folder="../frontend", static_url_path="")
+# The frontend is served by the FRONTEND routes below, not Flask's static route
+app = Flask(__name__, static_folder=None)
 CORS(app)
 
 # =====================================================
@@ -22,24 +45,102 @@ UPLOAD_FOLDER = "uploads"
 ADMIN_USERNAME = "admin"
 ADMIN_PASSWORD = "adminpass"
 
+# "mongo" (MONGO_URI) or "sqlite" (a local file, for single-box / offline events)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "mongo")
 MONGO_URI = os.environ.get("MONGO_URI")
-mongo_client = MongoClient(MONGO_URI)
 DB_NAME = "coding_challenge"
-SCORES_COLLECTION_NAME = "scores"
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "coding_challenge.db")
+
+# Key that signs session tokens. wsgi.py and asgi.py (production) require
+# SESSION_SECRET; `python app.py` and the flask CLI fall back to a random key
+# kept in SESSION_SECRET_FILE, which must stay out of uploads/ and is hidden
+# from sandboxed code along with the project
+SESSION_SECRET = os.environ.get("SESSION_SECRET")
+SESSION_SECRET_REQUIRED = os.environ.get("SESSION_SECRET_REQUIRED", "0") == "1"
+SESSION_SECRET_FILE = os.path.abspath(os.environ.get("SESSION_SECRET_FILE") or os.path.join(
+    os.path.expanduser("~"), ".config", "coding-challenge-platform", "session_secret"))
 
 # =====================================================
 # DATABASE SETUP
 # =====================================================
 try:
-    mongo_client = MongoClient(MONGO_URI)
-    mongo_db = mongo_client[DB_NAME]
-    scores_collection = mongo_db[SCORES_COLLECTION_NAME]
-    users_collection = mongo_db["users"]
-    print("Successfully connected to MongoDB.")
+    if STORAGE_BACKEND == "sqlite":
+        storage = create_storage("sqlite", path=SQLITE_PATH)
+    else:
+        # One client, one connection pool for the whole process
+        storage = create_storage("mongo", uri=MONGO_URI, db_name=DB_NAME,
+                                 max_pool_size=int(os.environ.get("MONGO_MAX_POOL_SIZE", 100)),
+                                 min_pool_size=int(os.environ.get("MONGO_MIN_POOL_SIZE", 0)),
+                                 server_selection_timeout_ms=int(os.environ.get("MONGO_TIMEOUT_MS", 5000)),
+                                 connect_timeout_ms=int(os.environ.get("MONGO_TIMEOUT_MS", 5000)))
+    print(f"Using {storage.name} storage.")
+    # Every storage call is timed into ccp_storage_seconds{operation=<method>}
+    storage = metrics.instrument(storage, metrics.REGISTRY.histogram(
+        "ccp_storage_seconds", "Time spent in storage calls", ("operation",)))
 except Exception as e:
-    print("MongoDB connection error:", e)
-    scores_collection = None
-    users_collection = None
+    print("Storage setup error:", e)
+    storage = None
+
+# =====================================================
+# SHARED CACHES
+# =====================================================
+# Optional write-behind for score upserts: journaled locally, then sent to
+# storage in bulk batches every SCORE_FLUSH_INTERVAL seconds / SCORE_BATCH_SIZE writes
+SCORE_WRITE_BEHIND = os.environ.get("SCORE_WRITE_BEHIND", "0") == "1"
+score_writer = ScoreWriter(storage, os.path.join(UPLOAD_FOLDER, "score_journal"),
+                           max_batch=int(os.environ.get("SCORE_BATCH_SIZE", 200)),
+                           flush_interval=float(os.environ.get("SCORE_FLUSH_INTERVAL", 0.5))) if SCORE_WRITE_BEHIND else None
+if score_writer:
+    atexit.register(score_writer.close)
+
+leaderboard = Leaderboard(storage, max_age=int(os.environ.get("LEADERBOARD_MAX_AGE", 30)),
+                          unflushed=score_writer.unflushed if score_writer else None)
+# Submitted files are stored once per distinct content under uploads/blobs; the
+# catalog entry (listed under the usual uploads/... path) points at the blob
+blob_store = BlobStore(os.path.join(UPLOAD_FOLDER, "blobs"),
+                       grace_seconds=int(float(os.environ.get("BLOB_GC_GRACE_HOURS", 1)) * 3600))
+submission_catalog = SubmissionCatalog(storage, UPLOAD_FOLDER, blobs=blob_store)
+question_bank = QuestionBank(os.path.join(UPLOAD_FOLDER, "mcq", "questions.xlsx"), dumps=app.json.dumps)
+# Scramble/debug code files, with SCRAMBLE_VARIANTS pre-shuffled versions per scramble file
+CODE_ROUNDS = ("scramble", "debug")
+CODE_LANGUAGES = ("py", "c", "cpp", "java")
+code_bank = CodeBank(UPLOAD_FOLDER, scramble_variants=int(os.environ.get("SCRAMBLE_VARIANTS", 16)))
+
+def problem_base_texts(round_name, lang, problem):
+    # Code every student starts from: the problem file and its scramble variants
+    code_file = code_bank.get(round_name, lang, problem)
+    return (code_file.text, *code_file.variants) if code_file else ()
+
+# Near-duplicate scramble/debug submissions, clustered per problem for /admin/similar_submissions
+similarity_index = SimilarityIndex(storage, UPLOAD_FOLDER, base_texts=problem_base_texts,
+                                   threshold=float(os.environ.get("PLAGIARISM_THRESHOLD", 0.8)),
+                                   max_age=int(os.environ.get("PLAGIARISM_SYNC_SECONDS", 30)),
+                                   locate=submission_catalog.locate)
+# Fingerprinted, precompressed frontend files (built once into ASSET_BUILD_DIR);
+# ASSET_PIPELINE=0 serves frontend/ as-is, e.g. while editing it
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend")
+ASSET_PIPELINE = os.environ.get("ASSET_PIPELINE", "1") == "1"
+asset_store = AssetStore(FRONTEND_DIR, os.environ.get("ASSET_BUILD_DIR", os.path.join(FRONTEND_DIR, ".build")),
+                         max_image_width=int(os.environ.get("ASSET_MAX_IMAGE_WIDTH", 1920))) if ASSET_PIPELINE else None
+# Live score/submission deltas for the admin dashboard and projector screens,
+# shared by every worker through storage
+live_events = EventLog(storage, max_events=int(os.environ.get("LIVE_EVENTS_BUFFER", 5000)),
+                       poll_interval=float(os.environ.get("LIVE_EVENTS_POLL", 0.2)))
+# Score writes and resets from every worker reach this process's leaderboard copy
+live_events.add_listener(leaderboard.apply_events)
+
+# Upload size limits per round, enforced before a byte is stored; large
+# files go through the chunked /uploads API and can resume after a disconnect
+MB = 1024 * 1024
+ADMIN_ROUNDS = ("mcq", "scramble", "debug")
+UPLOAD_LIMITS = dict({r: int(float(os.environ.get("ADMIN_UPLOAD_MAX_MB", 20)) * MB) for r in ADMIN_ROUNDS},
+                     frontend=int(float(os.environ.get("FRONTEND_UPLOAD_MAX_MB", 50)) * MB))
+chunked_uploads = ChunkedUploads(os.path.join(UPLOAD_FOLDER, ".uploads"), UPLOAD_LIMITS,
+                                 quotas={"frontend": int(float(os.environ.get("FRONTEND_QUOTA_MB", 200)) * MB)},
+                                 chunk_size=int(float(os.environ.get("UPLOAD_CHUNK_MB", 4)) * MB),
+                                 ttl=int(float(os.environ.get("UPLOAD_RESUME_HOURS", 24)) * 3600))
+# No request body may be bigger than the largest file or chunk (plus multipart overhead)
+app.config["MAX_CONTENT_LENGTH"] = max(*UPLOAD_LIMITS.values(), chunked_uploads.chunk_size) + MB
 
 # =====================================================
 # INITIALIZE DIRECTORIES
@@ -57,131 +158,559 @@ def init_db():
     ]
     for folder in folders:
         os.makedirs(os.path.join(UPLOAD_FOLDER, folder), exist_ok=True)
+    # Older versions kept the signing key here, where submitted code could read it
+    legacy_secret = os.path.join(UPLOAD_FOLDER, ".session_secret")
+    if os.path.exists(legacy_secret):
+        os.remove(legacy_secret)
+        print(f"Removed {legacy_secret}: sessions signed with it are no longer valid")
+
+    # Indexes for the per-user score upserts and the admin submissions listing
+    try:
+        storage.ensure_indexes()
+    except Exception as e:
+        print("Could not create storage indexes:", e)
+
+def warm_caches():
+    """Load the question bank, code files and frontend build ahead of traffic."""
+    global asset_store
+    try:
+        question_bank.snapshot()
+    except FileNotFoundError:
+        pass  # no questions uploaded yet
+    except Exception as e:
+        print("Could not preload MCQ questions:", e)
+    try:
+        code_bank.warm(CODE_ROUNDS, CODE_LANGUAGES)
+    except Exception as e:
+        print("Could not preload code files:", e)
+    if asset_store:
+        try:
+            asset_store.load()
+        except Exception as e:
+            print("Asset pipeline unavailable, serving frontend/ as-is:", e)
+            asset_store = None
 
 # =====================================================
-# JUDGE0 HELPER
+# CODE EXECUTION
 # =====================================================
-def judge0_compile(source_code, language_id, stdin=""):
-    url = "https://ce.judge0.com/submissions/?base64_encoded=false&wait=true"
-    payload = {
-        "source_code": source_code,
-        "language_id": language_id,
-        "stdin": stdin
-    }
+# "judge0" posts to the public Judge0 API, "local" runs code in sandboxed
+# subprocesses on this machine (needs gcc/g++/javac installed)
+EXECUTOR_BACKEND = os.environ.get("EXECUTOR_BACKEND", "judge0")
+# The local executor's sandbox (see sandbox.py): "namespace" needs the server
+# to run as root; "none" leaves submitted code the server's own access
+SANDBOX = os.environ.get("SANDBOX", "namespace")
+SANDBOX_DIR = os.environ.get("SANDBOX_DIR", os.path.join(tempfile.gettempdir(), "ccp-sandbox"))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# What submitted code must not see: the project (code, uploads, question bank),
+# the database, the session secret and anything listed in SANDBOX_HIDE (os.pathsep separated)
+SANDBOX_HIDE = [PROJECT_ROOT, os.path.abspath(UPLOAD_FOLDER), os.path.dirname(SESSION_SECRET_FILE)]
+if STORAGE_BACKEND == "sqlite":
+    SANDBOX_HIDE.append(os.path.dirname(os.path.abspath(SQLITE_PATH)))
+SANDBOX_HIDE += [path for path in os.environ.get("SANDBOX_HIDE", "").split(os.pathsep) if path]
+EXECUTOR_WORKERS = int(os.environ.get("EXECUTOR_WORKERS", os.cpu_count() or 2))
+TEST_PARALLELISM = int(os.environ.get("TEST_PARALLELISM", 4))
+COMPILE_CACHE_MB = int(os.environ.get("COMPILE_CACHE_MB", 256))
+RESULT_CACHE_ENTRIES = int(os.environ.get("RESULT_CACHE_ENTRIES", 2048))
+
+judge_client = None
+if EXECUTOR_BACKEND == "local":
+    code_executor = create_executor("local", workers=EXECUTOR_WORKERS,
+                                    scratch_dir=SANDBOX_DIR,
+                                    sandbox=SANDBOX,
+                                    hide_paths=SANDBOX_HIDE,
+                                    uid_base=int(os.environ.get("SANDBOX_UID_BASE", 100000)),
+                                    python=os.environ.get("SANDBOX_PYTHON"),
+                                    cache_dir=os.path.join(UPLOAD_FOLDER, ".compile_cache"),
+                                    cache_max_bytes=COMPILE_CACHE_MB * 1024 * 1024,
+                                    result_cache_entries=RESULT_CACHE_ENTRIES,
+                                    test_parallelism=TEST_PARALLELISM)
+else:
+    # Any Judge0-compatible API works, e.g. a self-hosted Judge0 or
+    # benchmarks/fake_judge.py for load tests
+    judge_client = JudgeClient(
+        base_url=os.environ.get("JUDGE0_URL", "https://ce.judge0.com"),
+        auth_token=os.environ.get("JUDGE0_AUTH_TOKEN"),
+        max_concurrency=int(os.environ.get("JUDGE_MAX_CONCURRENCY", 32)),
+        rate_per_second=float(os.environ.get("JUDGE_RATE_LIMIT", 20)),
+        burst=int(os.environ.get("JUDGE_RATE_BURST", 0)) or None,
+        retries=int(os.environ.get("JUDGE_RETRIES", 3)),
+        read_timeout=float(os.environ.get("JUDGE_TIMEOUT", 15)),
+        failure_threshold=int(os.environ.get("JUDGE_BREAKER_FAILURES", 5)),
+        reset_seconds=float(os.environ.get("JUDGE_BREAKER_RESET", 30)))
+    code_executor = create_executor("judge0", client=judge_client, result_cache_entries=RESULT_CACHE_ENTRIES)
+
+# =====================================================
+# SCORE WRITES
+# =====================================================
+# Score fields worth pushing to live viewers (the rest stay in /admin/scores)
+LIVE_SCORE_FIELDS = ("score", "percentage", "total_questions", "similarity", "status",
+                     "tests_passed", "tests_total", "language", "remaining_time", "timestamp")
+
+def save_score(username, round_name, fields):
+    """Upsert a user's score for a round and keep the leaderboard in step."""
+    if score_writer:
+        score_writer.start()
+        score_writer.write(username, round_name, fields)
+    else:
+        storage.upsert_score(username, round_name, fields)
+    leaderboard.update(username, round_name, fields)
+
+    event = {"username": username, "round": round_name}
+    event.update({key: fields[key] for key in LIVE_SCORE_FIELDS if key in fields})
+    live_events.publish("score", event)
+
+def record_submission(username, round_label, path, data=None, **details):
+    """Store a submission's content (data, or a blob given as sha256/size) under path,
+    catalog it and announce it to live viewers."""
+    if data is not None:
+        entry = submission_catalog.save(username, round_label, path, data, **details)
+    else:
+        entry = submission_catalog.record(username, round_label, path, **details)
+    live_events.publish("submission", SubmissionCatalog.to_row(entry))
+
+def index_submission(username, round_name, lang, problem_path, path, code):
+    """Add a saved scramble/debug file to the similarity index."""
     try:
-        r = requests.post(url, json=payload, timeout=10)
-        if r.status_code in [200, 201]:
-            res = r.json()
-            return {
-                "stdout": res.get("stdout", ""),
-                "stderr": res.get("stderr", ""),
-                "status": res.get("status", {}).get("description", "")
-            }
-        return {"error": f"Judge0 error {r.status_code}"}
+        with metrics.timed("similarity_index_add"):
+            similarity_index.add(username, round_name, lang, os.path.basename(problem_path), path, code)
     except Exception as e:
-        return {"error": str(e)}
+        # Plagiarism checks are advisory: never fail the submission over them
+        print("Could not index submission:", e)
+
+# =====================================================
+# DEBUG SUBMISSION QUEUE
+# =====================================================
+JUDGE_WORKERS = int(os.environ.get("JUDGE_WORKERS", 4))
+JUDGE_MAX_PENDING = int(os.environ.get("JUDGE_MAX_PENDING", 1000))
+# Finished jobs (and their /submission_status) are kept this long
+JUDGE_JOB_TTL = int(os.environ.get("JUDGE_JOB_TTL", 86400))
+# Stop running a submission's test cases at the first failure (no partial score)
+JUDGE_EARLY_EXIT = os.environ.get("JUDGE_EARLY_EXIT", "0") == "1"
+
+def test_cases_folder(problem_path):
+    # uploads/debug/c/1.c -> uploads/debug/c/1.tests/
+    return os.path.splitext(problem_path)[0] + ".tests"
+
+def load_test_cases(problem_path):
+    folder = test_cases_folder(problem_path)
+    if not os.path.isdir(folder):
+        return []
+    names = sorted({os.path.splitext(f)[0] for f in os.listdir(folder) if f.endswith(".in")},
+                   key=lambda n: (len(n), n))
+    cases = []
+    for name in names:
+        expected_path = os.path.join(folder, f"{name}.out")
+        if not os.path.exists(expected_path):
+            continue
+        with open(os.path.join(folder, f"{name}.in"), "r", encoding="utf-8") as f:
+            stdin = f.read()
+        with open(expected_path, "r", encoding="utf-8") as f:
+            expected = f.read()
+        cases.append({"name": name, "input": stdin, "expected": expected})
+    return cases
+
+def judge_debug_submission(job, final_attempt):
+    student_code = job["code"]
+    lang = job["lang"]
+    username = job["username"]
+    file_path = job["file_path"]
+    submitted_at = datetime.fromisoformat(job["submitted_at"])
+
+    cases = load_test_cases(os.path.join(UPLOAD_FOLDER, file_path))
+    if cases:
+        # Compile once and run every test case against that build
+        judge_result = code_executor.run_tests(student_code, lang, cases, early_exit=JUDGE_EARLY_EXIT)
+    else:
+        # No test cases uploaded: just check that it compiles and runs cleanly
+        judge_result = code_executor.run(student_code, lang, "")
+    if judge_result.get("error") and not final_attempt:
+        # Judge unreachable: let the queue retry before marking it wrong
+        raise RuntimeError(judge_result["error"])
+
+    if cases:
+        is_correct = judge_result.get("status") == "Accepted"
+        score = judge_result.get("score", 0)
+    else:
+        is_correct = judge_result.get("status") == "Accepted" and not judge_result.get("stderr") and not judge_result.get("error")
+        # 100 if correct, 0 if wrong
+        score = 100 if is_correct else 0
+
+    # Listed under correct/wrong submissions
+    status_folder = "correct" if is_correct else "wrong"
+
+    # Get file extension
+    ext_map = {"py": ".py", "c": ".c", "cpp": ".cpp", "java": ".java"}
+    ext = ext_map.get(lang, ".txt")
+
+    # Save student code with username prefix (identical resubmissions share one blob)
+    filename = f"{username}_{os.path.basename(file_path).replace(ext, '')}_{submitted_at.strftime('%Y%m%d_%H%M%S')}{ext}"
+    record_submission(username, DEBUG_CORRECT if is_correct else DEBUG_WRONG,
+                      f"debug_submissions/{status_folder}/{lang}/{filename}", data=student_code, language=lang,
+                      remaining_time=job["remaining_time"], timestamp=submitted_at)
+    index_submission(username, "debug", lang, file_path, f"debug_submissions/{status_folder}/{lang}/{filename}",
+                     student_code)
+
+    # Save score
+    fields = {
+        "score": score,
+        "language": lang,
+        "file": file_path,
+        "status": status_folder,
+        "saved_file": filename,
+        "remaining_time": job["remaining_time"],
+        "timestamp": submitted_at
+    }
+    if cases:
+        fields["tests_passed"] = judge_result.get("passed", 0)
+        fields["tests_total"] = judge_result.get("total", len(cases))
+    save_score(username, "Debugging", fields)
+
+    result = {
+        "status": status_folder,
+        "score": score,
+        "filename": filename,
+        "judge_status": judge_result.get("status") or judge_result.get("error")
+    }
+    if cases:
+        result["tests"] = {key: judge_result.get(key) for key in ("passed", "total", "cases", "compile_output")}
+    return result
+
+judge_queue = JudgeQueue(os.path.join(UPLOAD_FOLDER, "judge_jobs"), judge_debug_submission,
+                         workers=JUDGE_WORKERS, max_pending=JUDGE_MAX_PENDING, finished_ttl=JUDGE_JOB_TTL)
+
+_services_pid = None
+
+def start_background_services():
+    """Start the threads and process pools this process serves with.
+
+    Must run in the serving process itself: after fork under gunicorn
+    (see gunicorn.conf.py), in the reloader child under the dev server,
+    from the lifespan under uvicorn. Only the first call in a process counts.
+    """
+    global _services_pid
+    if _services_pid == os.getpid():
+        return
+    _services_pid = os.getpid()
+    if EXECUTOR_BACKEND == "local":
+        code_executor.start()
+    judge_queue.start()
+    session_tokens.revocations.start()
+    leaderboard.start()
+    live_events.start()
+    if score_writer:
+        score_writer.start()
+    if METRICS_DIR:
+        metrics.REGISTRY.share(METRICS_DIR)
+    if request_profiler:
+        request_profiler.start()
 
 # =====================================================
 # FRONTEND
 # =====================================================
+def frontend_response(path):
+    global asset_store
+    found = None
+    if asset_store:
+        try:
+            found = asset_store.lookup(path, request.headers.get("Accept-Encoding", ""),
+                                       request.headers.get("Accept", ""))
+        except Exception as e:
+            # e.g. a read-only checkout: don't retry the build on every request
+            print("Asset pipeline unavailable, serving frontend/ as-is:", e)
+            asset_store = None
+    if found is None:
+        return send_from_directory(FRONTEND_DIR, path)
+
+    file_path, mimetype, etag, headers = found
+    response = send_file(file_path, mimetype=mimetype, etag=etag, conditional=True)
+    response.headers.update(headers)
+    return response
+
 @app.route("/")
 def index():
-    return send_from_directory("../frontend", "index.html")
+    return frontend_response("index.html")
 
 @app.route("/<path:path>")
 def serve_static(path):
-    return send_from_directory("../frontend", path)
+    return frontend_response(path)
+
+# =====================================================
+# HEALTH
+# =====================================================
+@app.route("/healthz")
+def healthz():
+    # Liveness: the process is up and answering
+    return jsonify({"status": "ok", "pid": os.getpid()})
+
+@app.route("/readyz")
+def readyz():
+    # Readiness: storage answers and submissions can be written
+    checks = {}
+    try:
+        storage.ping()
+        checks["storage"] = "ok"
+    except Exception as e:
+        checks["storage"] = f"error: {e}"
+    checks["uploads"] = "ok" if os.access(UPLOAD_FOLDER, os.W_OK) else "error: not writable"
+    ready = all(value == "ok" for value in checks.values())
+    return jsonify({"status": "ready" if ready else "not ready", "checks": checks}), 200 if ready else 503
+
+
+# =====================================================
+# METRICS AND PROFILING
+# =====================================================
+# Workers publish their metrics here so /metrics covers all of them ("" = this process only)
+METRICS_DIR = os.environ.get("METRICS_DIR", os.path.join(UPLOAD_FOLDER, ".metrics"))
+# /metrics needs an admin session, or "Authorization: Bearer <METRICS_TOKEN>" for the scraper
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+# PROFILE_SLOW_MS > 0 keeps a sampled stack profile of every request at least that slow
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", 0))
+request_profiler = SamplingProfiler(os.path.join(UPLOAD_FOLDER, ".profiles"), PROFILE_SLOW_MS / 1000,
+                                    interval=float(os.environ.get("PROFILE_INTERVAL_MS", 5)) / 1000,
+                                    keep=int(os.environ.get("PROFILE_KEEP", 50))) if PROFILE_SLOW_MS > 0 else None
+
+metrics.REGISTRY.add_stats("ccp_judge_queue", judge_queue.stats, "Debug submission queue (see /admin/judge_queue)")
+metrics.REGISTRY.add_stats("ccp_executor", code_executor.cache_stats, "Execution caches (see /admin/cache_stats)")
+metrics.REGISTRY.add_stats("ccp_leaderboard", leaderboard.stats, "Leaderboard copy and its background refresh")
+metrics.REGISTRY.add_stats("ccp_live_events", live_events.stats, "Live event buffer (see /admin/live_events_stats)")
+metrics.REGISTRY.add_stats("ccp_similarity_index", similarity_index.stats, "Plagiarism index (see /admin/similar_submissions)")
+metrics.REGISTRY.add_stats("ccp_chunked_uploads", chunked_uploads.stats, "Chunked, resumable uploads")
+metrics.REGISTRY.add_stats("ccp_blob_store", blob_store.stats, "Content-addressed submission files")
+if score_writer:
+    metrics.REGISTRY.add_stats("ccp_score_writer", score_writer.stats, "Write-behind buffer (see /admin/score_writer_stats)")
+if judge_client:
+    metrics.REGISTRY.add_stats("ccp_judge_client", lambda: {
+        **{k: v for k, v in judge_client.stats().items() if k in ("calls", "retries", "errors", "rejected")},
+        "breaker_open": int(judge_client.breaker.state != "closed"),
+    }, "Judge client calls and circuit breaker (see /admin/executor_stats)")
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if request_profiler:
+        request_profiler.begin()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        # The endpoint name, not the path, keeps the label set bounded
+        endpoint = request.endpoint or "unmatched"
+        metrics.observe_request(request.method, endpoint, response.status_code, elapsed)
+        if request_profiler:
+            saved = request_profiler.end(endpoint, elapsed)
+            if saved:
+                print(f"Slow request {request.method} {request.path} ({elapsed * 1000:.0f} ms), profile: {saved}")
+    return response
+
+@app.route("/metrics")
+def get_metrics():
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route("/admin/profiles")
+def list_profiles():
+    # Download one with /admin/file_content?path=.profiles/<name>
+    if not request_profiler:
+        return jsonify({"enabled": False, "profiles": []})
+    return jsonify({"enabled": True, "threshold_ms": PROFILE_SLOW_MS, "profiles": request_profiler.list()})
 
 # =====================================================
 # AUTH
 # =====================================================
+# Login returns a signed session token (see auth.py), also set as the
+# SESSION_COOKIE cookie for the browser; API clients send it as
+# "Authorization: Bearer <token>". Verifying one needs no storage call.
+SESSION_COOKIE = "ccp_session"
+SESSION_TTL = int(float(os.environ.get("SESSION_TTL_HOURS", 8)) * 3600)
+
+def session_secret():
+    if SESSION_SECRET:
+        return SESSION_SECRET.encode("utf-8")
+    if SESSION_SECRET_REQUIRED:
+        raise RuntimeError("SESSION_SECRET is not set: production servers need the same random value on every "
+                           "instance (e.g. python -c 'import secrets; print(secrets.token_urlsafe(32))')")
+    upload_root = os.path.abspath(UPLOAD_FOLDER)
+    if os.path.commonpath([SESSION_SECRET_FILE, upload_root]) == upload_root:
+        raise RuntimeError(f"SESSION_SECRET_FILE must be outside {upload_root}")
+    print(f"SESSION_SECRET not set: using the development key in {SESSION_SECRET_FILE}")
+    return load_secret(SESSION_SECRET_FILE)
+
+session_tokens = SessionTokens(
+    session_secret(),
+    ttl=SESSION_TTL,
+    revocations=RevocationList(storage, refresh_seconds=float(os.environ.get("SESSION_REVOCATION_REFRESH", 5))),
+    cache_entries=int(os.environ.get("SESSION_CACHE_ENTRIES", 10000)))
+# Password hashing runs on PASSWORD_HASH_WORKERS threads (default: one per core);
+# beyond LOGIN_MAX_PENDING waiting logins, new ones get a 503
+password_hasher = PasswordHasher(workers=int(os.environ.get("PASSWORD_HASH_WORKERS", 0)) or None,
+                                 max_pending=int(os.environ.get("LOGIN_MAX_PENDING", 256)),
+                                 iterations=int(os.environ.get("PASSWORD_HASH_ITERATIONS", 200000)))
+
+# Reachable without a session; /admin* needs an admin one, everything else any
+PUBLIC_ENDPOINTS = {"index", "serve_static", "healthz", "readyz", "get_leaderboard",
+                    "admin_login", "student_signup", "student_login", "logout"}
+# Admin-only endpoints outside /admin
+ADMIN_ENDPOINTS = {"admin_upload", "get_metrics"}
+
+def is_metrics_scraper(authorization):
+    return bool(METRICS_TOKEN) and hmac.compare_digest((authorization or "").encode("utf-8"),
+                                                       f"Bearer {METRICS_TOKEN}".encode("utf-8"))
+
+def session_from(authorization, cookie):
+    """Claims of the request's session token (header first, then cookie), or None."""
+    token = cookie
+    if authorization and authorization[:7].lower() == "bearer ":
+        token = authorization[7:].strip()
+    if not token:
+        return None
+    try:
+        return session_tokens.verify(token)
+    except InvalidToken:
+        return None
+
+def acting_username(session, requested=None):
+    """Whose data a request is about: the signed-in student; admins may name anyone."""
+    if session["role"] == "admin" and requested:
+        return requested
+    return session["sub"]
+
+def session_username(requested=None):
+    return acting_username(g.session, requested)
+
+@app.before_request
+def authenticate():
+    if request.endpoint is None or request.endpoint in PUBLIC_ENDPOINTS or request.method == "OPTIONS":
+        return None
+    if request.endpoint == "get_metrics" and is_metrics_scraper(request.headers.get("Authorization")):
+        return None
+    session = session_from(request.headers.get("Authorization"), request.cookies.get(SESSION_COOKIE))
+    if session is None:
+        return jsonify({"error": "Login required"}), 401
+    if (request.path.startswith("/admin") or request.endpoint in ADMIN_ENDPOINTS) and session["role"] != "admin":
+        return jsonify({"error": "Admins only"}), 403
+    g.session = session
+
+def session_response(username, role, message):
+    token, claims = session_tokens.issue(username, role)
+    response = jsonify({"message": message, "token": token, "username": username, "role": role,
+                        "expires_at": claims["exp"]})
+    response.set_cookie(SESSION_COOKIE, token, max_age=SESSION_TTL, httponly=True, samesite="Strict",
+                        secure=request.is_secure)
+    return response
+
+def login_busy_response():
+    response = jsonify({"message": "Too many logins at once, please retry in a few seconds"})
+    response.headers["Retry-After"] = "2"
+    return response, 503
+
 @app.route("/admin_login", methods=["POST"])
 def admin_login():
     data = request.get_json()
-    if data.get("username") == ADMIN_USERNAME and data.get("password") == ADMIN_PASSWORD:
-        return jsonify({"message": "Admin login successful"}), 200
+    if hmac.compare_digest(str(data.get("username")), ADMIN_USERNAME) and \
+            hmac.compare_digest(str(data.get("password")), ADMIN_PASSWORD):
+        return session_response(ADMIN_USERNAME, "admin", "Admin login successful")
     return jsonify({"message": "Invalid credentials"}), 401
 
 @app.route("/student_signup", methods=["POST"])
 def student_signup():
     data = request.get_json()
-    if users_collection.find_one({"username": data["username"]}):
-        return jsonify({"message": "User exists"}), 400
-    users_collection.insert_one({
+    if not data.get("username") or not data.get("password"):
+        return jsonify({"message": "Username and password are required"}), 400
+    try:
+        password_hash = password_hasher.hash(data["password"])
+    except HasherBusy:
+        return login_busy_response()
+    created = storage.create_user({
         "username": data["username"],
-        "password": data["password"],
+        "password_hash": password_hash,
         "role": "student",
         "created_at": datetime.now()
     })
+    if not created:
+        return jsonify({"message": "User exists"}), 400
     return jsonify({"message": "Signup successful"}), 201
 
 @app.route("/student_login", methods=["POST"])
 def student_login():
     data = request.get_json()
-    user = users_collection.find_one({"username": data["username"], "role": "student"})
-    if user and user["password"] == data["password"]:
-        return jsonify({"message": "Login successful"}), 200
-    return jsonify({"message": "Invalid login"}), 401
+    username, password = data.get("username"), data.get("password")
+    if not username or not isinstance(password, str):
+        return jsonify({"message": "Invalid login"}), 401
+    user = storage.get_user(username, role="student")
+    try:
+        matches, upgraded_hash = password_hasher.check(password, user)
+    except HasherBusy:
+        return login_busy_response()
+    if not matches:
+        return jsonify({"message": "Invalid login"}), 401
+    if upgraded_hash:
+        # Account from before passwords were hashed: replace the plain text
+        storage.update_user(username, {"password_hash": upgraded_hash}, unset=("password",))
+    return session_response(username, "student", "Login successful")
+
+@app.route("/logout", methods=["POST"])
+def logout():
+    session = session_from(request.headers.get("Authorization"), request.cookies.get(SESSION_COOKIE))
+    if session:
+        session_tokens.revoke(session)
+    response = jsonify({"message": "Logged out"})
+    response.delete_cookie(SESSION_COOKIE)
+    return response
+
+metrics.REGISTRY.add_stats("ccp_sessions", session_tokens.stats, "Session token verification and revocations")
+metrics.REGISTRY.add_stats("ccp_password_hasher", password_hasher.stats, "Password hashing pool")
 
 # =====================================================
 # ROUND 1 – MCQ
 # =====================================================
 @app.route("/get_mcq_questions")
 def get_mcq_questions():
-    file_path = os.path.join(UPLOAD_FOLDER, "mcq", "questions.xlsx")
-    if not os.path.exists(file_path):
-        return jsonify({"error": "questions.xlsx missing"}), 404
-
+    # Without correct_answer: answers are graded by /submit_mcq_score
     try:
-        wb = load_workbook(file_path)
-        ws = wb.active
-        raw_headers = [cell.value for cell in ws[1]]
-        
-        # Normalize headers to expected format
-        header_map = {}
-        for i, header in enumerate(raw_headers):
-            if header:
-                h = str(header).strip().lower()
-                if 'id' in h or 'question_id' in h or 'q_id' in h:
-                    header_map[i] = 'id'
-                elif 'question' in h and 'text' in h:
-                    header_map[i] = 'question_text'
-                elif 'question' in h:
-                    header_map[i] = 'question_text'
-                elif 'option' in h and 'a' in h:
-                    header_map[i] = 'optionA'
-                elif 'option' in h and 'b' in h:
-                    header_map[i] = 'optionB'
-                elif 'option' in h and 'c' in h:
-                    header_map[i] = 'optionC'
-                elif 'option' in h and 'd' in h:
-                    header_map[i] = 'optionD'
-                elif 'correct' in h or 'answer' in h:
-                    header_map[i] = 'correct_answer'
-                else:
-                    header_map[i] = header
-        
-        questions = []
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            if any(row):  # Skip empty rows
-                question = {}
-                for i, value in enumerate(row):
-                    if i in header_map:
-                        question[header_map[i]] = value
-                
-                # Ensure required fields exist
-                if 'question_text' in question and question['question_text']:
-                    if 'id' not in question:
-                        question['id'] = len(questions) + 1
-                    questions.append(question)
-        
-        return jsonify(questions)
+        digest, body = question_bank.student_snapshot()
+    except FileNotFoundError:
+        return jsonify({"error": "questions.xlsx missing"}), 404
     except Exception as e:
         return jsonify({"error": f"Error reading Excel file: {str(e)}"}), 500
 
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(digest)
+    return response.make_conditional(request)
+
 # =====================================================
 # ADMIN FILE UPLOAD
 # =====================================================
+def admin_file_destination(round_type, lang, filename, problem=None):
+    """Where an admin upload is saved (None: the MCQ workbook); raises UploadError."""
+    filename = os.path.basename(filename or "")
+    if not filename:
+        raise UploadError("No file provided")
+    if round_type == "mcq":
+        if not filename.endswith(".xlsx"):
+            raise UploadError("MCQ file must be .xlsx")
+        return None
+    # Debug round test cases: <n>.in / <n>.out for a problem file
+    if round_type == "debug" and os.path.splitext(filename)[1] in [".in", ".out"]:
+        if not problem:
+            raise UploadError("Test case uploads need the problem file name")
+        return os.path.join(test_cases_folder(os.path.join(UPLOAD_FOLDER, "debug", lang, os.path.basename(problem))),
+                            filename)
+    # Code rounds keep the original filename (and extension)
+    if round_type in CODE_ROUNDS and lang in CODE_LANGUAGES:
+        return os.path.join(UPLOAD_FOLDER, round_type, lang, filename)
+    raise UploadError("Invalid round type")
+
+def admin_file_saved(round_type, lang, destination):
+    """Success message once an admin upload is in place."""
+    if round_type == "mcq":
+        return "MCQ file uploaded successfully"
+    if round_type == "debug" and os.path.splitext(destination)[1] in [".in", ".out"]:
+        return "Test case uploaded successfully"
+    # Replacing an existing file leaves the folder mtime alone
+    code_bank.touch(round_type, lang)
+    return f"{round_type.capitalize()} code uploaded successfully"
+
 @app.route("/admin_upload", methods=["POST"])
 def admin_upload():
     try:
@@ -191,106 +720,80 @@ def admin_upload():
         
         if not file:
             return jsonify({"message": "No file provided"}), 400
+        destination = admin_file_destination(round_type, lang, file.filename, request.form.get("problem"))
+        file.seek(0, os.SEEK_END)
+        chunked_uploads.check_size(round_type, file.tell())
+        file.seek(0)
         
-        # Handle MCQ upload
-        if round_type == "mcq":
-            if not file.filename.endswith(".xlsx"):
-                return jsonify({"message": "MCQ file must be .xlsx"}), 400
-            save_path = os.path.join(UPLOAD_FOLDER, "mcq", "questions.xlsx")
-            file.save(save_path)
-            return jsonify({"message": "MCQ file uploaded successfully"}), 200
-        
-        # Handle code rounds (scramble/debug)
-        elif round_type in ["scramble", "debug"]:
-            # Get file extension from uploaded file
-            ext = os.path.splitext(file.filename)[1]
-            if not ext:
-                # Fallback to lang if no extension
-                ext_map = {"py": ".py", "c": ".c", "cpp": ".cpp", "java": ".java"}
-                ext = ext_map.get(lang, ".txt")
-            
-            # Create directory if needed
-            folder = os.path.join(UPLOAD_FOLDER, round_type, lang)
-            os.makedirs(folder, exist_ok=True)
-            
-            # Save with original filename (preserving extension)
-            save_path = os.path.join(folder, file.filename)
-            file.save(save_path)
-            return jsonify({"message": f"{round_type.capitalize()} code uploaded successfully"}), 200
-        
-        return jsonify({"message": "Invalid round type"}), 400
+        if destination is None:
+            question_bank.replace(file)
+        else:
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            file.save(destination)
+        return jsonify({"message": admin_file_saved(round_type, lang, destination)}), 200
         
+    except UploadError as e:
+        return jsonify({"message": str(e), **e.details}), e.status
     except Exception as e:
         return jsonify({"message": f"Upload error: {str(e)}"}), 500
 
 # =====================================================
 # GET CODE FILE LISTS
 # =====================================================
+def code_list_response(round_type, lang):
+    response = jsonify(code_bank.list_files(round_type, lang))
+    response.set_etag(code_bank.listing_etag(round_type, lang))
+    return response.make_conditional(request)
+
 @app.route("/get_scrambled_code_list")
 def get_scrambled_code_list():
-    lang = request.args.get("lang", "py")
-    folder = os.path.join(UPLOAD_FOLDER, "scramble", lang)
-    if not os.path.exists(folder):
-        return jsonify([])
-    files = [f for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f))]
-    return jsonify(files)
+    return code_list_response("scramble", request.args.get("lang", "py"))
 
 @app.route("/get_buggy_code_list")
 def get_buggy_code_list():
-    lang = request.args.get("lang", "py")
-    folder = os.path.join(UPLOAD_FOLDER, "debug", lang)
-    if not os.path.exists(folder):
-        return jsonify([])
-    files = [f for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f))]
-    return jsonify(files)
+    return code_list_response("debug", request.args.get("lang", "py"))
 
 @app.route("/admin/code_questions")
 def admin_code_questions():
     round_type = request.args.get("round")
-    lang = request.args.get("lang", "py")
-    folder = os.path.join(UPLOAD_FOLDER, round_type, lang)
-    if not os.path.exists(folder):
+    if round_type not in CODE_ROUNDS:
         return jsonify([])
-    files = [f for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f))]
-    return jsonify(files)
+    return code_list_response(round_type, request.args.get("lang", "py"))
 
 # =====================================================
 # GET CODE FILE CONTENT
 # =====================================================
+def scrambled_code_payload(code_file, username):
+    """(body, etag) for one user's scramble of code_file.
+
+    The same user always gets the same variant, so a refresh does not
+    reshuffle the lines under them.
+    """
+    index = code_file.variant_for(username)
+    return {"scrambled": code_file.variant(index)}, f"{code_file.digest[:32]}-{index}"
+
+def buggy_code_payload(code_file):
+    return {"code": code_file.text}, code_file.digest[:32]
+
+def code_file_response(payload):
+    body, etag = payload
+    response = jsonify(body)
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
 @app.route("/get_scrambled_code")
 def get_scrambled_code():
-    lang = request.args.get("lang", "py")
-    filename = request.args.get("file")
-    file_path = os.path.join(UPLOAD_FOLDER, "scramble", lang, filename)
-    
-    if not os.path.exists(file_path):
+    code_file = code_bank.get("scramble", request.args.get("lang", "py"), request.args.get("file"))
+    if code_file is None:
         return jsonify({"error": "File not found"}), 404
-    
-    with open(file_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-    
-    # Scramble the lines
-    scrambled = lines.copy()
-    random.shuffle(scrambled)
-    
-    return jsonify({
-        "original": "".join(lines),
-        "scrambled": "".join(scrambled)
-    })
+    return code_file_response(scrambled_code_payload(code_file, session_username(request.args.get("username"))))
 
 @app.route("/get_buggy_code")
 def get_buggy_code():
-    lang = request.args.get("lang", "py")
-    filename = request.args.get("file")
-    file_path = os.path.join(UPLOAD_FOLDER, "debug", lang, filename)
-    
-    if not os.path.exists(file_path):
+    code_file = code_bank.get("debug", request.args.get("lang", "py"), request.args.get("file"))
+    if code_file is None:
         return jsonify({"error": "File not found"}), 404
-    
-    with open(file_path, "r", encoding="utf-8") as f:
-        code = f.read()
-    
-    return jsonify({"code": code})
+    return code_file_response(buggy_code_payload(code_file))
 
 @app.route("/admin/file_content")
 def admin_file_content():
@@ -312,16 +815,21 @@ def admin_file_content():
 def submit_mcq_score():
     try:
         data = request.get_json()
-        scores_collection.update_one(
-            {"username": data["username"], "round": "MCQ"},
-            {"$set": {
-                "score": data["score"],
-                "percentage": data.get("percentage", 0),
-                "total_questions": data.get("total_questions", 10),
-                "timestamp": datetime.now()
-            }},
-            upsert=True
-        )
+        username = session_username(data.get("username"))
+        try:
+            answers = answers_list(data.get("answers"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        try:
+            key = question_bank.answer_key()
+        except FileNotFoundError:
+            return jsonify({"error": "questions.xlsx missing"}), 404
+
+        # Graded here from the raw answers, which are kept for /admin/mcq/regrade
+        fields = key.grade(answers)
+        fields["answers"] = answers
+        fields["timestamp"] = datetime.now()
+        save_score(username, "MCQ", fields)
         return jsonify({"message": "Score saved"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -332,7 +840,7 @@ def submit_scrambled_code():
         data = request.get_json()
         student_code = data.get("code", "")
         lang = data.get("lang", "py")
-        username = data.get("username")
+        username = session_username(data.get("username"))
         file_path = data.get("file_path")
         remaining_time = data.get("remaining_time", 0)  # Time remaining when submitted
         
@@ -344,39 +852,33 @@ def submit_scrambled_code():
         with open(original_path, "r", encoding="utf-8") as f:
             original_code = f.read()
         
-        # Calculate similarity
-        similarity = difflib.SequenceMatcher(None, original_code, student_code).ratio()
+        # Score line order (whitespace-insensitive), O(n log n) in lines
+        with metrics.timed("scramble_score"):
+            result = score_scramble(original_code, student_code)
+        similarity = result["similarity"]
         score = int(similarity * 100)
         
-        # Create folders for scramble submissions
-        save_folder = os.path.join(UPLOAD_FOLDER, "scramble_submissions", lang)
-        os.makedirs(save_folder, exist_ok=True)
-        
         # Get file extension
         ext_map = {"py": ".py", "c": ".c", "cpp": ".cpp", "java": ".java"}
         ext = ext_map.get(lang, ".txt")
         
-        # Save student code with username prefix
+        # Save student code with username prefix (identical resubmissions share one blob)
         filename = f"{username}_{os.path.basename(file_path).replace(ext, '')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{ext}"
-        save_path = os.path.join(save_folder, filename)
-        
-        with open(save_path, "w", encoding="utf-8") as f:
-            f.write(student_code)
+        record_submission(username, SCRAMBLE, f"scramble_submissions/{lang}/{filename}", data=student_code,
+                          language=lang, remaining_time=remaining_time)
+        index_submission(username, "scramble", lang, file_path, f"scramble_submissions/{lang}/{filename}",
+                         student_code)
         
         # Save score
-        scores_collection.update_one(
-            {"username": username, "round": "Scramble"},
-            {"$set": {
-                "score": score,
-                "language": lang,
-                "file": file_path,
-                "saved_file": filename,
-                "similarity": f"{similarity:.2%}",
-                "remaining_time": remaining_time,
-                "timestamp": datetime.now()
-            }},
-            upsert=True
-        )
+        save_score(username, "Scramble", {
+            "score": score,
+            "language": lang,
+            "file": file_path,
+            "saved_file": filename,
+            "similarity": f"{similarity:.2%}",
+            "remaining_time": remaining_time,
+            "timestamp": datetime.now()
+        })
         
         return jsonify({
             "message": "Code submitted successfully",
@@ -386,85 +888,163 @@ def submit_scrambled_code():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def enqueue_debug_submission(data, username):
+    judge_queue.start()
+    return judge_queue.submit({
+        "code": data.get("code", ""),
+        "lang": data.get("lang", "py"),
+        "username": username,
+        "file_path": data.get("file_path"),
+        "remaining_time": data.get("remaining_time", 0),  # Time remaining when submitted
+        "submitted_at": datetime.now().isoformat()
+    }, owner=username)
+
+def job_owner(session):
+    """Whose jobs a session may follow: its own, or (None) any for admins."""
+    return None if session["role"] == "admin" else session["sub"]
+
+def queued_response(job_id):
+    return {
+        "message": "Code submitted successfully",
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/submission_status/{job_id}"
+    }
+
 @app.route("/submit_debug_code", methods=["POST"])
 def submit_debug_code():
     try:
         data = request.get_json()
-        student_code = data.get("code", "")
-        lang = data.get("lang", "py")
-        username = data.get("username")
-        file_path = data.get("file_path")
-        remaining_time = data.get("remaining_time", 0)  # Time remaining when submitted
-        
-        # Test the code with Judge0 to see if it compiles and runs correctly
-        lang_map = {"py": 71, "c": 50, "cpp": 54, "java": 62}
-        compile_result = judge0_compile(student_code, lang_map.get(lang, 71), "")
-        
-        # Determine if code is correct based on compilation
-        is_correct = False
-        if compile_result.get("status") == "Accepted" and not compile_result.get("stderr") and not compile_result.get("error"):
-            is_correct = True
-        
-        # Create folders for correct/wrong submissions
-        status_folder = "correct" if is_correct else "wrong"
-        save_folder = os.path.join(UPLOAD_FOLDER, "debug_submissions", status_folder, lang)
-        os.makedirs(save_folder, exist_ok=True)
-        
-        # Get file extension
-        ext_map = {"py": ".py", "c": ".c", "cpp": ".cpp", "java": ".java"}
-        ext = ext_map.get(lang, ".txt")
-        
-        # Save student code with username prefix
-        filename = f"{username}_{os.path.basename(file_path).replace(ext, '')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{ext}"
-        save_path = os.path.join(save_folder, filename)
-        
-        with open(save_path, "w", encoding="utf-8") as f:
-            f.write(student_code)
-        
-        # Save score - 100 if correct, 0 if wrong
-        score = 100 if is_correct else 0
-        scores_collection.update_one(
-            {"username": username, "round": "Debugging"},
-            {"$set": {
-                "score": score,
-                "language": lang,
-                "file": file_path,
-                "status": status_folder,
-                "saved_file": filename,
-                "remaining_time": remaining_time,
-                "timestamp": datetime.now()
-            }},
-            upsert=True
-        )
-        
-        return jsonify({
-            "message": "Code submitted successfully",
-            "status": status_folder,
-            "filename": filename
-        }), 200
+        job_id = enqueue_debug_submission(data, session_username(data.get("username")))
+        return jsonify(queued_response(job_id)), 202
         
+    except QueueFull as e:
+        response = jsonify({"error": f"Judge is busy, please resubmit shortly ({e})"})
+        response.headers["Retry-After"] = "5"
+        return response, 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route("/submit_frontend", methods=["POST"])
 def submit_frontend():
     try:
+        username = session_username(request.form.get("username"))
+        # Refuse oversized bodies from the Content-Length, before the multipart body is read
+        if request.content_length:
+            chunked_uploads.check_size("frontend", request.content_length, username, frontend_bytes_stored(username))
         file = request.files.get("file")
-        username = request.form.get("username")
         
         if not file or not username:
             return jsonify({"message": "Missing file or username"}), 400
+        filename = os.path.basename(file.filename)
         
-        # Create user folder
-        user_folder = os.path.join(UPLOAD_FOLDER, "frontend_submissions", username)
-        os.makedirs(user_folder, exist_ok=True)
-        
-        # Save file
-        save_path = os.path.join(user_folder, file.filename)
-        file.save(save_path)
+        record_submission(username, FRONTEND, f"frontend_submissions/{username}/{filename}", data=file.stream)
         
         return jsonify({"message": "File uploaded successfully"}), 200
         
+    except UploadError as e:
+        return jsonify({"message": str(e), **e.details}), e.status
+    except Exception as e:
+        return jsonify({"message": f"Upload error: {str(e)}"}), 500
+
+def frontend_bytes_stored(username, replacing=None):
+    """Size of a student's frontend files, except the one an upload would replace."""
+    docs, _ = storage.query_submissions(round_contains=FRONTEND, username=username)
+    return sum(doc.get("size") or 0 for doc in docs if doc.get("filename") != replacing)
+
+# =====================================================
+# CHUNKED UPLOADS
+# =====================================================
+# POST /uploads opens an upload, PUT /uploads/<id>?offset=N sends the next
+# chunk as the raw body, GET /uploads/<id> tells a reconnecting client where
+# to resume, POST /uploads/<id>/complete moves the file into place.
+def upload_error_response(e):
+    return jsonify({"message": str(e), **e.details}), e.status
+
+@app.route("/uploads", methods=["POST"])
+def start_upload():
+    data = request.get_json()
+    round_type = data.get("round")
+    filename = os.path.basename(data.get("filename") or "")
+    try:
+        if round_type == "frontend":
+            username = session_username(data.get("username"))
+            if not filename:
+                raise UploadError("No file provided")
+            fields = {"username": username}
+            stored = frontend_bytes_stored(username, replacing=filename)
+        elif round_type in ADMIN_ROUNDS:
+            if g.session["role"] != "admin":
+                return jsonify({"error": "Admins only"}), 403
+            fields = {"lang": data.get("lang", "py"), "problem": data.get("problem")}
+            # Reject a bad name or round now rather than after the upload
+            admin_file_destination(round_type, fields["lang"], filename, fields["problem"])
+            stored = 0
+        else:
+            raise UploadError("Invalid round type")
+        upload = chunked_uploads.start(g.session["sub"], round_type, filename, data.get("size"), fields=fields,
+                                       sha256=data.get("sha256"), stored=stored)
+        return jsonify(upload), 201
+    except UploadError as e:
+        return upload_error_response(e)
+
+@app.route("/uploads/<upload_id>", methods=["GET"])
+def upload_status(upload_id):
+    try:
+        return jsonify(chunked_uploads.status(upload_id, g.session["sub"]))
+    except UploadError as e:
+        return upload_error_response(e)
+
+@app.route("/uploads/<upload_id>", methods=["PUT"])
+def upload_chunk(upload_id):
+    try:
+        offset = int(request.args.get("offset", ""))
+    except ValueError:
+        return jsonify({"message": "offset is required"}), 400
+    try:
+        with metrics.timed("upload_chunk"):
+            state = chunked_uploads.write(upload_id, g.session["sub"], offset, request.stream,
+                                          length=request.content_length)
+        return jsonify(state)
+    except UploadError as e:
+        return upload_error_response(e)
+
+@app.route("/uploads/<upload_id>", methods=["DELETE"])
+def cancel_upload(upload_id):
+    try:
+        chunked_uploads.cancel(upload_id, g.session["sub"])
+        return jsonify({"message": "Upload cancelled"})
+    except UploadError as e:
+        return upload_error_response(e)
+
+@app.route("/uploads/<upload_id>/complete", methods=["POST"])
+def complete_upload(upload_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        upload = chunked_uploads.get(upload_id, g.session["sub"])
+        round_type, fields, filename = upload["round"], upload["fields"], upload["filename"]
+        if round_type == "frontend":
+            username = fields["username"]
+            _, digest = chunked_uploads.finish(upload_id, g.session["sub"], sha256=data.get("sha256"))
+            try:
+                blob_store.put_file(chunked_uploads.part_path(upload_id), digest)
+            finally:
+                chunked_uploads.discard(upload_id)
+            record_submission(username, FRONTEND, f"frontend_submissions/{username}/{filename}",
+                              sha256=digest, size=upload["size"])
+            message = "File uploaded successfully"
+        else:
+            destination = admin_file_destination(round_type, fields["lang"], filename, fields["problem"])
+            _, digest = chunked_uploads.finish(upload_id, g.session["sub"], destination, sha256=data.get("sha256"))
+            if destination is None:
+                try:
+                    question_bank.replace(chunked_uploads.part_path(upload_id))
+                finally:
+                    chunked_uploads.discard(upload_id)
+            message = admin_file_saved(round_type, fields["lang"], destination)
+        return jsonify({"message": message, "filename": filename, "size": upload["size"], "sha256": digest})
+    except UploadError as e:
+        return upload_error_response(e)
     except Exception as e:
         return jsonify({"message": f"Upload error: {str(e)}"}), 500
 
@@ -474,197 +1054,227 @@ def submit_frontend():
 @app.route("/check_debug_code", methods=["POST"])
 def check_debug_code():
     data = request.get_json()
-    lang_map = {"py": 71, "c": 50, "cpp": 54, "java": 62}
-    result = judge0_compile(
+    result = code_executor.run(
         data.get("code"),
-        lang_map.get(data.get("lang", "py"), 71),
+        data.get("lang", "py"),
         data.get("input", "")
     )
     return jsonify(result)
 
+@app.route("/submission_status/<job_id>")
+def submission_status(job_id):
+    status = judge_queue.status(job_id, job_owner(g.session))
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(status)
+
+@app.route("/submission_status/<job_id>/stream")
+def submission_status_stream(job_id):
+    if judge_queue.status(job_id, job_owner(g.session)) is None:
+        return jsonify({"error": "Unknown job"}), 404
+
+    def events():
+        last_state = None
+        deadline = time.monotonic() + 120
+        while time.monotonic() < deadline:
+            status = judge_queue.wait_for_change(job_id, last_state, timeout=15)
+            if status is None:
+                return
+            if status["state"] == last_state:
+                yield ": keep-alive\n\n"
+                continue
+            last_state = status["state"]
+            yield f"event: {last_state}\ndata: {json.dumps(status)}\n\n"
+            if last_state in FINISHED_STATES:
+                return
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # =====================================================
 # STUDENT SCORES
 # =====================================================
 @app.route("/student/scores")
 def get_student_scores():
-    username = request.args.get("username")
-    if not username:
-        return jsonify({"error": "Username required"}), 400
+    username = session_username(request.args.get("username"))
     
-    scores = list(scores_collection.find({"username": username}, {"_id": 0}))
+    writes = score_writer.unflushed(username) if score_writer else None
+    scores = list(storage.find_scores(username=username))
+    if score_writer:
+        scores = score_writer.overlay(scores, writes)
     return jsonify(scores)
 
+# =====================================================
+# LEADERBOARD
+# =====================================================
+@app.route("/leaderboard")
+def get_leaderboard():
+    limit = min(max(request.args.get("limit", 10, type=int), 1), 500)
+    return jsonify(leaderboard.top(limit))
+
+@app.route("/leaderboard/rank")
+def get_leaderboard_rank():
+    username = session_username(request.args.get("username"))
+    row = leaderboard.rank(username)
+    if row is None:
+        return jsonify({"error": "No scores for this user"}), 404
+    row["participants"] = len(leaderboard)
+    return jsonify(row)
+
+@app.route("/admin/leaderboard/rebuild", methods=["POST"])
+def rebuild_leaderboard():
+    with metrics.timed("leaderboard_rebuild"):
+        count = leaderboard.rebuild()
+    return jsonify({"message": "Leaderboard rebuilt", "participants": count}), 200
+
+# =====================================================
+# LIVE EVENTS
+# =====================================================
+# Viewers resume with Last-Event-ID (sent automatically by EventSource on
+# reconnect) or ?since=<event id>, and only receive what they missed, from
+# whichever worker they reconnect to. In production asgi.py serves the
+# stream on the event loop; this route holds a thread (or a greenlet under
+# gevent) per open stream, which is fine for the dev server.
+LIVE_STREAM_SECONDS = int(os.environ.get("LIVE_STREAM_SECONDS", 300))
+
+def sse_message(event_id, event_type, data):
+    return f"id: {event_id}\nevent: {event_type}\ndata: {app.json.dumps(data)}\n\n"
+
+@app.route("/admin/events")
+def get_live_events():
+    seq = live_events.parse_cursor(request.args.get("since"))
+    if seq is None:
+        return jsonify({"reset": True, "last_id": live_events.event_id(live_events.last_seq), "events": []})
+    events = live_events.since(seq)
+    return jsonify({
+        "reset": False,
+        "last_id": live_events.event_id(events[-1][0] if events else seq),
+        "events": [{"id": live_events.event_id(s), "type": t, "data": d} for s, t, d in events],
+    })
+
+@app.route("/admin/events/stream")
+def stream_live_events():
+    cursor = request.headers.get("Last-Event-ID") or request.args.get("since")
+    seq = live_events.parse_cursor(cursor)
+
+    def events():
+        nonlocal seq
+        # Ask the browser to reconnect quickly when the stream is recycled
+        yield "retry: 2000\n\n"
+        if seq is None:
+            # Missed events are gone (restart or buffer overflow): reload in full
+            seq = live_events.last_seq
+            yield sse_message(live_events.event_id(seq), "reset", {})
+        deadline = time.monotonic() + LIVE_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            batch = live_events.wait(seq, timeout=15)
+            if not batch:
+                yield ": keep-alive\n\n"
+                continue
+            for event_seq, event_type, data in batch:
+                yield sse_message(live_events.event_id(event_seq), event_type, data)
+            seq = batch[-1][0]
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # =====================================================
 # ADMIN ENDPOINTS
 # =====================================================
 @app.route("/admin/scores")
 def get_all_scores():
-    scores = list(scores_collection.find({}, {"_id": 0}))
+    writes = score_writer.unflushed() if score_writer else None
+    scores = list(storage.find_scores())
+    if score_writer:
+        scores = score_writer.overlay(scores, writes)
     return jsonify(scores)
 
 @app.route("/admin/questions")
 def get_admin_questions():
-    file_path = os.path.join(UPLOAD_FOLDER, "mcq", "questions.xlsx")
-    if not os.path.exists(file_path):
+    try:
+        _, _, body = question_bank.snapshot()
+    except FileNotFoundError:
         return jsonify([])
-    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    return app.response_class(body, mimetype="application/json")
+
+@app.route("/admin/mcq/regrade", methods=["POST"])
+def regrade_mcq():
+    """Rescore every stored MCQ attempt against the current questions.xlsx."""
     try:
-        wb = load_workbook(file_path)
-        ws = wb.active
-        raw_headers = [cell.value for cell in ws[1]]
-        
-        # Normalize headers
-        header_map = {}
-        for i, header in enumerate(raw_headers):
-            if header:
-                h = str(header).strip().lower()
-                if 'id' in h or 'question_id' in h or 'q_id' in h:
-                    header_map[i] = 'id'
-                elif 'question' in h and 'text' in h:
-                    header_map[i] = 'question_text'
-                elif 'question' in h:
-                    header_map[i] = 'question_text'
-                elif 'option' in h and 'a' in h:
-                    header_map[i] = 'optionA'
-                elif 'option' in h and 'b' in h:
-                    header_map[i] = 'optionB'
-                elif 'option' in h and 'c' in h:
-                    header_map[i] = 'optionC'
-                elif 'option' in h and 'd' in h:
-                    header_map[i] = 'optionD'
-                elif 'correct' in h or 'answer' in h:
-                    header_map[i] = 'correct_answer'
-                else:
-                    header_map[i] = header
-        
-        questions = []
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            if any(row):
-                question = {}
-                for i, value in enumerate(row):
-                    if i in header_map:
-                        question[header_map[i]] = value
-                
-                if 'question_text' in question and question['question_text']:
-                    if 'id' not in question:
-                        question['id'] = len(questions) + 1
-                    questions.append(question)
-        
-        return jsonify(questions)
+        key = question_bank.answer_key()
+    except FileNotFoundError:
+        return jsonify({"error": "questions.xlsx missing"}), 404
+    try:
+        if score_writer:
+            score_writer.flush()  # regrade what was accepted so far, not just what reached storage
+        with metrics.timed("mcq_regrade"):
+            result = regrade(storage, key)
+        leaderboard.rebuild()
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    live_events.publish("reset", {})
+    return jsonify(result)
 
 @app.route("/admin/submissions")
 def get_admin_submissions():
-    submissions = []
-    
-    # Get all scores from MongoDB for metadata lookup
-    all_scores = list(scores_collection.find({}))
-    
-    # Frontend submissions
-    base_folder = os.path.join(UPLOAD_FOLDER, "frontend_submissions")
-    if os.path.exists(base_folder):
-        for username in os.listdir(base_folder):
-            user_folder = os.path.join(base_folder, username)
-            if os.path.isdir(user_folder):
-                for filename in os.listdir(user_folder):
-                    submissions.append({
-                        "team": username,
-                        "round": "Frontend Challenge",
-                        "filename": filename,
-                        "path": f"frontend_submissions/{username}/{filename}"
-                    })
-    
-    # Scramble submissions
-    scramble_folder = os.path.join(UPLOAD_FOLDER, "scramble_submissions")
-    if os.path.exists(scramble_folder):
-        for lang in os.listdir(scramble_folder):
-            lang_folder = os.path.join(scramble_folder, lang)
-            if os.path.isdir(lang_folder):
-                for filename in os.listdir(lang_folder):
-                    username = filename.split('_')[0]
-                    file_path = os.path.join(lang_folder, filename)
-                    
-                    # Look up remaining_time and timestamp from MongoDB
-                    score_data = next((s for s in all_scores if s.get('username') == username and s.get('round') == 'Scramble' and s.get('saved_file') == filename), None)
-                    remaining_time = score_data.get('remaining_time') if score_data else None
-                    timestamp = score_data.get('timestamp').strftime('%Y-%m-%d %H:%M:%S') if score_data and score_data.get('timestamp') else 'N/A'
-                    file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
-                    
-                    submissions.append({
-                        "team": username,
-                        "round": "Code Scramble",
-                        "filename": filename,
-                        "language": lang,
-                        "remaining_time": remaining_time,
-                        "timestamp": timestamp,
-                        "size": file_size,
-                        "path": f"scramble_submissions/{lang}/{filename}"
-                    })
-    
-    # Debug submissions - correct
-    debug_correct_folder = os.path.join(UPLOAD_FOLDER, "debug_submissions", "correct")
-    if os.path.exists(debug_correct_folder):
-        for lang in os.listdir(debug_correct_folder):
-            lang_folder = os.path.join(debug_correct_folder, lang)
-            if os.path.isdir(lang_folder):
-                for filename in os.listdir(lang_folder):
-                    # Extract username from filename (format: username_problem_timestamp.ext)
-                    username = filename.split('_')[0]
-                    file_path = os.path.join(lang_folder, filename)
-                    
-                    # Look up remaining_time and timestamp from MongoDB
-                    score_data = next((s for s in all_scores if s.get('username') == username and s.get('round') == 'Debugging' and s.get('saved_file') == filename), None)
-                    remaining_time = score_data.get('remaining_time') if score_data else None
-                    timestamp = score_data.get('timestamp').strftime('%Y-%m-%d %H:%M:%S') if score_data and score_data.get('timestamp') else 'N/A'
-                    file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
-                    
-                    submissions.append({
-                        "team": username,
-                        "round": "Debug - Correct",
-                        "filename": filename,
-                        "language": lang,
-                        "remaining_time": remaining_time,
-                        "timestamp": timestamp,
-                        "size": file_size,
-                        "path": f"debug_submissions/correct/{lang}/{filename}"
-                    })
-    
-    # Debug submissions - wrong
-    debug_wrong_folder = os.path.join(UPLOAD_FOLDER, "debug_submissions", "wrong")
-    if os.path.exists(debug_wrong_folder):
-        for lang in os.listdir(debug_wrong_folder):
-            lang_folder = os.path.join(debug_wrong_folder, lang)
-            if os.path.isdir(lang_folder):
-                for filename in os.listdir(lang_folder):
-                    username = filename.split('_')[0]
-                    file_path = os.path.join(lang_folder, filename)
-                    
-                    # Look up remaining_time and timestamp from MongoDB
-                    score_data = next((s for s in all_scores if s.get('username') == username and s.get('round') == 'Debugging' and s.get('saved_file') == filename), None)
-                    remaining_time = score_data.get('remaining_time') if score_data else None
-                    timestamp = score_data.get('timestamp').strftime('%Y-%m-%d %H:%M:%S') if score_data and score_data.get('timestamp') else 'N/A'
-                    file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
-                    
-                    submissions.append({
-                        "team": username,
-                        "round": "Debug - Wrong",
-                        "filename": filename,
-                        "language": lang,
-                        "remaining_time": remaining_time,
-                        "timestamp": timestamp,
-                        "size": file_size,
-                        "path": f"debug_submissions/wrong/{lang}/{filename}"
-                    })
-    
-    return jsonify(submissions)
+    items, total = submission_catalog.query(request.args)
+    response = jsonify(items)
+    response.headers["X-Total-Count"] = str(total)
+    return response
+
+@app.route("/admin/similar_submissions")
+def get_similar_submissions():
+    """Clusters of near-identical scramble/debug submissions by different users.
+
+    ?round=scramble|debug&lang=&problem=<file name>&min_users=2
+    """
+    try:
+        clusters = similarity_index.clusters(request.args.get("round"), request.args.get("lang"),
+                                             request.args.get("problem"),
+                                             min_users=max(request.args.get("min_users", 2, type=int), 2))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"threshold": similarity_index.threshold, "clusters": clusters})
+
+@app.cli.command("rebuild-catalog")
+def rebuild_catalog_command():
+    """Backfill the submissions catalog from the uploads folders."""
+    with metrics.timed("submission_catalog_rebuild"):
+        count = submission_catalog.rebuild()
+    storage.recount_blob_refs()
+    print(f"Catalogued {count} submission files.")
+
+@app.cli.command("compact-submissions")
+def compact_submissions_command():
+    """Move submission files saved before the blob store into it, then collect garbage."""
+    # Catalog any file that was never recorded, so it moves too
+    submission_catalog.rebuild()
+    result = blob_store.compact(storage, UPLOAD_FOLDER, SUBMISSION_TREES)
+    storage.recount_blob_refs()
+    collected = blob_store.gc(storage)
+    print(f"Moved {result['files']} files ({result['bytes_before']} bytes) into the blob store as "
+          f"{result['bytes_added']} bytes of new blobs; {result['entries_updated']} catalog entries "
+          f"updated; {collected['blobs']} unreferenced blobs ({collected['bytes']} bytes) deleted.")
+
+@app.cli.command("gc-blobs")
+@click.option("--dry-run", is_flag=True, help="Only report what would be deleted.")
+@click.option("--recount", is_flag=True, help="Rebuild reference counts from the catalog first.")
+def gc_blobs_command(dry_run, recount):
+    """Delete blobs that no catalogued submission references any more."""
+    if recount:
+        storage.recount_blob_refs()
+    collected = blob_store.gc(storage, dry_run=dry_run)
+    print(f"{'Would delete' if dry_run else 'Deleted'} {collected['blobs']} blobs ({collected['bytes']} bytes).")
 
 @app.route("/admin/submission_file")
 def get_submission_file():
     file_path = request.args.get("path")
-    full_path = os.path.join(UPLOAD_FOLDER, file_path)
+    full_path = submission_catalog.locate(file_path or "")
     
-    if not os.path.exists(full_path):
+    if not full_path:
         return jsonify({"error": "File not found"}), 404
     
     with open(full_path, "r", encoding="utf-8") as f:
@@ -672,10 +1282,85 @@ def get_submission_file():
     
     return jsonify({"content": content})
 
+# =====================================================
+# BULK EXPORT
+# =====================================================
+# Streamed straight from storage cursors / the uploads folders, so memory stays
+# flat no matter how many scores or files there are.
+def export_response(rows, columns, name):
+    fmt = request.args.get("format", "csv")
+    if fmt == "ndjson":
+        body, mimetype, ext = iter_ndjson(rows, app.json.dumps), "application/x-ndjson", "ndjson"
+    elif fmt == "csv":
+        body, mimetype, ext = iter_csv(rows, columns), "text/csv", "csv"
+    else:
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename={name}.{ext}"})
+
+@app.route("/admin/export/scores")
+def export_scores():
+    if score_writer:
+        score_writer.flush()
+    rows = storage.find_scores(round_name=request.args.get("round"))
+    return export_response(rows, SCORE_COLUMNS, "scores")
+
+@app.route("/admin/export/submissions")
+def export_submissions():
+    return export_response(submission_catalog.iter_rows(), SUBMISSION_COLUMNS, "submissions")
+
+@app.route("/admin/export/submissions.zip")
+def export_submission_files():
+    # ?round=frontend|scramble|debug limits the archive to one round's folder
+    trees = SUBMISSION_TREES
+    if request.args.get("round"):
+        trees = [t for t in SUBMISSION_TREES if t.startswith(request.args["round"])]
+        if not trees:
+            return jsonify({"error": "Unknown round"}), 400
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    # From the catalog, each file read from its blob (or the old file on disk)
+    return Response(stream_with_context(iter_zip(submission_catalog.iter_files(trees))), mimetype="application/zip",
+                    headers={"Content-Disposition": f"attachment; filename=submissions_{stamp}.zip"})
+
+@app.route("/admin/executor_stats")
+def get_executor_stats():
+    return jsonify(code_executor.describe())
+
+@app.route("/admin/judge_queue")
+def get_judge_queue_stats():
+    return jsonify(judge_queue.stats())
+
+@app.route("/admin/cache_stats")
+def get_cache_stats():
+    return jsonify(code_executor.cache_stats())
+
+@app.route("/admin/asset_stats")
+def get_asset_stats():
+    if not asset_store:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **asset_store.stats()})
+
+@app.route("/admin/score_writer_stats")
+def get_score_writer_stats():
+    if not score_writer:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **score_writer.stats()})
+
+@app.route("/admin/live_events_stats")
+def get_live_events_stats():
+    return jsonify(live_events.stats())
+
 @app.route("/admin/scores/delete", methods=["DELETE"])
 def delete_all_scores():
     try:
-        scores_collection.delete_many({})
+        if score_writer:
+            # Every worker drops its buffered writes first, so none reach storage after the delete
+            score_writer.start()
+            storage.delete_scores(written_before=score_writer.clear())
+        else:
+            storage.delete_scores()
+        leaderboard.clear()
+        live_events.publish("reset", {})
         return jsonify({"message": "All scores deleted"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -685,6 +1370,9 @@ def delete_all_scores():
 # =====================================================
 if __name__ == "__main__":
     init_db()
+    # With the debug reloader only the child process serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_services()
     port = int(os.environ.get("PORT", 8000))
     app.run(debug=True, host="0.0.0.0", port=port)
 
@@ -0,0 +1,230 @@
+"""Async serving mode: ``uvicorn asgi:app --host 0.0.0.0 --port 8000`` from backend/.
+
+The hot student endpoints (question and code fetches, running and
+submitting code, score reads) are served natively on the event loop: Judge0
+calls go through one pooled keep-alive httpx client, score reads through the
+Motor driver, and file/queue work is pushed to worker threads. The admin
+live event stream waits on the event loop too. Everything else is passed
+through to the Flask app, which keeps working unchanged. A single process
+can therefore hold thousands of requests that are waiting on the judge, or
+open event streams, instead of one per worker thread.
+"""
+import os
+import time
+import asyncio
+import inspect
+import functools
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+# Production refuses to start without SESSION_SECRET (see app.py)
+os.environ.setdefault("SESSION_SECRET_REQUIRED", "1")
+
+import app as flask_app
+import metrics
+from judge_queue import QueueFull
+
+
+def error(message, status):
+    return JSONResponse({"error": message}, status_code=status)
+
+
+def json_response(body, status=200):
+    # Flask's JSON provider, so both modes serialize datetimes the same way
+    return Response(flask_app.app.json.dumps(body), status_code=status, media_type="application/json")
+
+
+def requires_session(handler):
+    """401 unless the request carries a valid session token (see app.session_from)."""
+    @functools.wraps(handler)
+    async def wrapper(request):
+        session = flask_app.session_from(request.headers.get("authorization"),
+                                         request.cookies.get(flask_app.SESSION_COOKIE))
+        if session is None:
+            return error("Login required", 401)
+        request.state.session = session
+        return await handler(request)
+    return wrapper
+
+
+@requires_session
+async def get_mcq_questions(request):
+    try:
+        digest, body = await asyncio.to_thread(flask_app.question_bank.student_snapshot)
+    except FileNotFoundError:
+        return error("questions.xlsx missing", 404)
+    except Exception as e:
+        return error(f"Error reading Excel file: {str(e)}", 500)
+
+    etag = f'"{digest}"'
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+
+def code_file_response(request, payload):
+    body, digest = payload
+    etag = f'"{digest}"'
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(body, headers={"ETag": etag})
+
+
+@requires_session
+async def get_scrambled_code(request):
+    # get() only stats the folder unless it changed, then it reloads it
+    code_file = await asyncio.to_thread(flask_app.code_bank.get, "scramble",
+                                        request.query_params.get("lang", "py"), request.query_params.get("file"))
+    if code_file is None:
+        return error("File not found", 404)
+    return code_file_response(request, flask_app.scrambled_code_payload(
+        code_file, flask_app.acting_username(request.state.session, request.query_params.get("username"))))
+
+
+@requires_session
+async def get_buggy_code(request):
+    code_file = await asyncio.to_thread(flask_app.code_bank.get, "debug",
+                                        request.query_params.get("lang", "py"), request.query_params.get("file"))
+    if code_file is None:
+        return error("File not found", 404)
+    return code_file_response(request, flask_app.buggy_code_payload(code_file))
+
+
+@requires_session
+async def check_debug_code(request):
+    data = await request.json()
+    result = await flask_app.code_executor.run_async(data.get("code"), data.get("lang", "py"), data.get("input", ""))
+    return JSONResponse(result)
+
+
+@requires_session
+async def submit_debug_code(request):
+    try:
+        data = await request.json()
+        username = flask_app.acting_username(request.state.session, data.get("username"))
+        job_id = await asyncio.to_thread(flask_app.enqueue_debug_submission, data, username)
+        return JSONResponse(flask_app.queued_response(job_id), status_code=202)
+    except QueueFull as e:
+        return JSONResponse({"error": f"Judge is busy, please resubmit shortly ({e})"},
+                            status_code=503, headers={"Retry-After": "5"})
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@requires_session
+async def submission_status(request):
+    status = await asyncio.to_thread(flask_app.judge_queue.status, request.path_params["job_id"],
+                                     flask_app.job_owner(request.state.session))
+    if status is None:
+        return error("Unknown job", 404)
+    return JSONResponse(status)
+
+
+@requires_session
+async def get_student_scores(request):
+    username = flask_app.acting_username(request.state.session, request.query_params.get("username"))
+    score_writer = flask_app.score_writer
+    # Reads the other workers' journals: off the event loop
+    writes = await asyncio.to_thread(score_writer.unflushed, username) if score_writer else None
+    scores = await flask_app.storage.find_scores_async(username=username)
+    if score_writer:
+        scores = score_writer.overlay(scores, writes)
+    return json_response(scores)
+
+
+async def get_leaderboard(request):
+    try:
+        limit = min(max(int(request.query_params.get("limit", 10)), 1), 500)
+    except ValueError:
+        limit = 10
+    # top() only waits on storage for the first load in this process
+    return JSONResponse(await asyncio.to_thread(flask_app.leaderboard.top, limit))
+
+
+@requires_session
+async def stream_live_events(request):
+    if request.state.session["role"] != "admin":
+        return error("Admins only", 403)
+    live_events = flask_app.live_events
+    cursor = request.headers.get("last-event-id") or request.query_params.get("since")
+    # May read storage (first use in this process, or a cursor older than the buffer)
+    seq = await asyncio.to_thread(live_events.parse_cursor, cursor)
+    batch = [] if seq is None else await asyncio.to_thread(live_events.since, seq)
+
+    async def events():
+        nonlocal seq, batch
+        # Ask the browser to reconnect quickly when the stream is recycled
+        yield "retry: 2000\n\n"
+        if seq is None:
+            # Missed events are gone (trimmed): reload in full
+            seq = live_events.last_seq
+            yield flask_app.sse_message(live_events.event_id(seq), "reset", {})
+        deadline = time.monotonic() + flask_app.LIVE_STREAM_SECONDS
+        while True:
+            for event_seq, event_type, data in batch:
+                yield flask_app.sse_message(live_events.event_id(event_seq), event_type, data)
+            if batch:
+                seq = batch[-1][0]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            batch = await live_events.wait_async(seq, timeout=min(15, remaining))
+            if not batch:
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+class RequestMetrics:
+    """Times the routes served natively here; mounted Flask routes record their own."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+
+        async def send_and_record(message):
+            if message["type"] == "http.response.start":
+                # The router has stored the matched endpoint in scope by now
+                endpoint = scope.get("endpoint")
+                if inspect.isfunction(endpoint):
+                    metrics.observe_request(scope["method"], endpoint.__name__, message["status"],
+                                            time.perf_counter() - started)
+            await send(message)
+
+        await self.app(scope, receive, send_and_record)
+
+
+@asynccontextmanager
+async def lifespan(_):
+    flask_app.init_db()
+    await asyncio.to_thread(flask_app.warm_caches)
+    flask_app.start_background_services()
+    yield
+    await flask_app.code_executor.aclose()
+
+
+routes = [
+    Route("/get_mcq_questions", get_mcq_questions),
+    Route("/get_scrambled_code", get_scrambled_code),
+    Route("/get_buggy_code", get_buggy_code),
+    Route("/check_debug_code", check_debug_code, methods=["POST"]),
+    Route("/submit_debug_code", submit_debug_code, methods=["POST"]),
+    Route("/submission_status/{job_id}", submission_status),
+    Route("/student/scores", get_student_scores),
+    Route("/leaderboard", get_leaderboard),
+    Route("/admin/events/stream", stream_live_events),
+    # Admin, uploads, auth and the frontend: the synchronous Flask app
+    Mount("/", WSGIMiddleware(flask_app.app)),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan, middleware=[Middleware(RequestMetrics)])
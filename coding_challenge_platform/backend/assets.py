@@ -0,0 +1,347 @@
+"""Build-once pipeline for the frontend's static files.
+
+``python assets.py`` (from backend/) or the first AssetStore lookup writes a
+build directory next to the sources:
+
+* every file is stored under a content-hash name (``static/club.3f9a1c2b7d4e.jpg``)
+  and the references in HTML/CSS/JS are rewritten to those names, so they
+  can be cached as immutable; HTML pages keep their own name and are
+  revalidated with their ETag instead;
+* text files get precompressed ``.gz`` (and ``.br`` when brotli is
+  installed) siblings;
+* JPEG/PNG images (when Pillow is installed) are re-encoded, capped at
+  ``max_image_width``, given a WebP alternative when that is smaller, and
+  resized to IMAGE_WIDTHS; an ``<img>`` that declares ``sizes`` gets a
+  ``srcset`` listing those widths.
+
+manifest.json records the source listing it was built from, so a changed
+frontend is rebuilt on the next start.
+"""
+import os
+import io
+import re
+import sys
+import json
+import gzip
+import time
+import hashlib
+import posixpath
+import mimetypes
+import threading
+
+from metrics import timed
+
+try:
+    from PIL import Image
+except ImportError:  # images are copied through unchanged
+    Image = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+MANIFEST = "manifest.json"
+IMAGE_TYPES = ("image/jpeg", "image/png")
+COMPRESSIBLE_TYPES = ("text/html", "text/css", "text/javascript", "application/javascript",
+                      "application/json", "image/svg+xml", "text/plain", "application/xml")
+IMAGE_WIDTHS = (160, 320, 640, 1280)
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Quoted or url(...) references to files in the tree: "config.js", '/static/a.jpg'
+REFERENCE = re.compile(r"""(?P<open>["'(])(?P<slash>/?)(?:\./)?(?P<path>[\w\-./]+\.\w+)(?=[?#"')])""")
+IMG_TAG = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+SRC_ATTR = re.compile(r"""\bsrc\s*=\s*["'](?P<slash>/?)(?:\./)?(?P<path>[^"'?#]+)""", re.IGNORECASE)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def fingerprint(path, digest, suffix=""):
+    root, ext = posixpath.splitext(path)
+    return f"{root}{suffix}.{digest}{ext}"
+
+
+def guess_type(path):
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def source_files(src_dir):
+    """Relative (posix) paths of the frontend files, skipping dot files/dirs."""
+    paths = []
+    for root, dirs, files in os.walk(src_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        rel_root = os.path.relpath(root, src_dir)
+        for name in sorted(files):
+            if not name.startswith("."):
+                paths.append(posixpath.normpath(posixpath.join(rel_root.replace(os.sep, "/"), name)))
+    return paths
+
+
+def source_key(src_dir, options):
+    """Digest of the source listing (path, size, mtime) and build options."""
+    h = hashlib.sha256(json.dumps(options, sort_keys=True).encode())
+    for path in source_files(src_dir):
+        st = os.stat(os.path.join(src_dir, path))
+        h.update(f"{path}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+def _build_order(path):
+    # Images and other binaries first, then stylesheets and scripts (which
+    # may reference images), pages last (which may reference everything)
+    mimetype = guess_type(path)
+    if mimetype == "text/html":
+        return 3
+    if mimetype in ("text/javascript", "application/javascript"):
+        return 2
+    if mimetype == "text/css":
+        return 1
+    return 0
+
+
+class AssetBuilder:
+    def __init__(self, src_dir, out_dir, max_image_width=1920, image_quality=82):
+        self.src_dir = src_dir
+        self.out_dir = out_dir
+        self.max_image_width = max_image_width
+        self.image_quality = image_quality
+        self.urls = {}     # source path -> fingerprinted path
+        self.srcsets = {}  # source path -> [(fingerprinted path, width)]
+        self.files = {}    # served path -> entry
+
+    def options(self):
+        return {"max_image_width": self.max_image_width, "image_quality": self.image_quality,
+                "pillow": Image is not None, "brotli": brotli is not None}
+
+    def _write(self, path, data):
+        target = os.path.join(self.out_dir, path)
+        if os.path.exists(target):
+            return  # content-addressed: same name, same bytes
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+
+    def _emit(self, path, data, mimetype, fingerprinted=True, suffix="", webp=None):
+        """Store data (and its compressed/WebP variants); returns the served path."""
+        digest = content_hash(data)
+        stored = fingerprint(path, digest, suffix)
+        served = stored if fingerprinted else path
+        self._write(stored, data)
+        entry = {"file": stored, "type": mimetype, "etag": digest, "size": len(data)}
+        if mimetype in COMPRESSIBLE_TYPES:
+            # Only keep encodings that save at least 10%
+            encoded = {"gzip": (".gz", gzip.compress(data, 9, mtime=0))}
+            if brotli is not None:
+                encoded["br"] = (".br", brotli.compress(data, quality=11))
+            for encoding, (ext, body) in encoded.items():
+                if len(body) < len(data) * 0.9:
+                    self._write(stored + ext, body)
+                    entry[encoding] = stored + ext
+        if webp is not None and len(webp) < len(data) * 0.9:
+            entry["webp"] = fingerprint(posixpath.splitext(path)[0] + ".webp", content_hash(webp), suffix)
+            self._write(entry["webp"], webp)
+        self.files[served] = entry
+        return served
+
+    def _encode(self, image, fmt, webp=False):
+        buf = io.BytesIO()
+        if webp:
+            image.save(buf, "WEBP", quality=self.image_quality, method=6)
+        elif fmt == "JPEG":
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            image.save(buf, "JPEG", quality=self.image_quality, optimize=True, progressive=True)
+        else:
+            image.save(buf, "PNG", optimize=True)
+        return buf.getvalue()
+
+    def _image(self, path, data, mimetype):
+        try:
+            image = Image.open(io.BytesIO(data))
+            image.load()
+        except Exception:
+            return self._emit(path, data, mimetype)
+        fmt = "JPEG" if mimetype == "image/jpeg" else "PNG"
+        full = image
+        if image.width > self.max_image_width:
+            height = round(image.height * self.max_image_width / image.width)
+            full = image.resize((self.max_image_width, height), Image.LANCZOS)
+        optimized = self._encode(full, fmt)
+        if full is image and len(optimized) >= len(data):
+            optimized = data  # the original was already tighter
+        served = self._emit(path, optimized, mimetype, webp=self._encode(full, fmt, webp=True))
+
+        srcset = []
+        for width in IMAGE_WIDTHS:
+            if width >= full.width:
+                break
+            resized = full.resize((width, max(1, round(full.height * width / full.width))), Image.LANCZOS)
+            srcset.append((self._emit(path, self._encode(resized, fmt), mimetype, suffix=f".w{width}",
+                                      webp=self._encode(resized, fmt, webp=True)), width))
+        if srcset:
+            self.srcsets[path] = srcset + [(served, full.width)]
+        return served
+
+    def _resolve(self, base, ref):
+        # "/static/a.jpg" is rooted at the frontend; "a.jpg" is relative to the referring file
+        if ref.startswith("/"):
+            return posixpath.normpath(ref.lstrip("/"))
+        return posixpath.normpath(posixpath.join(posixpath.dirname(base), ref))
+
+    def _url(self, base, slash, target):
+        return f"/{target}" if slash else posixpath.relpath(target, posixpath.dirname(base) or ".")
+
+    def _rewrite(self, path, text):
+        def add_srcset(match):
+            tag = match.group(0)
+            src = SRC_ATTR.search(tag)
+            if "srcset" in tag.lower() or "sizes" not in tag.lower() or not src:
+                return tag
+            variants = self.srcsets.get(self._resolve(path, src.group("slash") + src.group("path")))
+            if not variants:
+                return tag
+            srcset = ", ".join(f"{self._url(path, src.group('slash'), url)} {width}w" for url, width in variants)
+            return f'{tag[:4]} srcset="{srcset}"{tag[4:]}'
+
+        def replace(match):
+            target = self.urls.get(self._resolve(path, match.group("slash") + match.group("path")))
+            if target is None:
+                return match.group(0)
+            return match.group("open") + self._url(path, match.group("slash"), target)
+
+        if guess_type(path) == "text/html":
+            text = IMG_TAG.sub(add_srcset, text)
+        return REFERENCE.sub(replace, text)
+
+    def build(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        paths = sorted(source_files(self.src_dir), key=lambda p: (_build_order(p), p))
+        for path in paths:
+            with open(os.path.join(self.src_dir, path), "rb") as f:
+                data = f.read()
+            mimetype = guess_type(path)
+            if mimetype in IMAGE_TYPES and Image is not None:
+                self.urls[path] = self._image(path, data, mimetype)
+            elif mimetype in ("text/html", "text/css", "text/javascript", "application/javascript"):
+                data = self._rewrite(path, data.decode("utf-8")).encode("utf-8")
+                # Pages are fetched by their own name, so they cannot be fingerprinted
+                self.urls[path] = self._emit(path, data, mimetype, fingerprinted=mimetype != "text/html")
+            else:
+                self.urls[path] = self._emit(path, data, mimetype)
+        return {"paths": self.urls, "files": self.files}
+
+
+class AssetStore:
+    """Serves the build described by manifest.json, building it if stale.
+
+    ``lookup()`` maps a request path to the stored file to send: the
+    fingerprinted name is cached as immutable, the plain name (which old
+    pages and bookmarks still use) is revalidated. The variant is chosen
+    from Accept-Encoding (br, then gzip) and, for images, Accept (WebP).
+    """
+
+    def __init__(self, src_dir, build_dir, max_image_width=1920, image_quality=82):
+        self.src_dir = src_dir
+        self.build_dir = build_dir
+        self.builder_options = {"max_image_width": max_image_width, "image_quality": image_quality}
+        self._manifest = None
+        self._lock = threading.Lock()
+
+    def _builder(self):
+        return AssetBuilder(self.src_dir, self.build_dir, **self.builder_options)
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.build_dir, MANIFEST), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def build(self):
+        """Rebuild unconditionally and swap the new manifest in."""
+        builder = self._builder()
+        key = source_key(self.src_dir, builder.options())
+        with timed("asset_build"):
+            manifest = {"source_key": key, "built_at": time.time(), **builder.build()}
+        path = os.path.join(self.build_dir, MANIFEST)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+        self._manifest = manifest
+        return manifest
+
+    def load(self):
+        """Load the manifest, rebuilding first if the sources changed since."""
+        with self._lock:
+            if self._manifest is None:
+                manifest = self._read_manifest()
+                key = source_key(self.src_dir, self._builder().options())
+                if manifest is None or manifest.get("source_key") != key:
+                    return self.build()
+                self._manifest = manifest
+            return self._manifest
+
+    def lookup(self, path, accept_encoding="", accept=""):
+        """(file path, mimetype, etag, headers) for a request path, or None."""
+        manifest = self._manifest or self.load()
+        path = path.lstrip("/") or "index.html"
+        entry = manifest["files"].get(path)
+        cache_control = IMMUTABLE if entry is not None and path not in manifest["paths"] else REVALIDATE
+        if entry is None:
+            served = manifest["paths"].get(path)
+            if served is None:
+                return None
+            entry = manifest["files"][served]
+
+        stored, mimetype, etag, vary = entry["file"], entry["type"], entry["etag"], []
+        headers = {"Cache-Control": cache_control}
+        if "webp" in entry:
+            vary.append("Accept")
+            if "image/webp" in accept:
+                stored, mimetype, etag = entry["webp"], "image/webp", f"{etag}-webp"
+        if "gzip" in entry or "br" in entry:
+            vary.append("Accept-Encoding")
+            for encoding in ("br", "gzip"):
+                if encoding in entry and accepts_encoding(accept_encoding, encoding):
+                    stored, etag = entry[encoding], f"{etag}-{encoding}"
+                    headers["Content-Encoding"] = encoding
+                    break
+        if vary:
+            headers["Vary"] = ", ".join(vary)
+        return os.path.join(self.build_dir, stored), mimetype, etag, headers
+
+    def stats(self):
+        manifest = self._manifest or self.load()
+        files = manifest["files"].values()
+        return {
+            "built_at": manifest["built_at"],
+            "sources": len(manifest["paths"]),
+            "files": len(manifest["files"]),
+            "bytes": sum(e["size"] for e in files),
+            "gzip": sum(1 for e in files if "gzip" in e),
+            "br": sum(1 for e in files if "br" in e),
+            "webp": sum(1 for e in files if "webp" in e),
+        }
+
+
+def accepts_encoding(header, encoding):
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        if name.strip().lower() in (encoding, "*"):
+            q = params.strip()
+            return not (q.startswith("q=") and float(q[2:] or 0) == 0)
+    return False
+
+
+if __name__ == "__main__":
+    frontend = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend")
+    store = AssetStore(frontend, sys.argv[1] if len(sys.argv) > 1 else os.path.join(frontend, ".build"))
+    store.build()
+    print(json.dumps(store.stats(), indent=2))
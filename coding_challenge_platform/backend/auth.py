@@ -0,0 +1,298 @@
+"""Signed session tokens and password hashing.
+
+A session token is ``<claims>.<signature>``: base64url JSON claims
+(``sub``, ``role``, ``exp``, ``jti``) and their HMAC-SHA256 under the
+server secret. Any worker can verify one with the secret alone, so
+authenticated requests cost no database round trip. Verified tokens are
+kept in a small LRU so repeat requests skip the HMAC and JSON decode too.
+
+Logging out revokes the token's ``jti`` in storage. Each process keeps the
+revocation list in memory and a background thread re-reads it every few
+seconds, so a revoked token stops working on every worker within that
+delay and verifying a token never waits on storage.
+
+Passwords are hashed with PBKDF2-SHA256 in a bounded thread pool: hashing
+releases the GIL, so a login storm uses every core without piling up more
+work than the pool can finish.
+"""
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+import secrets
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+PASSWORD_SCHEME = "pbkdf2_sha256"
+
+
+class InvalidToken(Exception):
+    pass
+
+
+class HasherBusy(Exception):
+    """More password checks are waiting than the pool accepts."""
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def load_secret(path, env_value=None):
+    """The signing secret: env_value if set, else a random one kept at path.
+
+    Every worker (and every restart) reads the same file, so tokens stay
+    valid across processes without configuring anything. The file is only
+    readable by the server's user (0600, in a 0700 folder).
+    """
+    if env_value:
+        return env_value.encode("utf-8")
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    folder = os.path.dirname(path)
+    os.makedirs(folder, mode=0o700, exist_ok=True)
+    tmp_path = os.path.join(folder, f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(secrets.token_bytes(32))
+    try:
+        # Appears complete or not at all; if another worker got there first, use its key
+        os.link(tmp_path, path)
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(tmp_path)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class RevocationList:
+    """Revoked token ids, shared through storage and cached per process.
+
+    After start() a background thread keeps the cache fresh, so is_revoked()
+    is a dict lookup even on an event loop; without it (e.g. the flask CLI)
+    is_revoked() refreshes inline when the cache is stale.
+    """
+
+    def __init__(self, storage, refresh_seconds=5):
+        self.storage = storage
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._revoked = {}  # jti -> expiry (epoch seconds)
+        self._loaded_at = None
+        self._thread = None
+
+    def revoke(self, jti, expires_at):
+        with self._lock:
+            self._revoked[jti] = expires_at
+        self.storage.revoke_token(jti, expires_at)
+
+    def _refresh(self):
+        revoked = self.storage.revoked_tokens(time.time())
+        with self._lock:
+            # Keep local revocations that storage may not list yet
+            now = time.time()
+            self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+            self._revoked.update(revoked)
+            self._loaded_at = time.monotonic()
+
+    def _try_refresh(self):
+        try:
+            self._refresh()
+        except Exception as e:
+            # Storage unreachable: go on with the list we have
+            print("Could not refresh revoked sessions:", e)
+            self._loaded_at = time.monotonic()
+
+    def start(self):
+        """Load the list, then refresh it in the background (once per serving process, after fork)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="session-revocations", daemon=True)
+        self._try_refresh()
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(max(self.refresh_seconds, 0.1))
+            self._try_refresh()
+
+    def is_revoked(self, jti):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.refresh_seconds:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                self._try_refresh()
+        return jti in self._revoked
+
+    def __len__(self):
+        return len(self._revoked)
+
+
+class SessionTokens:
+    def __init__(self, secret, ttl=8 * 3600, revocations=None, cache_entries=10000):
+        self.secret = secret
+        self.ttl = ttl
+        self.revocations = revocations
+        self.cache_entries = cache_entries
+        self._cache = OrderedDict()  # token -> claims
+        self._lock = threading.Lock()
+        self._stats = {"issued": 0, "verified": 0, "cache_hits": 0, "rejected": 0, "revoked": 0}
+
+    def _sign(self, payload):
+        return _b64encode(hmac.new(self.secret, payload.encode("ascii"), hashlib.sha256).digest())
+
+    def issue(self, username, role):
+        """Return (token, claims) for a freshly signed-in user."""
+        claims = {"sub": username, "role": role, "exp": int(time.time() + self.ttl), "jti": secrets.token_hex(12)}
+        payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            self._stats["issued"] += 1
+        return f"{payload}.{self._sign(payload)}", claims
+
+    def _decode(self, token):
+        payload, _, signature = token.partition(".")
+        try:
+            valid = bool(signature) and hmac.compare_digest(signature.encode("ascii"), self._sign(payload).encode("ascii"))
+        except UnicodeError:
+            valid = False
+        if not valid:
+            raise InvalidToken("bad signature")
+        try:
+            claims = json.loads(_b64decode(payload))
+        except ValueError:
+            raise InvalidToken("malformed token")
+        if not isinstance(claims, dict) or not {"sub", "role", "exp", "jti"} <= claims.keys():
+            raise InvalidToken("malformed token")
+        return claims
+
+    def verify(self, token):
+        """Claims of a valid, unexpired, unrevoked token; raises InvalidToken."""
+        with self._lock:
+            claims = self._cache.get(token)
+            if claims is not None:
+                self._cache.move_to_end(token)
+                self._stats["cache_hits"] += 1
+        try:
+            if claims is None:
+                claims = self._decode(token)
+                with self._lock:
+                    self._cache[token] = claims
+                    if len(self._cache) > self.cache_entries:
+                        self._cache.popitem(last=False)
+            if claims["exp"] <= time.time():
+                raise InvalidToken("session expired")
+            if self.revocations is not None and self.revocations.is_revoked(claims["jti"]):
+                raise InvalidToken("session ended")
+        except InvalidToken:
+            with self._lock:
+                self._stats["rejected"] += 1
+                self._cache.pop(token, None)
+            raise
+        with self._lock:
+            self._stats["verified"] += 1
+        return claims
+
+    def revoke(self, claims):
+        if self.revocations is not None:
+            self.revocations.revoke(claims["jti"], claims["exp"])
+        with self._lock:
+            self._stats["revoked"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, cached=len(self._cache))
+        stats["revocations"] = len(self.revocations) if self.revocations is not None else 0
+        return stats
+
+
+class PasswordHasher:
+    """PBKDF2 password hashes computed on a bounded pool of threads."""
+
+    def __init__(self, workers=None, max_pending=256, iterations=200_000, queue_timeout=10.0):
+        self.workers = workers or os.cpu_count() or 2
+        self.iterations = iterations
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._stats = {"hashed": 0, "checked": 0, "busy": 0, "seconds_total": 0.0}
+        self._lock = threading.Lock()
+        self._dummy = None  # checked for unknown usernames so they take as long as real ones
+
+    def _executor(self):
+        # Created lazily so that each gunicorn worker gets its own threads after fork
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._pool
+
+    @staticmethod
+    def _hash(password, salt, iterations):
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+        return f"{PASSWORD_SCHEME}${iterations}${_b64encode(salt)}${_b64encode(digest)}"
+
+    @staticmethod
+    def _check(password, stored):
+        try:
+            scheme, iterations, salt, _ = stored.split("$")
+        except (AttributeError, ValueError):
+            return False
+        if scheme != PASSWORD_SCHEME:
+            return False
+        expected = PasswordHasher._hash(password, _b64decode(salt), int(iterations))
+        return hmac.compare_digest(expected, stored)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._stats["busy"] += 1
+            raise HasherBusy("too many logins in progress")
+        started = time.perf_counter()
+        try:
+            return self._executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+            with self._lock:
+                self._stats["seconds_total"] += time.perf_counter() - started
+
+    def hash(self, password):
+        with self._lock:
+            self._stats["hashed"] += 1
+        return self._run(self._hash, password, secrets.token_bytes(16), self.iterations)
+
+    def check(self, password, user):
+        """Whether password matches the user doc (None for unknown users).
+
+        Returns (matches, upgraded_hash): users created before passwords were
+        hashed store the plain text; on a match they get a hash to save.
+        """
+        with self._lock:
+            self._stats["checked"] += 1
+        if user is None:
+            if self._dummy is None:
+                self._dummy = self._hash("not a password", secrets.token_bytes(16), self.iterations)
+            self._run(self._check, password, self._dummy)
+            return False, None
+        if user.get("password_hash"):
+            return self._run(self._check, password, user["password_hash"]), None
+        plain = user.get("password")
+        if plain is None or not hmac.compare_digest(str(plain).encode("utf-8"), password.encode("utf-8")):
+            return False, None
+        return True, self.hash(password)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, workers=self.workers, iterations=self.iterations)
@@ -0,0 +1,81 @@
+"""Login and per-request session cost.
+
+Logins: a burst of concurrent password checks, hashed one at a time vs on
+the PasswordHasher thread pool. Authenticated requests: looking the session
+up in storage on every request (what a server-side session table costs) vs
+checking the token's signature vs a verification-cache hit.
+
+Run from the backend directory:  python benchmarks/bench_auth.py --logins 64
+"""
+import os
+import time
+import argparse
+import threading
+
+from common import make_workdir, report
+from storage import create_storage
+from auth import PasswordHasher, RevocationList, SessionTokens
+
+
+def login_burst(hasher, users, password):
+    """Every user logs in at once from its own thread; returns logins/s."""
+    threads = [threading.Thread(target=hasher.check, args=(password, user)) for user in users]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return len(users) / (time.perf_counter() - start)
+
+
+def per_second(fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--iterations", type=int, default=200000, help="PBKDF2 iterations")
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=50000)
+    args = parser.parse_args()
+
+    make_workdir()
+    storage = create_storage("sqlite", path=os.path.abspath("auth.db"))
+    storage.ensure_indexes()
+
+    pool = PasswordHasher(iterations=args.iterations, max_pending=args.logins)
+    serial = PasswordHasher(workers=1, iterations=args.iterations, max_pending=args.logins)
+    users = [{"username": f"student{n}", "password_hash": pool.hash("secret")} for n in range(args.logins)]
+    serial_rate = login_burst(serial, users, "secret")
+    pool_rate = login_burst(pool, users, "secret")
+
+    tokens = SessionTokens(b"bench secret", revocations=RevocationList(storage), cache_entries=args.sessions)
+    uncached = SessionTokens(b"bench secret", revocations=RevocationList(storage), cache_entries=0)
+    issued = []
+    for n in range(args.sessions):
+        token, claims = tokens.issue(f"student{n}", "student")
+        storage.create_user({"username": claims["jti"], "role": "session", "sub": claims["sub"]})
+        issued.append((token, claims["jti"]))
+    stream = [issued[n % len(issued)] for n in range(args.requests)]
+
+    lookup_rate = per_second(lambda item: storage.get_user(item[1], role="session"), stream)
+    hmac_rate = per_second(lambda item: uncached.verify(item[0]), stream)
+    cached_rate = per_second(lambda item: tokens.verify(item[0]), stream)
+
+    report(f"{args.logins} concurrent logins, PBKDF2-SHA256 x {args.iterations}", [
+        ("one at a time", f"{serial_rate:8.1f} logins/s"),
+        (f"pool of {pool.workers}", f"{pool_rate:8.1f} logins/s   {pool_rate / serial_rate:5.2f}x"),
+    ])
+    report(f"{args.requests} authenticated requests over {args.sessions} sessions", [
+        ("storage lookup", f"{lookup_rate:10.0f} req/s"),
+        ("token signature", f"{hmac_rate:10.0f} req/s   {hmac_rate / lookup_rate:6.1f}x"),
+        ("verification cache", f"{cached_rate:10.0f} req/s   {cached_rate / lookup_rate:6.1f}x"),
+    ])
+
+
+if __name__ == "__main__":
+    main()
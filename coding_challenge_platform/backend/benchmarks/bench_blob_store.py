@@ -0,0 +1,93 @@
+"""Repeated submissions: timestamped copies vs the content-addressed blob store.
+
+Every student submits each problem several times, mostly unchanged code.
+The old layout writes one file per submit under scramble_submissions/;
+the blob store writes each distinct content once and catalogs the rest.
+Reports files and disk blocks used, save time, and the time to walk all
+submitted files (what catalog backfills and the zip export do).
+
+Run from the backend directory:  python benchmarks/bench_blob_store.py --students 500
+"""
+import os
+import time
+import random
+import argparse
+
+from common import make_workdir, report
+from storage import create_storage
+from blob_store import BlobStore
+from submission_catalog import SubmissionCatalog, SCRAMBLE
+
+
+def disk_usage(root):
+    files = blocks = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            files += 1
+            blocks += os.stat(os.path.join(dirpath, name)).st_blocks * 512
+    return files, blocks
+
+
+def make_code(rng, lines=40):
+    return "".join(f"x{rng.randint(0, 9)} = {rng.randint(0, 999)}  # line {n}\n" for n in range(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--problems", type=int, default=4)
+    parser.add_argument("--resubmits", type=int, default=8, help="submits per student and problem")
+    parser.add_argument("--changed", type=float, default=0.25, help="chance a resubmit has edited code")
+    args = parser.parse_args()
+
+    make_workdir()
+    rng = random.Random(11)
+    submits = []
+    for student in range(args.students):
+        for problem in range(args.problems):
+            code = make_code(rng)
+            for n in range(args.resubmits):
+                if n and rng.random() < args.changed:
+                    code = code.replace(f"line {rng.randint(0, 39)}\n", f"line edited {n}\n", 1)
+                submits.append((f"student{student}", f"scramble_submissions/py/student{student}_p{problem}_{n:06d}.py",
+                                code))
+
+    rows = []
+    # Old layout: one timestamped file per submit
+    start = time.perf_counter()
+    for _, path, code in submits:
+        full_path = os.path.join("legacy", path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w", encoding="utf-8") as f:
+            f.write(code)
+    save = time.perf_counter() - start
+    files, blocks = disk_usage("legacy")
+    start = time.perf_counter()
+    walked = sum(len(open(os.path.join(d, n), "rb").read()) for d, _, names in os.walk("legacy") for n in names)
+    walk = time.perf_counter() - start
+    rows.append(("timestamped files", f"{files:7d} files {blocks / 1024 / 1024:8.1f} MB   save {save:6.2f} s   "
+                                      f"read all {walk:6.2f} s"))
+
+    # Blob store: one blob per distinct content, a catalog entry per submit
+    storage = create_storage("sqlite", path=os.path.abspath("blobs.db"))
+    storage.ensure_indexes()
+    blobs = BlobStore(os.path.join("uploads", "blobs"))
+    catalog = SubmissionCatalog(storage, "uploads", blobs=blobs)
+    start = time.perf_counter()
+    for username, path, code in submits:
+        catalog.save(username, SCRAMBLE, path, code, language="py")
+    save = time.perf_counter() - start
+    files, blocks = disk_usage(os.path.join("uploads", "blobs"))
+    start = time.perf_counter()
+    read = sum(len(open(located, "rb").read()) for _, located, _ in catalog.iter_files(["scramble_submissions"]))
+    walk = time.perf_counter() - start
+    assert read == walked
+    rows.append(("blob store", f"{files:7d} files {blocks / 1024 / 1024:8.1f} MB   save {save:6.2f} s   "
+                               f"read all {walk:6.2f} s   (+ {os.path.getsize('blobs.db') / 1024 / 1024:.1f} MB catalog)"))
+
+    report(f"{len(submits)} submits: {args.students} students x {args.problems} problems x {args.resubmits}, "
+           f"{args.changed:.0%} edited", rows)
+
+
+if __name__ == "__main__":
+    main()
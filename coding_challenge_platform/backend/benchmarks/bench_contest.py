@@ -0,0 +1,370 @@
+"""Replays a whole contest against a running server and reports per-endpoint latency.
+
+Starts the app (``gunicorn wsgi:app``, or ``uvicorn asgi:app`` with
+--server asgi) on a scratch SQLite database (or --mongo-uri), with
+benchmarks/fake_judge.py standing in for Judge0, then drives it from
+separate client processes. Every student:
+
+  1. signs up and logs in,
+  2. fetches the MCQ questions and submits a score,
+  3. lists, fetches and submits the scramble files,
+  4. fetches each buggy file, runs it --checks times through
+     /check_debug_code, submits it and polls /submission_status,
+  5. waits for the deadline and submits a last scramble and debug answer
+     together with everybody else,
+
+while an admin process polls /admin/submissions and /leaderboard. The
+scenario is seeded (--seed), so two runs send the same requests.
+
+Results go to benchmarks/results/<time>-<git rev>.json and are compared with
+the newest earlier file there (or --compare), so a regression between two
+versions shows up as a p95/throughput delta per endpoint.
+
+Run from the backend directory:  python benchmarks/bench_contest.py --students 50
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+import http.client
+import multiprocessing
+from datetime import datetime
+
+from common import BACKEND_DIR, make_workdir, report
+from bench_workers import free_port, wait_ready
+from bench_mcq_questions import write_workbook
+from judge_queue import FINISHED_STATES
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+PERCENTILES = (50, 95, 99)
+
+
+# =====================================================
+# CONTEST MATERIAL
+# =====================================================
+def write_problems(count, rng):
+    """Scramble and debug files (with echo test cases the fake judge passes)."""
+    for folder in ("scramble/py", "debug/py"):
+        os.makedirs(os.path.join("uploads", folder), exist_ok=True)
+    for n in range(1, count + 1):
+        lines = [f"x{i} = {rng.randint(0, 99)}\n" for i in range(30)] + ["print(" + " + ".join(f"x{i}" for i in range(30)) + ")\n"]
+        with open(os.path.join("uploads", "scramble", "py", f"problem{n}.py"), "w") as f:
+            f.writelines(lines)
+        with open(os.path.join("uploads", "debug", "py", f"problem{n}.py"), "w") as f:
+            f.write("s = input()\nprint(s[::-1][::-1])\n")
+        tests = os.path.join("uploads", "debug", "py", f"problem{n}.tests")
+        os.makedirs(tests, exist_ok=True)
+        for case in range(1, 4):
+            with open(os.path.join(tests, f"{case}.in"), "w") as f:
+                f.write(f"case {case}\n")
+            with open(os.path.join(tests, f"{case}.out"), "w") as f:
+                f.write(f"case {case}\n")
+
+
+# =====================================================
+# CLIENTS
+# =====================================================
+class Client:
+    """One keep-alive connection that records (endpoint, phase, seconds, status)."""
+
+    def __init__(self, port, records):
+        self.port = port
+        self.records = records
+        self.conn = None
+        self.token = None  # session token from the login response
+
+    def call(self, label, phase, method, path, body=None):
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        payload = json.dumps(body) if body is not None else None
+        start = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+            self.conn.request(method, path, payload, headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.conn = None
+            data, status = b"", 599
+        self.records.append((label, phase, time.perf_counter() - start, status))
+        try:
+            return status, json.loads(data) if data else None
+        except ValueError:
+            return status, None
+
+    def login(self, label, path, credentials):
+        status, body = self.call(label, "login", "POST", path, credentials)
+        if status == 200:
+            self.token = body["token"]
+        return status
+
+
+def wait_for_verdict(client, job_id, phase, started, poll=0.5, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status, body = client.call("GET /submission_status/<id>", phase, "GET", f"/submission_status/{job_id}")
+        if status != 200 or (body or {}).get("state") in FINISHED_STATES:
+            break
+        time.sleep(poll)
+    # End to end: submit until the verdict is visible to the student
+    client.records.append(("debug verdict (end to end)", phase, time.perf_counter() - started, status))
+
+
+def student(port, index, args, deadline_barrier, records):
+    rng = random.Random(args.seed * 100003 + index)
+    client = Client(port, records)
+    username, password = f"student{index:05d}", f"pw{index}"
+
+    def think():
+        time.sleep(rng.uniform(0, args.think))
+
+    client.call("POST /student_signup", "login", "POST", "/student_signup", {"username": username, "password": password})
+    client.login("POST /student_login", "/student_login", {"username": username, "password": password})
+
+    think()
+    status, questions = client.call("GET /get_mcq_questions", "mcq", "GET", "/get_mcq_questions")
+    if status != 200 or not isinstance(questions, list):
+        questions = []
+    answers = {q["id"]: q[rng.choice(("optionA", "optionB", "optionC", "optionD"))] for q in questions
+               if rng.random() < 0.9}
+    think()
+    client.call("POST /submit_mcq_score", "mcq", "POST", "/submit_mcq_score", {"username": username, "answers": answers})
+
+    _, files = client.call("GET /get_scrambled_code_list", "scramble", "GET", "/get_scrambled_code_list?lang=py")
+    files = files or []
+    for name in files[:-1]:
+        _, body = client.call("GET /get_scrambled_code", "scramble", "GET",
+                              f"/get_scrambled_code?lang=py&file={name}&username={username}")
+        lines = (body or {}).get("scrambled", "").splitlines(keepends=True)
+        rng.shuffle(lines)
+        think()
+        client.call("POST /submit_scrambled_code", "scramble", "POST", "/submit_scrambled_code",
+                    {"code": "".join(lines), "lang": "py", "username": username,
+                     "file_path": f"scramble/py/{name}", "remaining_time": rng.randint(0, 2700)})
+
+    _, buggy = client.call("GET /get_buggy_code_list", "debug", "GET", "/get_buggy_code_list?lang=py")
+    buggy = buggy or []
+    for name in buggy[:-1]:
+        _, body = client.call("GET /get_buggy_code", "debug", "GET", f"/get_buggy_code?lang=py&file={name}")
+        code = (body or {}).get("code", "")
+        for attempt in range(args.checks):
+            # Different stdin each time, as edited code would be: no result-cache hits
+            client.call("POST /check_debug_code", "debug", "POST", "/check_debug_code",
+                        {"code": code, "lang": "py", "input": f"{username} attempt {attempt}"})
+            think()
+        started = time.perf_counter()
+        status, body = client.call("POST /submit_debug_code", "debug", "POST", "/submit_debug_code",
+                                   {"code": code, "lang": "py", "username": username,
+                                    "file_path": f"debug/py/{name}", "remaining_time": rng.randint(0, 2700)})
+        if status == 202:
+            wait_for_verdict(client, body["job_id"], "debug", started)
+
+    # Deadline: everybody's last answers land together
+    try:
+        deadline_barrier.wait(timeout=args.deadline_timeout)
+    except threading.BrokenBarrierError:
+        pass
+    if files:
+        client.call("POST /submit_scrambled_code", "deadline", "POST", "/submit_scrambled_code",
+                    {"code": "", "lang": "py", "username": username, "file_path": f"scramble/py/{files[-1]}",
+                     "remaining_time": 0})
+    if buggy:
+        started = time.perf_counter()
+        status, body = client.call("POST /submit_debug_code", "deadline", "POST", "/submit_debug_code",
+                                   {"code": "print(input())", "lang": "py", "username": username,
+                                    "file_path": f"debug/py/{buggy[-1]}", "remaining_time": 0})
+        if status == 202:
+            wait_for_verdict(client, body["job_id"], "deadline", started)
+
+
+def client_process(port, indexes, args, deadline_barrier, results):
+    records = []
+    threads = [threading.Thread(target=student, args=(port, i, args, deadline_barrier, records)) for i in indexes]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.put(records)
+
+
+def admin_process(port, interval, stop, results):
+    records = []
+    client = Client(port, records)
+    client.login("POST /admin_login", "/admin_login", {"username": "admin", "password": "adminpass"})
+    page = 1
+    while not stop.is_set():
+        status, _ = client.call("GET /admin/submissions", "admin", "GET", f"/admin/submissions?page={page}&page_size=50")
+        page = page % 5 + 1
+        client.call("GET /leaderboard", "admin", "GET", "/leaderboard?limit=50")
+        stop.wait(interval)
+    results.put(records)
+
+
+# =====================================================
+# RUN AND REPORT
+# =====================================================
+def start_server(args, port, judge_url):
+    env = dict(os.environ, PORT=str(port), JUDGE0_URL=judge_url, JUDGE_RATE_LIMIT="10000",
+               JUDGE_MAX_CONCURRENCY=str(args.judge_concurrency), WEB_CONCURRENCY=str(args.workers),
+               GUNICORN_THREADS=str(args.threads), GUNICORN_ACCESS_LOG="", GUNICORN_LOG_LEVEL="warning",
+               SESSION_SECRET="benchmark-session-secret")
+    if args.mongo_uri:
+        env.update(STORAGE_BACKEND="mongo", MONGO_URI=args.mongo_uri)
+    else:
+        env.update(STORAGE_BACKEND="sqlite", SQLITE_PATH=os.path.abspath("contest.db"))
+    if args.server == "asgi":
+        cmd = [sys.executable, "-m", "uvicorn", "asgi:app", "--app-dir", BACKEND_DIR, "--port", str(port),
+               "--log-level", "warning", "--no-access-log"]
+    else:
+        cmd = [sys.executable, "-m", "gunicorn", "-c", os.path.join(BACKEND_DIR, "gunicorn.conf.py"),
+               "--pythonpath", BACKEND_DIR, "wsgi:app"]
+    return subprocess.Popen(cmd, env=env)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+def summarize(records, elapsed):
+    by_label = {}
+    for label, _, seconds, status in records:
+        by_label.setdefault(label, []).append((seconds, status))
+    summary = {}
+    for label, samples in sorted(by_label.items()):
+        latencies = sorted(s for s, _ in samples)
+        summary[label] = {
+            "count": len(samples),
+            "errors": sum(1 for _, status in samples if status >= 400),
+            "error_statuses": sorted({status for _, status in samples if status >= 400}),
+            "per_sec": round(len(samples) / elapsed, 2),
+            **{f"p{p}_ms": round(percentile(latencies, p) * 1000, 2) for p in PERCENTILES},
+        }
+    return summary
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def previous_result(exclude):
+    if not os.path.isdir(RESULTS_DIR):
+        return None
+    names = sorted(n for n in os.listdir(RESULTS_DIR) if n.endswith(".json") and n != exclude)
+    return os.path.join(RESULTS_DIR, names[-1]) if names else None
+
+
+def compare(current, previous_path):
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    if previous.get("scenario") != current["scenario"]:
+        print(f"Note: {os.path.basename(previous_path)} ran a different scenario; deltas are indicative only\n")
+    rows = []
+    for label, now in current["endpoints"].items():
+        before = previous["endpoints"].get(label)
+        if not before:
+            continue
+        p95 = (now["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0
+        flag = "  <-- slower" if p95 > 10 and now["p95_ms"] - before["p95_ms"] > 5 else ""
+        rows.append((label, f"p95 {before['p95_ms']:8.1f} -> {now['p95_ms']:8.1f} ms ({p95:+6.1f}%)   "
+                            f"errors {before['errors']} -> {now['errors']}{flag}"))
+    report(f"Compared with {os.path.basename(previous_path)} ({previous.get('revision', '?')})", rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=50)
+    parser.add_argument("--problems", type=int, default=3, help="scramble and debug files (the last is the deadline one)")
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--checks", type=int, default=3, help="/check_debug_code runs per debug problem")
+    parser.add_argument("--think", type=float, default=0.2, help="max think time between steps, seconds")
+    parser.add_argument("--clients", type=int, default=4, help="client processes")
+    parser.add_argument("--admin-interval", type=float, default=1.0)
+    parser.add_argument("--deadline-timeout", type=float, default=120)
+    parser.add_argument("--server", choices=["wsgi", "asgi"], default="wsgi")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--judge-latency", type=float, default=0.2)
+    parser.add_argument("--judge-error-rate", type=float, default=0.0)
+    parser.add_argument("--judge-concurrency", type=int, default=32)
+    parser.add_argument("--mongo-uri", help="use this MongoDB instead of a scratch SQLite file")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--compare", help="results file to compare with (default: the newest in benchmarks/results)")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    make_workdir()
+    rng = random.Random(args.seed)
+    os.makedirs(os.path.join("uploads", "mcq"), exist_ok=True)
+    write_workbook(os.path.join("uploads", "mcq", "questions.xlsx"), args.questions)
+    write_problems(args.problems, rng)
+
+    judge_port, port = free_port(), free_port()
+    judge = subprocess.Popen([sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "fake_judge.py"),
+                              "--port", str(judge_port), "--latency", str(args.judge_latency),
+                              "--jitter", str(args.judge_latency / 2), "--error-rate", str(args.judge_error_rate)])
+    server = start_server(args, port, f"http://127.0.0.1:{judge_port}")
+    try:
+        wait_ready(port, timeout=120)
+        deadline_barrier = multiprocessing.Barrier(args.students)
+        results, stop = multiprocessing.Queue(), multiprocessing.Event()
+        admin = multiprocessing.Process(target=admin_process, args=(port, args.admin_interval, stop, results))
+        clients = [multiprocessing.Process(target=client_process,
+                                           args=(port, range(i, args.students, args.clients), args, deadline_barrier, results))
+                   for i in range(args.clients)]
+        start = time.perf_counter()
+        admin.start()
+        for p in clients:
+            p.start()
+        records = []
+        for _ in clients:
+            records += results.get()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        records += results.get()
+        for p in clients + [admin]:
+            p.join()
+    finally:
+        server.terminate()
+        judge.terminate()
+        server.wait()
+        judge.wait()
+
+    scenario = {k: getattr(args, k) for k in ("students", "problems", "questions", "checks", "think", "server",
+                                              "workers", "threads", "judge_latency", "judge_error_rate", "seed")}
+    scenario["storage"] = "mongo" if args.mongo_uri else "sqlite"
+    endpoints = summarize(records, elapsed)
+    result = {"revision": git_revision(), "date": datetime.now().isoformat(timespec="seconds"),
+              "elapsed_seconds": round(elapsed, 2), "requests": len(records), "scenario": scenario,
+              "endpoints": endpoints}
+
+    rows = [(label, f"{e['count']:6d} req {e['per_sec']:8.1f}/s   p50 {e['p50_ms']:8.1f}   p95 {e['p95_ms']:8.1f}   "
+                    f"p99 {e['p99_ms']:8.1f} ms   errors {e['errors']}") for label, e in endpoints.items()]
+    report(f"Contest: {args.students} students, {args.server} x{args.workers}, {elapsed:.1f}s, "
+           f"{len(records) / elapsed:.0f} req/s overall", rows)
+
+    name = f"{datetime.now():%Y%m%d-%H%M%S}-{result['revision']}.json"
+    previous = args.compare or previous_result(exclude=name)
+    if previous:
+        compare(result, previous)
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        with open(os.path.join(RESULTS_DIR, name), "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved benchmarks/results/{name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Throughput and latency of the local executor per language and pool size.
+
+Run from the backend directory:  python benchmarks/bench_executor.py --workers 2 4
+"""
+import shutil
+import argparse
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import report
+from executor import LocalExecutor
+
+PROGRAMS = {
+    "py": "n = int(input())\nprint(sum(i * i for i in range(n)))\n",
+    "c": "#include <stdio.h>\nint main(){long n,s=0;scanf(\"%ld\",&n);for(long i=0;i<n;i++)s+=i*i;printf(\"%ld\\n\",s);return 0;}\n",
+    "cpp": "#include <iostream>\nint main(){long n,s=0;std::cin>>n;for(long i=0;i<n;i++)s+=i*i;std::cout<<s<<std::endl;}\n",
+    "java": "import java.util.*;\npublic class Main{public static void main(String[] a){long n=new Scanner(System.in).nextLong(),s=0;for(long i=0;i<n;i++)s+=i*i;System.out.println(s);}}\n",
+}
+TOOLCHAINS = {"py": None, "c": "gcc", "cpp": "g++", "java": "javac"}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--jobs", type=int, default=40, help="submissions per language")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent requesters")
+    parser.add_argument("--sandbox", choices=("namespace", "none"), default="namespace",
+                        help="namespace needs root")
+    parser.add_argument("--python", help="interpreter for Python jobs (must be readable by any user)")
+    args = parser.parse_args()
+
+    languages = [lang for lang, tool in TOOLCHAINS.items() if tool is None or shutil.which(tool)]
+    for workers in args.workers:
+        executor = LocalExecutor(workers=workers, scratch_dir=tempfile.mkdtemp(prefix="ccp_sandbox_"),
+                                 sandbox=args.sandbox, python=args.python)
+        executor.start()
+        rows = []
+        for lang in languages:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(args.clients) as clients:
+                results = list(clients.map(lambda _: executor.run(PROGRAMS[lang], lang, "100000"), range(args.jobs)))
+            elapsed = time.perf_counter() - start
+            accepted = sum(1 for r in results if r.get("status") == "Accepted")
+            stats = executor.stats.snapshot()[lang]
+            rows.append((lang, f"{args.jobs / elapsed:7.1f} runs/s  p50 {stats['p50_ms']:8.1f} ms  "
+                               f"p95 {stats['p95_ms']:8.1f} ms  accepted {accepted}/{args.jobs}"))
+        executor.shutdown()
+        report(f"local executor ({args.sandbox} sandbox), {workers} worker(s), {args.clients} concurrent clients", rows)
+
+
+if __name__ == "__main__":
+    main()
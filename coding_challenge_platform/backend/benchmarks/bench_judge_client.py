@@ -0,0 +1,72 @@
+"""Judge calls through JudgeClient versus one-off requests.post, under failures.
+
+Drives benchmarks/fake_judge.py (or any Judge0-compatible URL given with
+--url) from many threads, once with a fresh connection per call as the
+backend used to do and once through the pooled, retrying JudgeClient.
+
+Run from the backend directory:  python benchmarks/bench_judge_client.py --error-rate 0.1
+"""
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import fake_judge
+from common import report
+from judge_client import JudgeClient
+
+SOURCE = "print(input())"
+
+
+def bare_run(base_url, stdin):
+    try:
+        r = requests.post(f"{base_url}/submissions/?base64_encoded=false&wait=true",
+                          json={"source_code": SOURCE, "language_id": 71, "stdin": stdin}, timeout=10)
+        return {"stdout": r.json().get("stdout")} if r.status_code in [200, 201] else {"error": r.status_code}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def drive(run, calls, clients):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        results = list(pool.map(lambda i: run(str(i)), range(calls)))
+    elapsed = time.perf_counter() - start
+    ok = sum(1 for i, r in enumerate(results) if r.get("stdout") == str(i))
+    return f"{calls / elapsed:7.1f} calls/s   succeeded {ok}/{calls}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="judge to use instead of a local fake_judge")
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--rate", type=float, default=1000, help="JudgeClient token-bucket rate")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        server, base_url = fake_judge.start(latency=args.latency, jitter=args.latency / 2, error_rate=args.error_rate)
+
+    client = JudgeClient(base_url, max_concurrency=args.clients, rate_per_second=args.rate,
+                         backoff_base=0.05, failure_threshold=args.clients * 4)
+    rows = [
+        ("requests.post per call", drive(lambda stdin: bare_run(base_url, stdin), args.calls, args.clients)),
+        ("JudgeClient", drive(lambda stdin: client.run(SOURCE, 71, stdin), args.calls, args.clients)),
+    ]
+    stats = client.stats()
+    rows.append(("  retries / errors", f"{stats['retries']} / {stats['errors']}"))
+    run_latency = stats["latency_seconds"].get("run")
+    if run_latency:
+        rows.append(("  mean attempt latency", f"{run_latency['sum'] / run_latency['count'] * 1000:7.1f} ms"))
+    report(f"{args.calls} judge calls, {args.clients} threads, {args.error_rate:.0%} injected failures", rows)
+    if server:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
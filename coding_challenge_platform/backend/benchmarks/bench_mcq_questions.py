@@ -0,0 +1,70 @@
+"""Requests/sec for /get_mcq_questions: per-request Excel parse vs QuestionBank.
+
+Run from the backend directory:  python benchmarks/bench_mcq_questions.py
+"""
+import os
+import argparse
+
+from openpyxl import Workbook, load_workbook
+
+from common import make_workdir, load_app, rate, report
+
+
+def write_workbook(path, count):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Question ID", "Question Text", "Option A", "Option B", "Option C", "Option D", "Correct Answer"])
+    for i in range(1, count + 1):
+        ws.append([i, f"What is the output of snippet #{i}?", f"{i}", f"{i + 1}", f"{i + 2}", f"{i + 3}", f"{i + 1}"])
+    wb.save(path)
+
+
+def legacy_get_mcq_questions(app_module, file_path):
+    # The previous implementation: open and normalize the workbook on every hit
+    from question_bank import normalize_header
+    wb = load_workbook(file_path)
+    ws = wb.active
+    header_map = {i: normalize_header(h) for i, h in enumerate(cell.value for cell in ws[1]) if h}
+    questions = []
+    for row in ws.iter_rows(min_row=2, values_only=True):
+        if any(row):
+            question = {header_map[i]: v for i, v in enumerate(row) if i in header_map}
+            if question.get('question_text'):
+                question.setdefault('id', len(questions) + 1)
+                questions.append(question)
+    return app_module.jsonify(questions)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    make_workdir()
+    app_module = load_app()
+    app = app_module.app
+    file_path = os.path.join(app_module.UPLOAD_FOLDER, "mcq", "questions.xlsx")
+    write_workbook(file_path, args.questions)
+
+    app.add_url_rule("/legacy_get_mcq_questions", "legacy_get_mcq_questions",
+                     lambda: legacy_get_mcq_questions(app_module, file_path))
+    client = app.test_client()
+    # Both routes need a session: the test client keeps the login cookie
+    client.post("/admin_login", json={"username": app_module.ADMIN_USERNAME, "password": app_module.ADMIN_PASSWORD})
+
+    # Students no longer get the answer key with the questions
+    legacy = [{k: v for k, v in q.items() if k != "correct_answer"} for q in client.get("/legacy_get_mcq_questions").get_json()]
+    assert legacy == client.get("/get_mcq_questions").get_json()
+
+    before, _ = rate(lambda: client.get("/legacy_get_mcq_questions"), args.requests)
+    after, _ = rate(lambda: client.get("/get_mcq_questions"), args.requests)
+    report(f"/get_mcq_questions ({args.questions} questions, {args.requests} requests)", [
+        ("parse per request", f"{before:10.1f} req/s"),
+        ("QuestionBank", f"{after:10.1f} req/s"),
+        ("speedup", f"{after / before:10.1f}x"),
+    ])
+
+
+if __name__ == "__main__":
+    main()
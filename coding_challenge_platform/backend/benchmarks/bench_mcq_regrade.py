@@ -0,0 +1,93 @@
+"""MCQ regrade: every stored attempt rescored after an answer-key fix.
+
+Fills a scratch SQLite database (or MONGO_URI) with attempts graded against
+one key, flips some answers in the key and regrades, once per attempt with
+plain Python and once as a NumPy matrix (when NumPy is installed). Each
+run writes its changes with a single bulk write.
+
+Run from the backend directory:  python benchmarks/bench_mcq_regrade.py --attempts 50000
+"""
+import os
+import time
+import uuid
+import random
+import argparse
+from datetime import datetime
+
+from common import make_workdir, report
+from storage import create_storage
+import mcq_grader
+from mcq_grader import AnswerKey, answers_list, regrade
+
+
+def make_questions(count, rng, wrong_keys=0):
+    questions = []
+    for i in range(1, count + 1):
+        options = [f"answer {i}.{n}" for n in range(4)]
+        questions.append({"id": i, "question_text": f"Question {i}", "optionA": options[0], "optionB": options[1],
+                          "optionC": options[2], "optionD": options[3], "correct_answer": options[i % 4]})
+    # The uploaded key had a few wrong answers
+    for q in rng.sample(questions, wrong_keys):
+        q["correct_answer"] = q["optionA"] if q["correct_answer"] != q["optionA"] else q["optionB"]
+    return questions
+
+
+def fill(storage, questions, attempts, rng, batch_size=5000):
+    key = AnswerKey(questions)
+    batch = {}
+    for n in range(attempts):
+        answers = answers_list({q["id"]: q[rng.choice(mcq_grader.OPTION_FIELDS)]
+                                for q in questions if rng.random() < 0.9})
+        fields = key.grade(answers)
+        fields.update(answers=answers, timestamp=datetime.now())
+        batch[(f"student{n}", "MCQ")] = fields
+        if len(batch) >= batch_size:
+            storage.bulk_upsert_scores(batch)
+            batch = {}
+    storage.bulk_upsert_scores(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--attempts", type=int, default=50000)
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--wrong-keys", type=int, default=3, help="answers fixed in the corrected key")
+    args = parser.parse_args()
+
+    make_workdir()
+    if os.environ.get("MONGO_URI"):
+        storage = create_storage("mongo", uri=os.environ["MONGO_URI"], db_name=f"ccp_bench_{uuid.uuid4().hex[:8]}")
+    else:
+        storage = create_storage("sqlite", path=os.path.abspath("regrade.db"))
+    storage.ensure_indexes()
+
+    rng = random.Random(3)
+    start = time.perf_counter()
+    fill(storage, make_questions(args.questions, random.Random(5), args.wrong_keys), args.attempts, rng)
+    print(f"Stored {args.attempts} attempts in {time.perf_counter() - start:.1f}s\n")
+
+    fixed = AnswerKey(make_questions(args.questions, random.Random(5)))
+    wrong = AnswerKey(make_questions(args.questions, random.Random(5), args.wrong_keys))
+    numpy = mcq_grader.np
+    rows = []
+    for label, module_np in (("python", None), ("numpy", numpy)):
+        if label == "numpy" and numpy is None:
+            rows.append((label, "not installed"))
+            continue
+        mcq_grader.np = module_np
+        for key in (wrong, fixed):  # back to the original key first, so every run has the same changes to write
+            key.array = numpy.array(key.correct, dtype=numpy.int8) if module_np is not None else None
+        regrade(storage, wrong)
+        result = regrade(storage, fixed)
+        rows.append((label, f"{result['seconds']:6.2f} s   (read {result['read_seconds']:.2f}, "
+                            f"grade {result['grade_seconds']:.2f}, write {result['write_seconds']:.2f})   "
+                            f"{result['attempts'] / result['seconds']:8.0f} attempts/s   {result['changed']} changed"))
+    mcq_grader.np = numpy
+    report(f"Regrade {args.attempts} attempts x {args.questions} questions, {args.wrong_keys} keys fixed", rows)
+
+    if os.environ.get("MONGO_URI"):
+        storage.db.client.drop_database(storage.db.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Plagiarism detection: pairwise difflib vs the MinHash/LSH similarity index.
+
+Generates independent solutions per problem plus planted rings of copies
+(identifiers renamed, lines added and edited), indexes them all, and reports
+ingest cost, query time, and how many planted copies were caught.
+
+Run from the backend directory:  python benchmarks/bench_plagiarism.py --submissions 5000
+"""
+import time
+import random
+import difflib
+import argparse
+
+from common import report
+from plagiarism import SimilarityIndex
+
+STARTER = "def solve(data):\n    # TODO: fix me\n    return 0\n\nprint(solve(input().split()))\n"
+STATEMENTS = [
+    "{a} = {b} + {n}",
+    "{a} = {b} * {c} - {n}",
+    "if {a} > {b}:\n{i}    {c} = {a}",
+    "for {a} in range({n}):\n{i}    {b} += {a} % {m}",
+    "while {a} < {n}:\n{i}    {a} += {m}",
+    "{a}.append({b} // {m})",
+    "{a} = sorted({b})[:{m}]",
+    "{a} = max({b}, {c}) if {b} else {n}",
+    "print({a}, {b})",
+    "{a} = [{x} * {m} for {x} in {b}]",
+]
+
+
+def write_solution(rng, names, lines):
+    out = ["def solve(data):"]
+    for _ in range(lines):
+        picks = rng.sample(names, 4)
+        stmt = rng.choice(STATEMENTS).format(a=picks[0], b=picks[1], c=picks[2], x=picks[3], i="    ",
+                                             n=rng.randint(1, 99), m=rng.randint(2, 9))
+        out.append("    " + stmt)
+    out.append(f"    return {rng.choice(names)}")
+    out.append("")
+    out.append("print(solve(input().split()))")
+    return "\n".join(out) + "\n"
+
+
+def disguise(code, rng, edits):
+    """A copy with every identifier renamed and a few lines added or changed."""
+    renamed = code
+    for name in ("total", "count", "best", "items", "acc", "tmp", "value", "result"):
+        renamed = renamed.replace(name, f"{name}_{rng.randint(0, 9)}")
+    lines = renamed.splitlines()
+    for _ in range(edits):
+        i = rng.randrange(1, len(lines) - 2)
+        if rng.random() < 0.5:
+            lines.insert(i, f"    # step {rng.randint(0, 99)}")
+        else:
+            lines[i] = lines[i].replace("+", "-", 1)
+    return "\n".join(lines) + "\n"
+
+
+def make_submissions(count, problems, ring_size, rings_per_problem, rng):
+    names = ["total", "count", "best", "items", "acc", "tmp", "value", "result"]
+    submissions, rings = [], []
+    per_problem = count // problems
+    for p in range(problems):
+        problem = f"problem{p}.py"
+        originals = per_problem - rings_per_problem * (ring_size - 1)
+        codes = [write_solution(rng, names, rng.randint(8, 25)) for _ in range(originals)]
+        for r in range(rings_per_problem):
+            source = codes[r]
+            ring = {f"{problem}:{r}"}
+            for _ in range(ring_size - 1):
+                codes.append(disguise(source, rng, edits=rng.randint(0, 2)))
+                ring.add(f"{problem}:{len(codes) - 1}")
+            rings.append(ring)
+        for n, code in enumerate(codes):
+            submissions.append((f"user{p}_{n}", problem, f"{problem}:{n}", code))
+    rng.shuffle(submissions)
+    return submissions, rings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--submissions", type=int, default=5000)
+    parser.add_argument("--problems", type=int, default=5)
+    parser.add_argument("--ring-size", type=int, default=3)
+    parser.add_argument("--rings", type=int, default=10, help="planted copy rings per problem")
+    parser.add_argument("--pairwise-sample", type=int, default=300,
+                        help="submissions of one problem compared pairwise with difflib")
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    submissions, rings = make_submissions(args.submissions, args.problems, args.ring_size, args.rings, rng)
+
+    index = SimilarityIndex(None, ".", base_texts=lambda r, l, p: [STARTER], threshold=args.threshold)
+    start = time.perf_counter()
+    for username, problem, path, code in submissions:
+        index.add(username, "debug", "py", problem, path, code)
+    ingest = time.perf_counter() - start
+
+    start = time.perf_counter()
+    clusters = index.clusters()
+    query = time.perf_counter() - start
+
+    flagged = [{s["path"] for s in cluster["submissions"]} for cluster in clusters]
+    caught = sum(1 for ring in rings if any(ring <= group for group in flagged))
+    planted = set().union(*rings)
+    false_positives = sum(1 for group in flagged for path in group if path not in planted)
+
+    # Pairwise difflib on a sample, extrapolated to all pairs within each problem
+    first = submissions[0][1]
+    sample = [code for _, problem, _, code in submissions if problem == first][:args.pairwise_sample]
+    start = time.perf_counter()
+    for i in range(len(sample)):
+        matcher = difflib.SequenceMatcher(None, sample[i])
+        for j in range(i + 1, len(sample)):
+            matcher.set_seq1(sample[j])
+            matcher.quick_ratio() >= args.threshold and matcher.ratio()
+    per_pair = (time.perf_counter() - start) / max(1, len(sample) * (len(sample) - 1) // 2)
+    per_problem = len(submissions) / args.problems
+    pairwise_total = per_pair * args.problems * per_problem * (per_problem - 1) / 2
+
+    report(f"{len(submissions)} submissions, {args.problems} problems, {len(rings)} planted rings of {args.ring_size}", [
+        ("index, ingest all", f"{ingest:8.2f} s   ({ingest / len(submissions) * 1000:.2f} ms per file)"),
+        ("index, list clusters", f"{query * 1000:8.2f} ms   ({len(clusters)} clusters)"),
+        ("rings caught", f"{caught}/{len(rings)}   ({false_positives} unplanted files flagged)"),
+        ("difflib, all pairs", f"{pairwise_total:8.2f} s   (extrapolated from {len(sample)} files, "
+                               f"{per_pair * 1e6:.0f} us per pair)"),
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Storage backends under concurrent submit load: SQLite (WAL) vs MongoDB.
+
+Each thread plays one participant submitting round scores and reading its
+own scores back, like /submit_* followed by /student/scores.
+
+Run from the backend directory:  python benchmarks/bench_storage.py
+MongoDB is included when MONGO_URI is set (a throwaway database is used).
+"""
+import os
+import time
+import uuid
+import argparse
+import threading
+from datetime import datetime
+
+from common import make_workdir, report
+from storage import create_storage
+
+ROUNDS = ["MCQ", "Scramble", "Debugging"]
+
+
+def submit_load(storage, threads, writes_per_thread):
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads + 1)
+
+    def participant(i):
+        username = f"team{i}"
+        mine = []
+        barrier.wait()
+        for n in range(writes_per_thread):
+            start = time.perf_counter()
+            storage.upsert_score(username, ROUNDS[n % len(ROUNDS)], {
+                "score": n, "remaining_time": 600 - n, "timestamp": datetime.now()})
+            list(storage.find_scores(username=username))
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    workers = [threading.Thread(target=participant, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "ops_per_sec": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--writes", type=int, default=200, help="submissions per thread")
+    args = parser.parse_args()
+
+    make_workdir()
+    backends = [("sqlite", lambda: create_storage("sqlite", path="bench.db"))]
+    if os.environ.get("MONGO_URI"):
+        db_name = f"bench_{uuid.uuid4().hex[:8]}"
+        backends.append(("mongo", lambda: create_storage("mongo", uri=os.environ["MONGO_URI"], db_name=db_name)))
+
+    rows = []
+    for name, factory in backends:
+        storage = factory()
+        storage.ensure_indexes()
+        for threads in args.threads:
+            storage.delete_scores()
+            result = submit_load(storage, threads, args.writes)
+            rows.append((f"{name:6} {threads:3} threads",
+                         f"{result['ops_per_sec']:9.0f} submit+read/s   "
+                         f"p50 {result['p50_ms']:7.2f} ms   p99 {result['p99_ms']:7.2f} ms"))
+        if name == "mongo":
+            storage.client.drop_database(storage.db.name)
+        storage.close()
+    report(f"Storage backends, {args.writes} submissions per participant", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Large frontend submissions: one multipart POST vs chunked /uploads.
+
+Starts gunicorn (one worker) on a scratch SQLite database and uploads the
+same file both ways, reporting time and the worker's peak memory. Then it
+cuts the connection partway through the upload and counts how many bytes
+have to be sent again to finish it.
+
+Run from the backend directory:  python benchmarks/bench_uploads.py --mb 64
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import argparse
+import subprocess
+import http.client
+
+from common import BACKEND_DIR, make_workdir, report
+from bench_workers import free_port, wait_ready
+
+
+def peak_rss_mb(server):
+    """Peak resident memory of gunicorn's worker processes (Linux only)."""
+    peak = 0
+    for pid in os.listdir("/proc"):
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                if int(f.read().rsplit(")", 1)[1].split()[1]) != server.pid:
+                    continue
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        peak = max(peak, int(line.split()[1]) / 1024)
+        except (OSError, ValueError, IndexError):
+            continue
+    return peak
+
+
+def call(conn, method, path, body=None, headers=None):
+    conn.request(method, path, body, headers or {})
+    response = conn.getresponse()
+    return response.status, json.loads(response.read() or b"null")
+
+
+def multipart(conn, auth, path, filename):
+    boundary = uuid.uuid4().hex
+    head = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n").encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    with open(path, "rb") as f:
+        body = head + f.read() + tail
+    return call(conn, "POST", "/submit_frontend", body,
+                dict(auth, **{"Content-Type": f"multipart/form-data; boundary={boundary}"}))
+
+
+def chunked(conn, auth, path, filename, drop_at=None, port=None):
+    """Upload in chunks; with drop_at, cut the connection inside the chunk at that byte. Returns bytes sent."""
+    size = os.path.getsize(path)
+    json_headers = dict(auth, **{"Content-Type": "application/json"})
+    _, upload = call(conn, "POST", "/uploads", json.dumps({"round": "frontend", "filename": filename, "size": size}),
+                     json_headers)
+    upload_id, chunk_size = upload["upload_id"], upload["chunk_size"]
+    sent = offset = 0
+    with open(path, "rb") as f:
+        while offset < size:
+            f.seek(offset)
+            chunk = f.read(chunk_size)
+            if drop_at is not None and offset <= drop_at < offset + len(chunk):
+                # Send part of the chunk on a raw socket and hang up, as a dropped Wi-Fi link would
+                cut = drop_at - offset
+                with socket.create_connection(("127.0.0.1", port)) as raw:
+                    raw.sendall((f"PUT /uploads/{upload_id}?offset={offset} HTTP/1.1\r\nHost: x\r\n"
+                                 f"Authorization: {auth['Authorization']}\r\nContent-Length: {len(chunk)}\r\n\r\n").encode()
+                                + chunk[:cut])
+                sent += cut
+                drop_at = None
+                time.sleep(0.5)
+                offset = call(conn, "GET", f"/uploads/{upload_id}", headers=auth)[1]["offset"]
+                continue
+            status, state = call(conn, "PUT", f"/uploads/{upload_id}?offset={offset}", chunk, auth)
+            sent += len(chunk)
+            offset = state["offset"]
+    status, body = call(conn, "POST", f"/uploads/{upload_id}/complete", headers=auth)
+    assert status == 200, body
+    return sent
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=int, default=64, help="size of the uploaded file")
+    parser.add_argument("--chunk-mb", type=float, default=4)
+    parser.add_argument("--drop-at", type=float, default=0.9, help="fraction of the file sent before the drop")
+    args = parser.parse_args()
+
+    make_workdir()
+    path = os.path.abspath("site.zip")
+    with open(path, "wb") as f:
+        for _ in range(args.mb):
+            f.write(os.urandom(1024 * 1024))
+    size = os.path.getsize(path)
+
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY="1", GUNICORN_THREADS="4",
+               STORAGE_BACKEND="sqlite", SQLITE_PATH=os.path.abspath("uploads.db"), GUNICORN_ACCESS_LOG="",
+               GUNICORN_LOG_LEVEL="warning", FRONTEND_UPLOAD_MAX_MB=str(args.mb + 1),
+               FRONTEND_QUOTA_MB=str(args.mb * 10), UPLOAD_CHUNK_MB=str(args.chunk_mb),
+               SESSION_SECRET="benchmark-session-secret")
+    rows = []
+    for mode in ("multipart", "chunked"):
+        # A fresh server each time, so peak memory is this mode's alone
+        server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", os.path.join(BACKEND_DIR, "gunicorn.conf.py"),
+                                   "--pythonpath", BACKEND_DIR, "wsgi:app"], env=env)
+        try:
+            wait_ready(port)
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+            credentials = json.dumps({"username": "student1", "password": "bench"})
+            call(conn, "POST", "/student_signup", credentials, {"Content-Type": "application/json"})
+            _, login = call(conn, "POST", "/student_login", credentials, {"Content-Type": "application/json"})
+            auth = {"Authorization": f"Bearer {login['token']}"}
+            idle = peak_rss_mb(server)
+            start = time.perf_counter()
+            if mode == "multipart":
+                status, body = multipart(conn, auth, path, "site.zip")
+                assert status == 200, body
+            else:
+                chunked(conn, auth, path, "site.zip")
+            elapsed = time.perf_counter() - start
+            rows.append((mode, f"{elapsed:6.2f} s   {size / elapsed / 1024 / 1024:7.1f} MB/s   "
+                               f"worker peak {peak_rss_mb(server):6.0f} MB (idle {idle:.0f} MB)"))
+            if mode == "chunked":
+                sent = chunked(conn, auth, path, "site2.zip", drop_at=int(size * args.drop_at), port=port)
+                rows.append((f"dropped at {args.drop_at:.0%}", f"{sent / 1024 / 1024:6.1f} MB sent in total "
+                                                               f"(multipart would send {size * (1 + args.drop_at) / 1024 / 1024:.1f} MB)"))
+        finally:
+            server.terminate()
+            server.wait()
+    report(f"{args.mb} MB frontend submission, {args.chunk_mb:g} MB chunks", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Throughput of the gunicorn deployment as the worker count grows.
+
+Starts ``gunicorn -c gunicorn.conf.py wsgi:app`` against a scratch SQLite
+database for each worker count and drives it from separate client
+processes with a mix of question fetches, leaderboard reads and MCQ score
+submissions.
+
+Run from the backend directory:  python benchmarks/bench_workers.py
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import subprocess
+import http.client
+import multiprocessing
+
+from common import BACKEND_DIR, make_workdir, report
+from bench_mcq_questions import write_workbook
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/readyz")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("gunicorn did not become ready")
+
+
+def login(conn, username):
+    """Sign up and log in; returns the headers that carry the session token."""
+    credentials = json.dumps({"username": username, "password": "bench"})
+    for path in ("/student_signup", "/student_login"):
+        conn.request("POST", path, credentials, {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        body = response.read()
+    return {"Authorization": f"Bearer {json.loads(body)['token']}"}
+
+
+def client(port, seconds, client_id, results):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    auth = login(conn, f"client{client_id}")
+    deadline = time.monotonic() + seconds
+    done = errors = 0
+    while time.monotonic() < deadline:
+        step = done % 4
+        if step == 0:
+            body = json.dumps({"username": f"client{client_id}", "answers": {"1": str(done % 4 + 1)}})
+            conn.request("POST", "/submit_mcq_score", body, {"Content-Type": "application/json", **auth})
+        elif step == 1:
+            conn.request("GET", "/leaderboard?limit=20")
+        else:
+            conn.request("GET", "/get_mcq_questions", headers=auth)
+        response = conn.getresponse()
+        response.read()
+        if response.status >= 400:
+            errors += 1
+        done += 1
+    results.put((done, errors))
+
+
+def run(workers, threads, clients, seconds):
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads),
+               STORAGE_BACKEND="sqlite", SQLITE_PATH=os.path.abspath("bench.db"),
+               GUNICORN_ACCESS_LOG="", GUNICORN_LOG_LEVEL="warning",
+               SESSION_SECRET="benchmark-session-secret")
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", os.path.join(BACKEND_DIR, "gunicorn.conf.py"),
+                               "--pythonpath", BACKEND_DIR, "wsgi:app"], env=env)
+    try:
+        wait_ready(port)
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=client, args=(port, seconds, i, results)) for i in range(clients)]
+        for p in procs:
+            p.start()
+        totals = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+    finally:
+        server.terminate()
+        server.wait()
+    return sum(t[0] for t in totals) / seconds, sum(t[1] for t in totals)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    make_workdir()
+    os.makedirs(os.path.join("uploads", "mcq"), exist_ok=True)
+    write_workbook(os.path.join("uploads", "mcq", "questions.xlsx"), 100)
+
+    rows = []
+    baseline = None
+    for workers in args.workers:
+        throughput, errors = run(workers, args.threads, args.clients, args.seconds)
+        baseline = baseline or throughput
+        rows.append((f"{workers} workers x {args.threads} threads",
+                     f"{throughput:9.0f} req/s   {throughput / baseline:5.2f}x   errors {errors}"))
+    report(f"gunicorn wsgi:app, {args.clients} keep-alive clients, {args.seconds:g}s each", rows)
+
+
+if __name__ == "__main__":
+    main()
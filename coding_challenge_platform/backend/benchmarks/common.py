@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def make_workdir():
+    """Create a scratch directory and chdir into it so uploads/ lands there."""
+    workdir = tempfile.mkdtemp(prefix="ccp_bench_")
+    os.chdir(workdir)
+    return workdir
+
+
+def load_app():
+    import app as app_module
+    # Only the upload folders: init_db() would also wait on MongoDB for indexes
+    os.makedirs(os.path.join(app_module.UPLOAD_FOLDER, "mcq"), exist_ok=True)
+    return app_module
+
+
+def rate(fn, requests_count):
+    start = time.perf_counter()
+    for _ in range(requests_count):
+        fn()
+    elapsed = time.perf_counter() - start
+    return requests_count / elapsed, elapsed
+
+
+def report(title, rows):
+    print(title)
+    print("-" * len(title))
+    width = max(len(name) for name, _ in rows)
+    for name, value in rows:
+        print(f"{name.ljust(width)}  {value}")
+    print()
@@ -0,0 +1,116 @@
+"""A Judge0-compatible stand-in for load tests.
+
+Implements the three calls the backend makes (``POST /submissions?wait=true``,
+``POST /submissions/batch`` and ``GET /submissions/batch?tokens=...``) and
+echoes stdin as stdout, with configurable latency and failure rate. Point the
+backend at it with ``JUDGE0_URL=http://127.0.0.1:2358``.
+
+    python benchmarks/fake_judge.py --port 2358 --latency 0.2 --error-rate 0.1
+"""
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+ACCEPTED = {"id": 3, "description": "Accepted"}
+
+
+class FakeJudge(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.1, jitter=0.05, error_rate=0.0, error_status=503):
+        super().__init__(address, Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.results = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def run_submission(self, submission):
+        stdin = submission.get("stdin") or ""
+        return {"stdout": stdin, "stderr": None, "compile_output": None, "status": ACCEPTED, "time": "0.01"}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=None):
+        payload = json.dumps(body if body is not None else {}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _simulate(self):
+        """Sleep like a judge would; True if this request should fail."""
+        server = self.server
+        with server.lock:
+            server.requests += 1
+        time.sleep(max(0.0, server.latency + random.uniform(-server.jitter, server.jitter)))
+        return random.random() < server.error_rate
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if self._simulate():
+            return self._reply(self.server.error_status, {"error": "simulated failure"})
+        path = urlparse(self.path).path.rstrip("/")
+        if path == "/submissions":
+            return self._reply(201, self.server.run_submission(body))
+        if path == "/submissions/batch":
+            tokens = []
+            with self.server.lock:
+                for submission in body.get("submissions", []):
+                    token = uuid.uuid4().hex
+                    self.server.results[token] = self.server.run_submission(submission)
+                    tokens.append({"token": token})
+            return self._reply(201, tokens)
+        self._reply(404, {"error": "not found"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/submissions/batch":
+            return self._reply(404, {"error": "not found"})
+        if self._simulate():
+            return self._reply(self.server.error_status, {"error": "simulated failure"})
+        tokens = parse_qs(url.query).get("tokens", [""])[0].split(",")
+        with self.server.lock:
+            submissions = [self.server.results.get(t, {"status": {"id": 0, "description": "Unknown"}})
+                           for t in tokens]
+        self._reply(200, {"submissions": submissions})
+
+
+def start(port=0, **options):
+    """Start a FakeJudge on a background thread; returns (server, base_url)."""
+    server = FakeJudge(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=2358)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+    server = FakeJudge(("0.0.0.0", args.port), latency=args.latency, jitter=args.jitter,
+                       error_rate=args.error_rate, error_status=args.error_status)
+    print(f"Fake Judge0 listening on :{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Submitted files stored once per distinct content.
+
+A blob is saved at ``<root>/<ab>/<cd>/<sha256>`` (the first two byte pairs
+of its digest as directories, so no folder grows past a few hundred
+entries). Submissions are catalog entries that name a blob by its sha256:
+a student resubmitting the same code adds an entry, not a file.
+
+The catalog keeps a reference count per blob (see storage.py). ``gc()``
+deletes blobs nobody references any more, after a grace period that
+covers a blob written just before its catalog entry. ``compact()`` moves
+files saved before the blob store into it.
+"""
+import os
+import time
+import hashlib
+import threading
+
+
+def _digest_ok(digest):
+    return isinstance(digest, str) and len(digest) == 64 and all(c in "0123456789abcdef" for c in digest)
+
+
+class BlobStore:
+    def __init__(self, root, grace_seconds=3600, chunk_size=64 * 1024):
+        self.root = root
+        self.grace_seconds = grace_seconds
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self._stats = {"stored": 0, "deduplicated": 0, "bytes_stored": 0, "bytes_deduplicated": 0}
+
+    def path(self, digest):
+        if not _digest_ok(digest):
+            raise ValueError(f"not a sha256 digest: {digest!r}")
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        return _digest_ok(digest) and os.path.exists(self.path(digest))
+
+    def _count(self, stored, size):
+        with self._lock:
+            if stored:
+                self._stats["stored"] += 1
+                self._stats["bytes_stored"] += size
+            else:
+                self._stats["deduplicated"] += 1
+                self._stats["bytes_deduplicated"] += size
+
+    def _keep(self, digest, tmp_path, size):
+        """Move tmp_path to the blob for digest, or drop it if that content is already stored."""
+        target = self.path(digest)
+        try:
+            # Refresh the mtime so gc() leaves the blob alone until it is referenced
+            os.utime(target)
+            os.remove(tmp_path)
+            self._count(False, size)
+            return
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(tmp_path, target)
+        self._count(True, size)
+
+    def put_stream(self, stream):
+        """Store everything read from stream; returns (sha256, size)."""
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = os.path.join(self.root, f".{os.getpid()}.{threading.get_ident()}.tmp")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                for piece in iter(lambda: stream.read(self.chunk_size), b""):
+                    digest.update(piece)
+                    f.write(piece)
+                    size += len(piece)
+            self._keep(digest.hexdigest(), tmp_path, size)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return digest.hexdigest(), size
+
+    def put(self, data):
+        """Store bytes (or text, as UTF-8); returns (sha256, size)."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        if self.exists(digest):
+            try:
+                os.utime(self.path(digest))
+                self._count(False, len(data))
+                return digest, len(data)
+            except FileNotFoundError:
+                pass  # collected meanwhile: write it again
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = os.path.join(self.root, f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            self._keep(digest, tmp_path, len(data))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return digest, len(data)
+
+    def put_file(self, path, digest=None):
+        """Move an existing file (same filesystem) into the store; returns (sha256, size).
+
+        Pass digest when it is already known (a checked chunked upload) to
+        skip reading the file again.
+        """
+        size = os.path.getsize(path)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for piece in iter(lambda: f.read(1024 * 1024), b""):
+                    h.update(piece)
+            digest = h.hexdigest()
+        self._keep(digest, path, size)
+        return digest, size
+
+    def open(self, digest):
+        return open(self.path(digest), "rb")
+
+    def read_text(self, digest):
+        with open(self.path(digest), "r", encoding="utf-8", errors="replace") as f:
+            return f.read()
+
+    # ---------- housekeeping ----------
+    def iter_digests(self):
+        """Every blob on disk."""
+        if not os.path.isdir(self.root):
+            return
+        for first in os.scandir(self.root):
+            if not first.is_dir():
+                continue
+            for second in os.scandir(first.path):
+                if not second.is_dir():
+                    continue
+                for entry in os.scandir(second.path):
+                    if _digest_ok(entry.name):
+                        yield entry.name
+
+    def _collect(self, storage, digest, now):
+        """Delete one blob if it is still unreferenced and past the grace period."""
+        path = self.path(digest)
+        parked = f"{path}.gc"
+        try:
+            # Out of reach of put() first (it rewrites a missing blob), then re-check
+            os.replace(path, parked)
+        except FileNotFoundError:
+            return 0
+        try:
+            stat = os.stat(parked)
+            if now - stat.st_mtime < self.grace_seconds or storage.blob_refs(digest) > 0:
+                os.replace(parked, path)
+                return 0
+            os.remove(parked)
+        except BaseException:
+            if os.path.exists(parked) and not os.path.exists(path):
+                os.replace(parked, path)
+            raise
+        return stat.st_size
+
+    def gc(self, storage, dry_run=False):
+        """Delete unreferenced blobs; returns {"blobs": n, "bytes": n}.
+
+        Candidates are blobs whose catalog count dropped to zero, plus files
+        on disk the catalog never counted (a put() whose entry was never written).
+        """
+        now = time.time()
+        candidates = set(storage.unreferenced_blobs())
+        counted_zero = set(candidates)
+        for digest in self.iter_digests():
+            if digest not in candidates and storage.blob_refs(digest) <= 0:
+                candidates.add(digest)
+        deleted = freed = 0
+        for digest in sorted(candidates):
+            if dry_run:
+                try:
+                    stat = os.stat(self.path(digest))
+                except FileNotFoundError:
+                    continue
+                if now - stat.st_mtime >= self.grace_seconds:
+                    deleted += 1
+                    freed += stat.st_size
+                continue
+            size = self._collect(storage, digest, now)
+            if size or not os.path.exists(self.path(digest)):
+                if digest in counted_zero:
+                    storage.forget_blob(digest)
+                if size:
+                    deleted += 1
+                    freed += size
+        return {"blobs": deleted, "bytes": freed}
+
+    def compact(self, storage, upload_root, trees):
+        """Move catalogued files under upload_root/<tree> into the store.
+
+        The catalog entry keeps its path (the name admins see) and gets the
+        blob's digest; the old file is removed. Returns counts and bytes.
+        """
+        moved = fixed = before = 0
+        stored_before = self._stats["bytes_stored"]
+        docs, _ = storage.query_submissions(with_sha256=True)
+        for doc in list(docs):
+            path = doc.get("path") or ""
+            if not any(path.startswith(f"{tree}/") for tree in trees):
+                continue
+            full_path = os.path.join(upload_root, path)
+            if not os.path.isfile(full_path):
+                continue
+            before += os.path.getsize(full_path)
+            digest, size = self.put_file(full_path)
+            if digest != doc.get("sha256") or size != doc.get("size"):
+                # Changed on disk since it was catalogued: the entry follows the file
+                storage.put_submission(dict(doc, sha256=digest, size=size))
+                fixed += 1
+            moved += 1
+        after = self._stats["bytes_stored"] - stored_before
+        return {"files": moved, "entries_updated": fixed, "bytes_before": before, "bytes_added": after}
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,325 @@
+"""Resumable uploads sent as a series of chunks.
+
+A client opens an upload with the file's name and size, then sends the
+bytes in order with ``write(upload_id, offset, stream)``. Each chunk goes
+straight from the request stream to ``<root>/<id>.part`` while a SHA-256
+is updated. If the connection drops, the bytes already on disk are kept:
+the client reads back the offset and carries on from there. ``finish()``
+checks that the size (and the hash, if the client sent one) match and
+renames the part file to its destination in a single step.
+
+The state of an upload lives in ``<root>/<id>.json`` next to the data, so
+any worker can take the next chunk. Only the running hash is kept in
+memory; a worker that doesn't have it re-reads the part file once.
+"""
+import os
+import json
+import time
+import uuid
+import hashlib
+import secrets
+import threading
+
+from judge_queue import pid_alive
+
+
+class UploadError(Exception):
+    status = 400
+
+    def __init__(self, message, status=None, **details):
+        super().__init__(message)
+        if status is not None:
+            self.status = status
+        self.details = details
+
+
+class QuotaExceeded(UploadError):
+    status = 413
+
+
+class OffsetMismatch(UploadError):
+    """The chunk doesn't start where the file on disk ends (details["offset"])."""
+    status = 409
+
+
+class ChunkedUploads:
+    def __init__(self, root, limits, quotas=None, chunk_size=4 * 1024 * 1024, ttl=24 * 3600,
+                 piece_size=64 * 1024):
+        self.root = root
+        self.limits = limits          # round -> largest file accepted, in bytes
+        self.quotas = quotas or {}    # round -> bytes one user may have stored in total
+        self.chunk_size = chunk_size  # largest chunk accepted in one request
+        self.ttl = ttl                # uploads idle this long are discarded
+        self.piece_size = piece_size
+        self._hashers = {}            # upload id -> (offset, sha256 of the bytes before it)
+        self._lock = threading.Lock()
+        self._owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        self._purged_at = 0
+        self._stats = {"started": 0, "chunks": 0, "bytes": 0, "resumed": 0, "rehashed": 0,
+                       "finished": 0, "rejected": 0, "purged": 0}
+
+    # ---------- state on disk ----------
+    def _path(self, upload_id, suffix):
+        return os.path.join(self.root, f"{upload_id}{suffix}")
+
+    def _save(self, upload):
+        upload["updated_at"] = time.time()
+        tmp_path = self._path(upload["id"], f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(upload, f)
+        os.replace(tmp_path, self._path(upload["id"], ".json"))
+
+    def get(self, upload_id, owner):
+        """The stored state of one of owner's uploads; 404 UploadError otherwise."""
+        if not upload_id.isalnum():
+            raise UploadError("Unknown upload", 404)
+        try:
+            with open(self._path(upload_id, ".json"), "r", encoding="utf-8") as f:
+                upload = json.load(f)
+        except (FileNotFoundError, ValueError):
+            raise UploadError("Unknown upload", 404)
+        if upload["owner"] != owner:
+            raise UploadError("Unknown upload", 404)
+        return upload
+
+    def _received(self, upload_id):
+        try:
+            return os.path.getsize(self._path(upload_id, ".part"))
+        except FileNotFoundError:
+            return 0
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    # One chunk at a time per upload, across processes (same scheme as JudgeQueue._claim)
+    def _claim(self, upload_id):
+        lock_path = self._path(upload_id, ".lock")
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                with open(lock_path, "r") as f:
+                    pid = int(f.read().split(":")[0])
+            except (OSError, ValueError):
+                return False
+            if pid_alive(pid):
+                return False
+            os.remove(lock_path)
+            return self._claim(upload_id)
+        with os.fdopen(fd, "w") as f:
+            f.write(self._owner)
+        return True
+
+    def _release(self, upload_id):
+        try:
+            os.remove(self._path(upload_id, ".lock"))
+        except FileNotFoundError:
+            pass
+
+    def _discard(self, upload_id):
+        with self._lock:
+            self._hashers.pop(upload_id, None)
+        for suffix in (".part", ".json", ".lock"):
+            try:
+                os.remove(self._path(upload_id, suffix))
+            except FileNotFoundError:
+                pass
+
+    # ---------- quotas ----------
+    def pending_bytes(self, owner, round_name, exclude=None):
+        """Bytes reserved by the owner's unfinished uploads for round_name."""
+        total = 0
+        for upload in self._uploads():
+            if upload["owner"] == owner and upload["round"] == round_name and upload["id"] != exclude:
+                total += upload["size"]
+        return total
+
+    def check_size(self, round_name, size, owner=None, stored=0):
+        """Raise QuotaExceeded if a size-byte file can't be accepted for round_name.
+
+        stored is what the owner already keeps for the round (files it would not replace).
+        """
+        limit = self.limits.get(round_name)
+        if limit is not None and size > limit:
+            self._count("rejected")
+            raise QuotaExceeded(f"File is larger than the {limit // (1024 * 1024)} MB allowed for this round",
+                                limit=limit)
+        quota = self.quotas.get(round_name)
+        if quota is not None and owner is not None:
+            used = stored + self.pending_bytes(owner, round_name)
+            if used + size > quota:
+                self._count("rejected")
+                raise QuotaExceeded(f"Upload would exceed your {quota // (1024 * 1024)} MB quota for this round",
+                                    quota=quota, used=used)
+
+    # ---------- API ----------
+    def start(self, owner, round_name, filename, size, fields=None, sha256=None, stored=0):
+        """Open an upload and return its state (id, size, offset, chunk_size)."""
+        self.purge()
+        if not isinstance(size, int) or size < 0:
+            raise UploadError("size must be the file length in bytes")
+        if sha256 is not None and (not isinstance(sha256, str) or len(sha256) != 64 or not all(c in "0123456789abcdef" for c in sha256.lower())):
+            raise UploadError("sha256 must be a hex digest")
+        self.check_size(round_name, size, owner, stored)
+        os.makedirs(self.root, exist_ok=True)
+        upload = {
+            "id": secrets.token_hex(16),
+            "owner": owner,
+            "round": round_name,
+            "filename": filename,
+            "size": size,
+            "sha256": sha256.lower() if sha256 else None,
+            "fields": fields or {},
+            "created_at": time.time(),
+        }
+        open(self._path(upload["id"], ".part"), "wb").close()
+        self._save(upload)
+        self._count("started")
+        return self.describe(upload)
+
+    def describe(self, upload, offset=None):
+        return {
+            "upload_id": upload["id"],
+            "filename": upload["filename"],
+            "size": upload["size"],
+            "offset": self._received(upload["id"]) if offset is None else offset,
+            "chunk_size": self.chunk_size,
+        }
+
+    def status(self, upload_id, owner):
+        return self.describe(self.get(upload_id, owner))
+
+    def _hasher(self, upload_id, offset):
+        with self._lock:
+            cached = self._hashers.pop(upload_id, None)
+        if cached is not None and cached[0] == offset:
+            return cached[1]
+        # Earlier chunks went to another worker (or this one restarted): hash what is on disk
+        self._count("rehashed")
+        digest = hashlib.sha256()
+        with open(self._path(upload_id, ".part"), "rb") as f:
+            for piece in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(piece)
+        return digest
+
+    def write(self, upload_id, owner, offset, stream, length=None):
+        """Append one chunk read from stream at offset; returns the new state."""
+        upload = self.get(upload_id, owner)
+        if length is not None and length > self.chunk_size:
+            raise QuotaExceeded(f"Chunks may be at most {self.chunk_size} bytes", chunk_size=self.chunk_size)
+        if not self._claim(upload_id):
+            raise UploadError("Another chunk of this upload is being written", 409)
+        try:
+            received = self._received(upload_id)
+            if offset != received:
+                if offset < received:
+                    self._count("resumed")
+                raise OffsetMismatch(f"Expected offset {received}", offset=received)
+            digest = self._hasher(upload_id, received)
+            chunk_end = min(upload["size"], received + self.chunk_size)
+            written = received
+            try:
+                with open(self._path(upload_id, ".part"), "ab") as f:
+                    while True:
+                        piece = stream.read(self.piece_size)
+                        if not piece:
+                            break
+                        if written + len(piece) > chunk_end:
+                            f.truncate(received)
+                            written = received
+                            digest = None
+                            raise QuotaExceeded("Chunk runs past the declared size or the chunk limit",
+                                                offset=received)
+                        f.write(piece)
+                        digest.update(piece)
+                        written += len(piece)
+            finally:
+                # A dropped connection keeps the bytes that arrived: the client resumes after them
+                if digest is not None:
+                    with self._lock:
+                        self._hashers[upload_id] = (written, digest)
+                        self._stats["chunks"] += 1
+                        self._stats["bytes"] += written - received
+            self._save(upload)
+        finally:
+            self._release(upload_id)
+        return self.describe(upload, written)
+
+    def finish(self, upload_id, owner, destination=None, sha256=None):
+        """Check the finished upload and move it to destination (atomic rename).
+
+        Returns (upload, digest). Without destination the data stays at
+        part_path(upload_id) for the caller to consume, then call discard().
+        """
+        upload = self.get(upload_id, owner)
+        if not self._claim(upload_id):
+            raise UploadError("A chunk of this upload is still being written", 409)
+        try:
+            received = self._received(upload_id)
+            if received != upload["size"]:
+                raise OffsetMismatch(f"Upload incomplete: {received} of {upload['size']} bytes",
+                                     offset=received)
+            digest = self._hasher(upload_id, received).hexdigest()
+            expected = (sha256 or upload["sha256"] or "").lower()
+            if expected and expected != digest:
+                # Corrupted in transit: start again from scratch
+                self._discard(upload_id)
+                raise UploadError("Checksum mismatch, upload discarded", 422, sha256=digest)
+            part_path = self._path(upload_id, ".part")
+            with open(part_path, "rb+") as f:
+                os.fsync(f.fileno())
+            if destination is not None:
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                os.replace(part_path, destination)
+                self._discard(upload_id)
+        finally:
+            self._release(upload_id)
+        self._count("finished")
+        upload["sha256"] = digest
+        return upload, digest
+
+    def part_path(self, upload_id):
+        return self._path(upload_id, ".part")
+
+    def cancel(self, upload_id, owner):
+        self.get(upload_id, owner)
+        self._discard(upload_id)
+
+    def discard(self, upload_id):
+        self._discard(upload_id)
+
+    # ---------- housekeeping ----------
+    def _uploads(self):
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.root, name), "r", encoding="utf-8") as f:
+                    yield json.load(f)
+            except (OSError, ValueError):
+                continue
+
+    def purge(self, force=False):
+        """Drop uploads idle for longer than ttl (checked at most once a minute)."""
+        now = time.time()
+        if not force and now - self._purged_at < 60:
+            return 0
+        self._purged_at = now
+        purged = 0
+        for upload in list(self._uploads()):
+            if now - upload.get("updated_at", 0) > self.ttl:
+                self._discard(upload["id"])
+                purged += 1
+        self._count("purged", purged)
+        return purged
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, hashing=len(self._hashers))
+        stats["open"] = sum(1 for _ in self._uploads())
+        return stats
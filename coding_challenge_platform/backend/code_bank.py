@@ -0,0 +1,142 @@
+import os
+import time
+import random
+import hashlib
+import threading
+
+from metrics import timed
+
+
+class CodeFile:
+    """One uploaded code file with its digest and scramble variants."""
+
+    __slots__ = ("name", "text", "digest", "variants")
+
+    def __init__(self, name, text, variants=0):
+        self.name = name
+        self.text = text
+        self.digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        self.variants = scramble_variants(text, self.digest, variants) if variants else []
+
+    def variant_for(self, username):
+        """Index of the scramble variant shown to username (stable across workers).
+
+        Files without variants (SCRAMBLE_VARIANTS=0) always give 0.
+        """
+        if not self.variants:
+            return 0
+        if not username:
+            return random.randrange(len(self.variants))
+        seed = hashlib.sha256(f"{username}\0{self.name}".encode("utf-8")).digest()
+        return int.from_bytes(seed[:4], "big") % len(self.variants)
+
+    def variant(self, index):
+        """Text of variant index; the file as uploaded when there are no variants."""
+        return self.variants[index] if self.variants else self.text
+
+
+def scramble_variants(text, digest, count):
+    """``count`` line permutations of text, reproducible from its digest.
+
+    Each permutation is seeded with (digest, index), so every worker and
+    every restart derives the same pool. A shuffle that happens to give the
+    original order back is reshuffled when the file has more than one
+    distinct line.
+    """
+    lines = text.splitlines(keepends=True)
+    if lines and not lines[-1].endswith(("\n", "\r")):
+        lines[-1] += "\n"  # so the last line can move without merging into another
+    distinct = len(set(lines)) > 1
+    variants = []
+    for index in range(count):
+        rng = random.Random(f"{digest}:{index}")
+        scrambled = lines.copy()
+        for _ in range(10):
+            rng.shuffle(scrambled)
+            if not distinct or scrambled != lines:
+                break
+        variants.append("".join(scrambled))
+    return variants
+
+
+class CodeBank:
+    """In-memory copy of the code files under uploads/<round>/<lang>.
+
+    Each (round, lang) folder is read once and kept until the folder's mtime
+    changes. Adding or removing a file changes it, and ``touch()`` (called
+    after an upload overwrites a file in place) bumps it explicitly, so every
+    worker process notices uploads with a single stat per request instead of
+    a listdir and file read. Scramble files get a pool of pre-generated
+    permutations; a user always gets the same one.
+    """
+
+    def __init__(self, upload_root, scramble_variants=16, scramble_rounds=("scramble",)):
+        self.upload_root = upload_root
+        self.scramble_variants = scramble_variants
+        self.scramble_rounds = scramble_rounds
+        self._lock = threading.Lock()
+        self._folders = {}  # (round, lang) -> (mtime_ns, {name: CodeFile}, sorted names)
+
+    def _folder(self, round_name, lang):
+        return os.path.join(self.upload_root, round_name, lang)
+
+    def _load(self, round_name, lang, folder, mtime_ns):
+        previous = self._folders.get((round_name, lang))
+        previous_files = previous[1] if previous else {}
+        variants = self.scramble_variants if round_name in self.scramble_rounds else 0
+        files = {}
+        for entry in os.scandir(folder):
+            # Skip directories (debug test cases) and in-progress temp files
+            if not entry.is_file() or entry.name.startswith("."):
+                continue
+            with open(entry.path, "r", encoding="utf-8") as f:
+                text = f.read()
+            old = previous_files.get(entry.name)
+            # Unchanged files keep their already generated variants
+            files[entry.name] = old if old is not None and old.text == text else CodeFile(entry.name, text, variants)
+        return (mtime_ns, files, sorted(files))
+
+    def _snapshot(self, round_name, lang):
+        folder = self._folder(round_name, lang)
+        try:
+            mtime_ns = os.stat(folder).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        key = (round_name, lang)
+        current = self._folders.get(key)
+        if current is None or current[0] != mtime_ns:
+            with self._lock:
+                current = self._folders.get(key)
+                if current is None or current[0] != mtime_ns:
+                    with timed("code_bank_load"):
+                        current = self._load(round_name, lang, folder, mtime_ns)
+                    self._folders[key] = current
+        return current
+
+    def list_files(self, round_name, lang):
+        snapshot = self._snapshot(round_name, lang)
+        return snapshot[2] if snapshot else []
+
+    def get(self, round_name, lang, name):
+        """The CodeFile for name, or None if it is not in the folder."""
+        snapshot = self._snapshot(round_name, lang)
+        return snapshot[1].get(name) if snapshot else None
+
+    def listing_etag(self, round_name, lang):
+        snapshot = self._snapshot(round_name, lang)
+        if snapshot is None:
+            return "empty"
+        return hashlib.sha256("\0".join(snapshot[2]).encode("utf-8")).hexdigest()[:32]
+
+    def touch(self, round_name, lang):
+        """Mark a folder as changed after a file in it was rewritten in place."""
+        folder = self._folder(round_name, lang)
+        st = os.stat(folder)
+        # Strictly newer, even if the upload landed within the same mtime tick
+        os.utime(folder, ns=(st.st_atime_ns, max(time.time_ns(), st.st_mtime_ns + 1000)))
+
+    def warm(self, rounds, languages):
+        for round_name in rounds:
+            for lang in languages:
+                self._snapshot(round_name, lang)
+
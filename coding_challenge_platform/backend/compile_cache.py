@@ -0,0 +1,187 @@
+import os
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+
+def artifact_key(lang, flags, source_code):
+    h = hashlib.sha256()
+    for part in (lang, "\0".join(flags or []), source_code):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def result_key(lang, source_code, stdin):
+    h = hashlib.sha256()
+    for part in (lang, source_code or "", stdin or ""):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def entry_path(root, key):
+    return os.path.join(root, key[:2], key)
+
+
+# =====================================================
+# ON-DISK ARTIFACTS (called from executor pool workers)
+# =====================================================
+def restore(root, key, workdir):
+    """Copy a cached build into workdir; returns False on a miss.
+
+    Artifacts are copied rather than hard-linked so a submission can't
+    rewrite the cached binary/class files it is about to execute.
+    """
+    entry = entry_path(root, key)
+    try:
+        names = os.listdir(entry)
+    except FileNotFoundError:
+        return False
+    try:
+        for name in names:
+            shutil.copy2(os.path.join(entry, name), os.path.join(workdir, name))
+        # mtime doubles as the LRU clock for eviction
+        os.utime(entry)
+    except FileNotFoundError:
+        # Evicted underneath us; fall back to a fresh compile
+        for name in names:
+            path = os.path.join(workdir, name)
+            if os.path.exists(path):
+                os.remove(path)
+        return False
+    return True
+
+
+def store(root, key, workdir):
+    """Copy build output from workdir into the cache; returns bytes added."""
+    entry = entry_path(root, key)
+    if os.path.isdir(entry):
+        return 0
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    staging = f"{entry}.{os.getpid()}.tmp"
+    os.makedirs(staging, exist_ok=True)
+    size = 0
+    for name in os.listdir(workdir):
+        src = os.path.join(workdir, name)
+        # Dotfiles and links (the sandboxed compiler could point one anywhere) are not build output
+        if name.startswith(".") or os.path.islink(src) or not os.path.isfile(src):
+            continue
+        shutil.copy2(src, os.path.join(staging, name))
+        size += os.path.getsize(src)
+    try:
+        os.rename(staging, entry)
+    except OSError:
+        # Another worker stored the same build first
+        shutil.rmtree(staging, ignore_errors=True)
+        return 0
+    return size
+
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+# =====================================================
+# CACHES (live in the web process)
+# =====================================================
+class CompileCache:
+    """Size-bounded on-disk cache of compiled artifacts with LRU eviction."""
+
+    def __init__(self, root, max_bytes=256 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        for shard in os.listdir(self.root):
+            shard_path = os.path.join(self.root, shard)
+            if not os.path.isdir(shard_path):
+                continue
+            for name in os.listdir(shard_path):
+                path = os.path.join(shard_path, name)
+                if name.endswith(".tmp") or not os.path.isdir(path):
+                    continue
+                try:
+                    yield path, _dir_size(path), os.path.getmtime(path)
+                except FileNotFoundError:
+                    continue
+
+    def record(self, hit, stored_bytes=0):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._total_bytes += stored_bytes
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        # Evict down to 90% so we don't rescan on every subsequent store
+        target = self.max_bytes * 0.9
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            self.evictions += 1
+        self._total_bytes = total
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class ResultCache:
+    """In-memory LRU of (language, source, stdin) -> execution result."""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = dict(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
@@ -0,0 +1,244 @@
+import time
+import asyncio
+import threading
+from collections import deque
+
+# Every TRIM_EVERY events, the publisher drops what is older than max_events from storage
+TRIM_EVERY = 100
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class EventLog:
+    """Bounded, sequence-numbered log of live score/submission events.
+
+    ``publish()`` stores the event through the storage backend, which numbers
+    events from every worker process with one global sequence, so an event
+    id (the sequence number) can be resumed on any worker. One poller thread
+    per process (see start()) copies new events into a local buffer of the
+    newest max_events and wakes the viewers blocked in ``wait()`` (threads)
+    or ``wait_async()`` (asyncio streams, which hold no thread while idle).
+    A client resuming after events that have already been trimmed is told
+    to reload instead of silently missing them. Listeners (add_listener())
+    get each batch of new events from the poller, e.g. to keep per-process
+    state in step with writes made on other workers.
+    """
+
+    def __init__(self, storage, max_events=5000, poll_interval=0.2, gap_timeout=2.0):
+        self.storage = storage
+        self.max_events = max_events
+        self.poll_interval = poll_interval
+        # How long a missing number may hold back the events after it (see _poll)
+        self.gap_timeout = gap_timeout
+        self._events = deque(maxlen=max_events)
+        self._seq = None   # newest event in the buffer; None until the first poll
+        self._changed = threading.Condition()
+        self._poll_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._async_waiters = set()   # (loop, future) of wait_async() callers
+        self._listeners = []
+        self._gap_since = None
+        self._thread = None
+        self._stats = {"published": 0, "publish_errors": 0, "polls": 0, "poll_errors": 0, "skipped_gaps": 0,
+                       "listener_errors": 0}
+
+    def publish(self, event_type, data):
+        """Store an event for every worker's viewers; returns its sequence number.
+
+        Live events are best effort: a failure is counted, not raised to the
+        score or submission write that triggered it.
+        """
+        try:
+            seq = self.storage.append_event(event_type, data)
+            if seq % TRIM_EVERY == 0 and seq > self.max_events:
+                self.storage.trim_events(seq - self.max_events)
+        except Exception as e:
+            with self._changed:
+                self._stats["publish_errors"] += 1
+            print("Could not publish live event:", e)
+            return None
+        with self._changed:
+            self._stats["published"] += 1
+        self._wakeup.set()
+        return seq
+
+    def add_listener(self, callback):
+        """Call callback([(seq, type, data), ...]) from the poller with every batch of new events.
+
+        Only events published after the first poll are passed on, not the
+        history loaded into the buffer.
+        """
+        self._listeners.append(callback)
+
+    # ---------- polling ----------
+    def start(self):
+        """Start the poller (once per serving process, after fork)."""
+        with self._changed:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="live-events", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                self._poll()
+            except Exception as e:
+                with self._changed:
+                    self._stats["poll_errors"] += 1
+                print("Could not read live events:", e)
+                time.sleep(1)
+
+    def _poll(self):
+        """Copy events published by any worker since the last poll into the buffer."""
+        with self._poll_lock:
+            if self._seq is None:
+                # Fill the buffer so cursors from other workers resume here too
+                last = self.storage.last_event_seq()
+                fresh = [e for e in self.storage.events_after(max(last - self.max_events, 0), self.max_events)
+                         if e[0] <= last]
+                with self._changed:
+                    self._events.extend(fresh)
+                    self._seq = last
+                return len(fresh)
+            fresh = []
+            expected = self._seq + 1
+            events = self.storage.events_after(self._seq)
+            if events and events[0][0] != expected:
+                first = self.storage.first_event_seq()
+                if first is not None and expected < first:
+                    # Fell behind a trim: those events are gone, not late
+                    expected = events[0][0]
+            for event in events:
+                if event[0] != expected:
+                    # A publisher has taken this number but not stored the event
+                    # yet; wait for it a little before giving up on it
+                    now = time.monotonic()
+                    if self._gap_since is None:
+                        self._gap_since = now
+                    if now - self._gap_since < self.gap_timeout:
+                        break
+                    self._stats["skipped_gaps"] += 1
+                self._gap_since = None
+                fresh.append(event)
+                expected = event[0] + 1
+            with self._changed:
+                self._stats["polls"] += 1
+                if not fresh:
+                    return 0
+                self._events.extend(fresh)
+                self._seq = fresh[-1][0]
+                self._changed.notify_all()
+                waiters, self._async_waiters = self._async_waiters, set()
+            for loop, future in waiters:
+                loop.call_soon_threadsafe(_wake, future)
+            for listener in self._listeners:
+                try:
+                    listener(fresh)
+                except Exception as e:
+                    with self._changed:
+                        self._stats["listener_errors"] += 1
+                    print("Live event listener failed:", e)
+            return len(fresh)
+
+    def _ready(self):
+        # Lazily for processes that never called start(), e.g. the flask CLI
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        if self._seq is None:
+            self._poll()
+
+    # ---------- reading ----------
+    def event_id(self, seq):
+        return str(seq)
+
+    def parse_cursor(self, cursor):
+        """Sequence number to resume after, or None if the cursor can't be honoured.
+
+        Empty means "from now".
+        """
+        self._ready()
+        if not cursor:
+            return self._seq
+        try:
+            seq = int(cursor)
+        except ValueError:
+            return None  # including "<epoch>-<seq>" ids from before events were shared
+        if seq > self._seq:
+            self._poll()  # published on another worker since our last poll
+            if seq > self._seq:
+                return None
+        with self._changed:
+            oldest = self._events[0][0] if self._events else self._seq + 1
+        if seq < oldest - 1:
+            first = self.storage.first_event_seq()
+            if first is None or seq < first - 1:
+                return None
+        return seq
+
+    def since(self, seq):
+        """Events after seq, oldest first."""
+        with self._changed:
+            last = self._seq
+            if last is None or seq >= last:
+                return []
+            if self._events and seq >= self._events[0][0] - 1:
+                # Newest events are at the right; walk back only as far as needed
+                missed = []
+                for event in reversed(self._events):
+                    if event[0] <= seq:
+                        break
+                    missed.append(event)
+                missed.reverse()
+                return missed
+        # Older than the buffer (this worker started after them): from storage
+        return [event for event in self.storage.events_after(seq, self.max_events) if event[0] <= last]
+
+    def wait(self, seq, timeout):
+        """Block until there is an event after seq (or timeout); returns them."""
+        self._ready()
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while self._seq <= seq:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._changed.wait(remaining)
+        return self.since(seq)
+
+    async def wait_async(self, seq, timeout):
+        """wait() for asyncio callers; the poller resolves a future instead of a thread blocking.
+
+        Call parse_cursor() (in a worker thread) first.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future)
+        with self._changed:
+            if self._seq > seq:
+                return self.since(seq)
+            self._async_waiters.add(waiter)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return []
+        finally:
+            with self._changed:
+                self._async_waiters.discard(waiter)
+        return self.since(seq)
+
+    @property
+    def last_seq(self):
+        self._ready()
+        return self._seq
+
+    def stats(self):
+        with self._changed:
+            oldest = self._events[0][0] if self._events else None
+            return dict(self._stats, last_seq=self._seq, oldest_buffered=oldest, buffered=len(self._events),
+                        max_events=self.max_events, async_waiters=len(self._async_waiters))
@@ -0,0 +1,660 @@
+import os
+import re
+import sys
+import time
+import asyncio
+import shutil
+import signal
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import compile_cache
+import sandbox
+from compile_cache import CompileCache, ResultCache
+from judge_client import JudgeClient
+from metrics import REGISTRY
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, only the wall-clock timeout applies
+    resource = None
+
+# The real interpreter, not a virtualenv link inside the (hidden) project tree
+PYTHON = os.path.realpath(sys.executable)
+
+# =====================================================
+# LANGUAGES
+# =====================================================
+JUDGE0_LANGUAGE_IDS = {"py": 71, "c": 50, "cpp": 54, "java": 62}
+
+LANGUAGES = {
+    "py": {
+        "source": "main.py",
+        "compile": None,
+        "run": [PYTHON, "-I", "main.py"],
+    },
+    "c": {
+        "source": "main.c",
+        "compile": ["gcc", "-O2", "-std=c11", "-o", "main", "main.c", "-lm"],
+        "run": ["./main"],
+    },
+    "cpp": {
+        "source": "main.cpp",
+        "compile": ["g++", "-O2", "-std=c++17", "-o", "main", "main.cpp"],
+        "run": ["./main"],
+    },
+    "java": {
+        "source": "Main.java",
+        "compile": ["javac", "-encoding", "UTF-8", "Main.java"],
+        "run": ["java", "-Xss64m", "-Xmx{memory_mb}m", "Main"],
+    },
+}
+
+DEFAULT_LIMITS = {
+    "cpu_seconds": 2,
+    "wall_seconds": 5,
+    "memory_mb": 256,
+    "output_bytes": 64 * 1024,
+    "compile_seconds": 20,
+    # Processes and threads per executor worker (RLIMIT_NPROC; namespace sandbox only)
+    "processes": 128,
+    # Test cases slower than this are flagged in batch results
+    "slow_seconds": 1.0,
+}
+
+JAVA_CLASS_RE = re.compile(r"public\s+(?:final\s+)?class\s+([A-Za-z_$][\w$]*)")
+
+
+def language_config(lang, source_code, python=None):
+    config = dict(LANGUAGES.get(lang, LANGUAGES["py"]))
+    if python and config["run"][0] == PYTHON:
+        config["run"] = [python, *config["run"][1:]]
+    if lang == "java":
+        # javac insists the file is named after the public class
+        match = JAVA_CLASS_RE.search(source_code)
+        class_name = match.group(1) if match else "Main"
+        config["source"] = f"{class_name}.java"
+        config["compile"] = ["javac", "-encoding", "UTF-8", config["source"]]
+        config["run"] = config["run"][:-1] + [class_name]
+    return config
+
+
+# =====================================================
+# SANDBOXED SUBPROCESS (runs inside pool workers)
+# =====================================================
+# Set in each pool worker: its uid for namespace-sandboxed jobs
+_worker_slot = None
+
+
+def _init_worker(slots):
+    global _worker_slot
+    with slots.get_lock():
+        _worker_slot = slots.value
+        slots.value += 1
+
+
+def _job_sandbox(sandbox_config):
+    """The sandbox for a job on this worker: sandbox_config plus the worker's uid.
+
+    uid_base/uid_count are the block claimed by this server process (see
+    LocalExecutor.start), so the uid is not used by any other process.
+    """
+    if not sandbox_config:
+        return None
+    uid = None
+    if sandbox_config.get("isolate"):
+        uid = sandbox_config["uid_base"] + (_worker_slot or 0) % sandbox_config["uid_count"]
+    return dict(sandbox_config, uid=uid)
+
+
+def _read_capped(f, limit):
+    f.seek(0)
+    return f.read(limit).decode("utf-8", errors="replace")
+
+
+def _sandboxed(cmd, cwd, stdin, wall_seconds, cpu_seconds, memory_mb, output_bytes, limit_address_space=True,
+               sandbox_spec=None):
+    """Run cmd through sandbox.py with stdin from a string and output captured.
+
+    The capture files are anonymous and held open here, so nothing the
+    program does to its working directory changes what is read back.
+    Returns (returncode, stdout, stderr, timed_out, elapsed_seconds, output_full).
+    """
+    spec = {"cpu_seconds": cpu_seconds, "output_bytes": output_bytes,
+            "memory_mb": memory_mb if limit_address_space else None}
+    if sandbox_spec:
+        spec.update(isolate=sandbox_spec.get("isolate", False), hide=sandbox_spec.get("hide", []),
+                    uid=sandbox_spec.get("uid"), processes=sandbox_spec.get("processes"))
+    argv = sandbox.command(cmd, spec) if resource else cmd
+
+    timed_out = False
+    start = time.perf_counter()
+    with tempfile.TemporaryFile() as fin, tempfile.TemporaryFile() as fout, tempfile.TemporaryFile() as ferr:
+        fin.write((stdin or "").encode("utf-8"))
+        fin.seek(0)
+        try:
+            # No preexec_fn: the wrapper applies the limits after exec, which is
+            # safe with the batch threads running (see sandbox.py)
+            proc = subprocess.Popen(argv, cwd=cwd, stdin=fin, stdout=fout, stderr=ferr,
+                                    env=sandbox.environment(cwd), start_new_session=True)
+        except FileNotFoundError as e:
+            return None, "", f"{sandbox.NOT_FOUND_PREFIX}{e.filename}", False, 0.0, False
+        try:
+            proc.wait(timeout=wall_seconds)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                proc.kill()
+            proc.wait()
+        elapsed = time.perf_counter() - start
+
+        # Python and the JVM ignore SIGXFSZ, so also check for a full stdout file
+        output_full = os.fstat(fout.fileno()).st_size >= output_bytes
+        stdout = _read_capped(fout, output_bytes)
+        stderr = _read_capped(ferr, output_bytes)
+    returncode = proc.returncode
+    if (returncode, stderr.startswith(sandbox.NOT_FOUND_PREFIX)) == (sandbox.EXIT_NOT_FOUND, True) or \
+            (returncode, stderr.startswith(sandbox.SANDBOX_PREFIX)) == (sandbox.EXIT_SANDBOX, True):
+        # The program never started
+        returncode = None
+    return returncode, stdout, stderr, timed_out, elapsed, output_full
+
+
+def _run_status(returncode, timed_out, output_full=False):
+    if timed_out:
+        return "Time Limit Exceeded"
+    if output_full:
+        return "Output Limit Exceeded"
+    if returncode == 0:
+        return "Accepted"
+    if returncode is None:
+        return "Internal Error"
+    if returncode < 0:
+        sig = -returncode
+        if sig == getattr(signal, "SIGXCPU", None):
+            return "Time Limit Exceeded"
+        if sig == getattr(signal, "SIGXFSZ", None):
+            return "Output Limit Exceeded"
+        return f"Runtime Error ({signal.Signals(sig).name})"
+    return "Runtime Error (NZEC)"
+
+
+def compile_source(lang, source_code, workdir, limits, sandbox_spec=None):
+    """Write and compile source_code in workdir; returns (config, error_result)."""
+    config = language_config(lang, source_code, (sandbox_spec or {}).get("python"))
+    with open(os.path.join(workdir, config["source"]), "w", encoding="utf-8") as f:
+        f.write(source_code)
+    if not config["compile"]:
+        return config, None
+
+    returncode, stdout, stderr, timed_out, _, _ = _sandboxed(
+        config["compile"], workdir, "",
+        wall_seconds=limits["compile_seconds"],
+        cpu_seconds=limits["compile_seconds"],
+        memory_mb=max(limits["memory_mb"], 1024),
+        output_bytes=max(limits["output_bytes"], 1024 * 1024),
+        limit_address_space=lang != "java",
+        sandbox_spec=sandbox_spec,
+    )
+    if returncode is None:
+        # No compiler on this server: not something the submission did
+        return config, {"stdout": "", "stderr": stderr, "status": "Internal Error"}
+    if timed_out or _run_status(returncode, False) == "Time Limit Exceeded":
+        # A busy server can be all it takes, so this is kept apart from (cacheable) compile errors
+        return config, {"stdout": "", "stderr": f"Compilation took longer than {limits['compile_seconds']} s",
+                        "status": "Compilation Time Limit Exceeded"}
+    if returncode != 0:
+        message = (stderr or stdout).strip() or "Compilation failed"
+        return config, {"stdout": "", "stderr": message, "status": "Compilation Error"}
+    return config, None
+
+
+def run_compiled(lang, config, stdin, workdir, limits, sandbox_spec=None):
+    cmd = [part.format(memory_mb=limits["memory_mb"]) for part in config["run"]]
+    returncode, stdout, stderr, timed_out, elapsed, output_full = _sandboxed(
+        cmd, workdir, stdin,
+        wall_seconds=limits["wall_seconds"],
+        cpu_seconds=limits["cpu_seconds"],
+        memory_mb=limits["memory_mb"],
+        output_bytes=limits["output_bytes"],
+        limit_address_space=lang != "java",
+        sandbox_spec=sandbox_spec,
+    )
+    return {
+        "stdout": stdout,
+        "stderr": stderr,
+        "status": _run_status(returncode, timed_out, output_full),
+        "time": round(elapsed, 4),
+    }
+
+
+# =====================================================
+# TEST CASE JUDGING
+# =====================================================
+def normalize_output(text):
+    # Ignore trailing spaces on each line and trailing blank lines
+    return "\n".join(line.rstrip() for line in (text or "").replace("\r\n", "\n").split("\n")).rstrip("\n")
+
+
+def judge_case(result, expected):
+    status = result.get("status")
+    if result.get("error"):
+        return "Internal Error"
+    if status != "Accepted":
+        return status
+    if normalize_output(result.get("stdout")) != normalize_output(expected):
+        return "Wrong Answer"
+    return "Accepted"
+
+
+def summarize_cases(cases, verdicts, compile_error=None, slow_seconds=None):
+    total = len(cases)
+    if compile_error:
+        return {"status": compile_error.get("status", "Compilation Error"), "compile_output": compile_error.get("stderr", ""),
+                "passed": 0, "total": total, "score": 0, "cases": []}
+    for verdict in verdicts:
+        verdict["slow"] = bool(slow_seconds) and verdict["time"] > slow_seconds
+    passed = sum(1 for v in verdicts if v["verdict"] == "Accepted")
+    first_failure = next((v["verdict"] for v in verdicts if v["verdict"] not in ("Accepted", "Skipped")), None)
+    return {
+        "status": "Accepted" if total and passed == total else (first_failure or "Wrong Answer"),
+        "passed": passed,
+        "total": total,
+        "score": int(100 * passed / total) if total else 0,
+        "cases": verdicts,
+    }
+
+
+def _prepare_build(lang, source_code, workdir, limits, cache_root, sandbox_spec=None):
+    """Compile into workdir, or restore the build from the compile cache.
+
+    Returns (config, error_result, build_info).
+    """
+    build_info = {"compiled": False, "cache_hit": False, "stored_bytes": 0}
+    config = language_config(lang, source_code, (sandbox_spec or {}).get("python"))
+    key = None
+    if config["compile"] and cache_root:
+        key = compile_cache.artifact_key(lang, config["compile"], source_code)
+        build_info["cache_hit"] = compile_cache.restore(cache_root, key, workdir)
+    if not build_info["cache_hit"]:
+        config, error = compile_source(lang, source_code, workdir, limits, sandbox_spec)
+        build_info["compiled"] = bool(config["compile"])
+        if error:
+            return config, error, build_info
+        if key:
+            build_info["stored_bytes"] = compile_cache.store(cache_root, key, workdir)
+    return config, None, build_info
+
+
+def _make_workdir(prefix, scratch_dir, sandbox_spec):
+    workdir = tempfile.mkdtemp(prefix=prefix, dir=scratch_dir)
+    if sandbox_spec and sandbox_spec.get("uid") is not None:
+        # 0700 and owned by the worker's uid: no other job can look inside
+        os.chown(workdir, sandbox_spec["uid"], sandbox_spec["uid"])
+    return workdir
+
+
+def _cleanup(workdir, sandbox_spec):
+    if sandbox_spec and sandbox_spec.get("uid") is not None:
+        # Anything the job left running (e.g. detached with setsid) goes too
+        sandbox.reap(sandbox_spec["uid"])
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _execute_job(lang, source_code, stdin, limits, scratch_dir, cache_root=None, sandbox_config=None):
+    """Returns (result, build_info) where build_info reports compile cache use."""
+    sandbox_spec = _job_sandbox(sandbox_config)
+    workdir = _make_workdir("job_", scratch_dir, sandbox_spec)
+    try:
+        config, error, build_info = _prepare_build(lang, source_code, workdir, limits, cache_root, sandbox_spec)
+        if error:
+            return error, build_info
+        return run_compiled(lang, config, stdin, workdir, limits, sandbox_spec), build_info
+    finally:
+        _cleanup(workdir, sandbox_spec)
+
+
+def _execute_batch(lang, source_code, cases, limits, scratch_dir, cache_root=None, early_exit=False, parallelism=4,
+                   sandbox_config=None):
+    """Compile once, then run every test case against that build in parallel.
+
+    Returns (batch_result, build_info); see summarize_cases for the shape.
+    """
+    sandbox_spec = _job_sandbox(sandbox_config)
+    workdir = _make_workdir("batch_", scratch_dir, sandbox_spec)
+    try:
+        config, error, build_info = _prepare_build(lang, source_code, workdir, limits, cache_root, sandbox_spec)
+        if error:
+            return summarize_cases(cases, [], compile_error=error), build_info
+
+        stop = threading.Event()
+
+        def run_case(index):
+            case = cases[index]
+            if stop.is_set():
+                return {"case": case["name"], "verdict": "Skipped", "time": 0.0}
+            result = run_compiled(lang, config, case["input"], workdir, limits, sandbox_spec)
+            verdict = judge_case(result, case["expected"])
+            if verdict != "Accepted" and early_exit:
+                stop.set()
+            return {"case": case["name"], "verdict": verdict, "time": result["time"],
+                    "stderr": result["stderr"][:1000]}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(parallelism, len(cases)))) as threads:
+            verdicts = list(threads.map(run_case, range(len(cases))))
+        return summarize_cases(cases, verdicts, slow_seconds=limits["slow_seconds"]), build_info
+    finally:
+        _cleanup(workdir, sandbox_spec)
+
+
+def _warmup(_=None):
+    return os.getpid()
+
+
+# =====================================================
+# STATS
+# =====================================================
+class ExecutorStats:
+    """Per-language run counts, latency and throughput over a sliding window."""
+
+    def __init__(self, window_seconds=60, max_samples=2000):
+        self.window_seconds = window_seconds
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._languages = {}
+
+    def record(self, lang, elapsed, ok):
+        now = time.time()
+        with self._lock:
+            entry = self._languages.setdefault(lang, {
+                "runs": 0, "errors": 0, "total_seconds": 0.0,
+                "samples": deque(maxlen=self.max_samples),
+            })
+            entry["runs"] += 1
+            entry["total_seconds"] += elapsed
+            if not ok:
+                entry["errors"] += 1
+            entry["samples"].append((now, elapsed))
+
+    def snapshot(self):
+        now = time.time()
+        result = {}
+        with self._lock:
+            for lang, entry in self._languages.items():
+                recent = [lat for ts, lat in entry["samples"] if now - ts <= self.window_seconds]
+                ordered = sorted(lat for _, lat in entry["samples"])
+                result[lang] = {
+                    "runs": entry["runs"],
+                    "errors": entry["errors"],
+                    "avg_ms": round(1000 * entry["total_seconds"] / entry["runs"], 2),
+                    "p50_ms": round(1000 * ordered[len(ordered) // 2], 2),
+                    "p95_ms": round(1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+                    "throughput_per_sec": round(len(recent) / self.window_seconds, 3),
+                }
+        return result
+
+
+# =====================================================
+# BACKENDS
+# =====================================================
+# Outcomes that depend only on (source, stdin); timeouts (compile timeouts
+# included), a missing toolchain and transport errors are load or host
+# dependent and are never served from the result cache
+CACHEABLE_STATUSES = ("Accepted", "Compilation Error", "Runtime Error", "Output Limit Exceeded")
+
+
+EXECUTION_SECONDS = REGISTRY.histogram("ccp_execution_seconds", "Time to run or judge a submission",
+                                       ("backend", "lang", "kind"))
+
+
+class BaseExecutor:
+    name = None
+
+    def __init__(self, result_cache_entries=2048):
+        self.stats = ExecutorStats()
+        self.result_cache = ResultCache(result_cache_entries) if result_cache_entries else None
+
+    def _execute(self, source_code, lang, stdin):
+        raise NotImplementedError
+
+    def _record(self, key, lang, elapsed, result):
+        self.stats.record(lang, elapsed, "error" not in result)
+        EXECUTION_SECONDS.observe(elapsed, backend=self.name, lang=lang, kind="run")
+        if self.result_cache and "error" not in result and result.get("status", "").startswith(CACHEABLE_STATUSES):
+            self.result_cache.put(key, result)
+
+    def run(self, source_code, lang, stdin=""):
+        source_code, stdin = source_code or "", stdin or ""
+        key = compile_cache.result_key(lang, source_code, stdin)
+        if self.result_cache:
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return cached
+
+        start = time.perf_counter()
+        result = self._execute(source_code, lang, stdin)
+        self._record(key, lang, time.perf_counter() - start, result)
+        return result
+
+    async def run_async(self, source_code, lang, stdin=""):
+        """run() for asyncio callers; shares the result cache and stats."""
+        source_code, stdin = source_code or "", stdin or ""
+        key = compile_cache.result_key(lang, source_code, stdin)
+        if self.result_cache:
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return cached
+
+        start = time.perf_counter()
+        result = await self._execute_async(source_code, lang, stdin)
+        self._record(key, lang, time.perf_counter() - start, result)
+        return result
+
+    async def _execute_async(self, source_code, lang, stdin):
+        # Default: keep the blocking call off the event loop
+        return await asyncio.to_thread(self._execute, source_code, lang, stdin)
+
+    async def aclose(self):
+        pass
+
+    def run_tests(self, source_code, lang, cases, early_exit=False):
+        """Judge source_code against [{"name", "input", "expected"}] test cases."""
+        start = time.perf_counter()
+        result = self._execute_tests(source_code or "", lang, cases, early_exit)
+        elapsed = time.perf_counter() - start
+        self.stats.record(lang, elapsed, "error" not in result)
+        EXECUTION_SECONDS.observe(elapsed, backend=self.name, lang=lang, kind="tests")
+        return result
+
+    def _execute_tests(self, source_code, lang, cases, early_exit):
+        raise NotImplementedError
+
+    def cache_stats(self):
+        return {"result_cache": self.result_cache.stats() if self.result_cache else None}
+
+    def describe(self):
+        return {"backend": self.name, "languages": self.stats.snapshot()}
+
+
+class Judge0Executor(BaseExecutor):
+    name = "judge0"
+
+    def __init__(self, client=None, result_cache_entries=2048):
+        super().__init__(result_cache_entries=result_cache_entries)
+        # Pooled, rate-limited and breaker-guarded; see judge_client.py
+        self.client = client or JudgeClient()
+
+    def _execute(self, source_code, lang, stdin):
+        return self.client.run(source_code, JUDGE0_LANGUAGE_IDS.get(lang, 71), stdin)
+
+    async def _execute_async(self, source_code, lang, stdin):
+        return await self.client.run_async(source_code, JUDGE0_LANGUAGE_IDS.get(lang, 71), stdin)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def _execute_tests(self, source_code, lang, cases, early_exit):
+        # Judge0 compiles per submission, but the batch API at least turns N
+        # round-trips into one create call plus a few polls
+        results = self.client.run_batch(source_code, JUDGE0_LANGUAGE_IDS.get(lang, 71), [c["input"] for c in cases])
+        if "error" in results:
+            return results
+        if results["results"] and results["results"][0].get("status") == "Compilation Error":
+            return summarize_cases(cases, [], compile_error=results["results"][0])
+        verdicts = []
+        for case, result in zip(cases, results["results"]):
+            verdict = judge_case(result, case["expected"])
+            verdicts.append({"case": case["name"], "verdict": verdict, "time": result.get("time", 0.0),
+                             "stderr": (result.get("stderr") or "")[:1000]})
+        return summarize_cases(cases, verdicts, slow_seconds=DEFAULT_LIMITS["slow_seconds"])
+
+    def describe(self):
+        return {"backend": self.name, "judge": self.client.stats(), "languages": self.stats.snapshot()}
+
+
+def _inside(path, root):
+    path, root = os.path.realpath(path), os.path.realpath(root)
+    return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+
+class LocalExecutor(BaseExecutor):
+    """Compiles and runs submissions in sandboxed, rlimited subprocesses.
+
+    Jobs are dispatched to a pool of pre-forked worker processes so a
+    contest burst is bounded by pool size instead of by Flask threads.
+    Compiled artifacts are reused across runs through a CompileCache.
+
+    sandbox="namespace" (needs root) runs every program without network,
+    with hide_paths covered and as a uid of its worker's own (see
+    sandbox.py); scratch_dir must then lie outside hide_paths, and python
+    (the interpreter for Python submissions, default: this one) must be
+    readable by any user.
+    sandbox="none" only applies the rlimits: submitted code can then read
+    anything the server can, so keep it to trusted code on a dev machine.
+    """
+    name = "local"
+
+    def __init__(self, workers=None, limits=None, scratch_dir=None, cache_dir=None,
+                 cache_max_bytes=256 * 1024 * 1024, result_cache_entries=2048, test_parallelism=4,
+                 sandbox="namespace", hide_paths=(), uid_base=100000, python=None):
+        super().__init__(result_cache_entries)
+        if sandbox not in ("namespace", "none"):
+            raise ValueError(f"unknown sandbox mode: {sandbox!r}")
+        self.workers = workers or os.cpu_count() or 2
+        self.test_parallelism = test_parallelism
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.scratch_dir = scratch_dir or os.path.join(tempfile.gettempdir(), "ccp-sandbox")
+        self.sandbox = sandbox
+        self.hide_paths = [os.path.abspath(path) for path in hide_paths]
+        for path in self.hide_paths:
+            if _inside(self.scratch_dir, path):
+                raise ValueError(f"scratch_dir {self.scratch_dir} must be outside {path}, which jobs can't see")
+        self.uid_base = uid_base
+        # uid_base/uid_count are replaced by this process's own block in start()
+        self._sandbox_config = {"isolate": sandbox == "namespace", "hide": self.hide_paths,
+                                "uid_base": uid_base, "uid_count": self.workers, "processes": self.limits["processes"],
+                                "python": python or PYTHON}
+        self.compile_cache = CompileCache(cache_dir, cache_max_bytes) if cache_dir else None
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def start(self):
+        with self._pool_lock:
+            if self._pool is None:
+                if self.sandbox == "namespace":
+                    # Every server process (gunicorn worker) gets uids no other one uses,
+                    # so reap() and RLIMIT_NPROC only ever touch this process's jobs
+                    first = sandbox.claim_uids(self.scratch_dir, self.uid_base, self.workers)
+                    self._sandbox_config.update(uid_base=first, uid_count=self.workers)
+                    # Refuse to run untrusted code rather than fall back to no isolation
+                    sandbox.check(self.hide_paths, self._sandbox_config["python"], first)
+                os.makedirs(self.scratch_dir, exist_ok=True)
+                # Jobs can reach their own workdir but not list the others
+                os.chmod(self.scratch_dir, 0o711)
+                context = multiprocessing.get_context("fork") if sys.platform != "win32" else None
+                slots = (context or multiprocessing).Value("i", 0)
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                                 initializer=_init_worker, initargs=(slots,))
+                # Fork every worker now rather than on the first submissions
+                list(self._pool.map(_warmup, range(self.workers)))
+        return self._pool
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+                if self.sandbox == "namespace":
+                    sandbox.release_uids(self.scratch_dir)
+
+    def _submit(self, job, lang, source_code, data, **options):
+        """Queue job (_execute_job or _execute_batch) on the pool, with this executor's limits,
+        compile cache and sandbox."""
+        pool = self._pool or self.start()
+        cache_root = self.compile_cache.root if self.compile_cache else None
+        return pool.submit(job, lang, source_code, data, self.limits, self.scratch_dir, cache_root,
+                           sandbox_config=self._sandbox_config, **options)
+
+    @property
+    def _job_timeout(self):
+        # The job enforces its own wall limit; this only guards a wedged worker
+        return self.limits["compile_seconds"] + self.limits["wall_seconds"] + 10
+
+    def _record_build(self, build_info):
+        if self.compile_cache and (build_info["compiled"] or build_info["cache_hit"]):
+            self.compile_cache.record(build_info["cache_hit"], build_info["stored_bytes"])
+
+    def _run(self, job, lang, source_code, data, timeout, **options):
+        """Run job in the pool and wait for it; records its compile cache use and returns its result."""
+        try:
+            result, build_info = self._submit(job, lang, source_code, data, **options).result(timeout=timeout)
+        except Exception as e:
+            return {"error": f"Executor error: {e}"}
+        self._record_build(build_info)
+        return result
+
+    def _execute(self, source_code, lang, stdin):
+        return self._run(_execute_job, lang, source_code, stdin, self._job_timeout)
+
+    async def _execute_async(self, source_code, lang, stdin):
+        # Await the pool future directly instead of parking a thread on it
+        try:
+            future = asyncio.wrap_future(self._submit(_execute_job, lang, source_code, stdin))
+            result, build_info = await asyncio.wait_for(future, timeout=self._job_timeout)
+        except Exception as e:
+            return {"error": f"Executor error: {e or type(e).__name__}"}
+        self._record_build(build_info)
+        return result
+
+    def _execute_tests(self, source_code, lang, cases, early_exit):
+        timeout = self.limits["compile_seconds"] + self.limits["wall_seconds"] * len(cases) + 10
+        return self._run(_execute_batch, lang, source_code, cases, timeout, early_exit=early_exit,
+                         parallelism=self.test_parallelism)
+
+    def cache_stats(self):
+        stats = super().cache_stats()
+        stats["compile_cache"] = self.compile_cache.stats() if self.compile_cache else None
+        return stats
+
+    def describe(self):
+        return {
+            "backend": self.name,
+            "workers": self.workers,
+            "sandbox": self.sandbox,
+            "uids": ([self._sandbox_config["uid_base"], self._sandbox_config["uid_base"] + self.workers - 1]
+                     if self.sandbox == "namespace" else None),
+            "limits": self.limits,
+            "languages": self.stats.snapshot(),
+        }
+
+
+def create_executor(backend, **options):
+    if backend == "local":
+        return LocalExecutor(**options)
+    return Judge0Executor(**options)
@@ -0,0 +1,102 @@
+import io
+import os
+import csv
+import time
+import zipfile
+from datetime import datetime
+
+SCORE_COLUMNS = ["username", "round", "score", "percentage", "total_questions", "similarity",
+                 "status", "tests_passed", "tests_total", "language", "file", "saved_file",
+                 "remaining_time", "timestamp"]
+SUBMISSION_COLUMNS = ["team", "round", "filename", "language", "remaining_time", "timestamp", "size", "path"]
+
+# Folders under uploads/ that hold student submissions
+SUBMISSION_TREES = ["frontend_submissions", "scramble_submissions", "debug_submissions"]
+
+
+def _cell(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    return "" if value is None else value
+
+
+def iter_csv(rows, columns, flush_every=500):
+    """Yield CSV text for rows (dicts), a few hundred rows per chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for i, row in enumerate(rows, 1):
+        writer.writerow([_cell(row.get(column)) for column in columns])
+        if i % flush_every == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_ndjson(rows, dumps, flush_every=500):
+    """Yield one JSON document per line, a few hundred rows per chunk."""
+    lines = []
+    for row in rows:
+        lines.append(dumps(row))
+        if len(lines) >= flush_every:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable stream that collects what zipfile writes."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        # zipfile records local header offsets from tell(); it never seeks
+        return self._offset
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(files, chunk_size=64 * 1024):
+    """Yield a zip archive of files, (archive name, file path, timestamp or None), as it is built.
+
+    Nothing is staged on disk and at most one chunk_size read (plus
+    compressor state) is held in memory. zipfile falls back to data
+    descriptors because the sink is not seekable.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        for name, path, timestamp in files:
+            try:
+                stat = os.stat(path)
+                src = open(path, "rb")
+            except OSError:
+                continue  # deleted while exporting
+            with src:
+                when = timestamp.timestamp() if timestamp else stat.st_mtime
+                info = zipfile.ZipInfo(name, date_time=time.localtime(max(when, 315532800))[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with archive.open(info, "w", force_zip64=stat.st_size > 2 ** 31) as dest:
+                    for chunk in iter(lambda: src.read(chunk_size), b""):
+                        dest.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
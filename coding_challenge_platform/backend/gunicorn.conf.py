@@ -0,0 +1,48 @@
+"""gunicorn settings: ``gunicorn -c gunicorn.conf.py wsgi:app`` from backend/.
+
+Everything is overridable from the environment, so render.yaml and local
+runs share this file.
+"""
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+
+# WEB_CONCURRENCY is what Render (and Heroku) use for the worker count
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+# gthread serves requests on a thread pool per worker. For asgi:app (as
+# render.yaml runs it) use "uvicorn.workers.UvicornWorker": open
+# /admin/events/stream connections then wait on the event loop, not on threads
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+# Import the app in the master: init_db() runs once and parsed caches are
+# shared copy-on-write with every worker
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+# Debug submissions are judged in the background, so requests stay short;
+# the timeout only has to cover a slow upload or a stream heartbeat
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+# Recycle workers now and then to cap memory growth, staggered by the jitter
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+# Set GUNICORN_ACCESS_LOG= (empty) to turn access logging off
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-") or None
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+
+def post_worker_init(worker):
+    # Threads and process pools don't survive fork: start them per worker
+    import app as app_module
+    app_module.start_background_services()
+
+
+def worker_exit(server, worker):
+    import app as app_module
+    if app_module.score_writer:
+        app_module.score_writer.close()
@@ -0,0 +1,470 @@
+import time
+import random
+import asyncio
+import threading
+from bisect import bisect_left
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+
+from metrics import REGISTRY
+
+DEFAULT_BASE_URL = "https://ce.judge0.com"
+
+# Responses worth retrying: rate limited or the judge/proxy is struggling
+RETRY_STATUSES = (429, 502, 503, 504)
+# A POST creates a submission, so it is resent only after answers saying it was
+# not processed, and then only when they name a Retry-After
+POST_RETRY_STATUSES = (429, 503)
+
+# Judge0 status ids 1 and 2 are "In Queue" and "Processing"
+PENDING_STATUS_IDS = (1, 2)
+
+# Every HTTP attempt (retries included), across all clients in the process
+JUDGE_REQUEST_SECONDS = REGISTRY.histogram("ccp_judge_request_seconds", "Judge0 HTTP attempts", ("operation",))
+
+
+class JudgeUnavailable(Exception):
+    """Raised internally when a call is refused without reaching the judge."""
+
+
+def never_sent(error):
+    """True if a transport error happened before the request could reach the judge."""
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, requests.ConnectTimeout)):
+        return True
+    if isinstance(error, requests.ConnectionError) and not isinstance(error, requests.ReadTimeout):
+        # requests wraps urllib3's MaxRetryError; its reason tells a refused or
+        # unresolvable connection (NewConnectionError) from one dropped mid-request
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(reason, ConnectTimeoutError)
+    return False
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class ConcurrencyLimit:
+    """Calls in flight, one budget shared by blocking threads and asyncio tasks.
+
+    Threads wait on a condition; coroutines wait on a future that release()
+    resolves from whichever thread or loop frees a slot.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._in_use = 0
+        self._changed = threading.Condition()
+        self._async_waiters = set()  # (loop, future)
+
+    def acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while self._in_use >= self.limit:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+            self._in_use += 1
+            return True
+
+    async def acquire_async(self, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            with self._changed:
+                if self._in_use < self.limit:
+                    self._in_use += 1
+                    return True
+                waiter = (loop, loop.create_future())
+                self._async_waiters.add(waiter)
+            try:
+                await asyncio.wait_for(waiter[1], max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                with self._changed:
+                    self._async_waiters.discard(waiter)
+
+    def release(self):
+        with self._changed:
+            self._in_use -= 1
+            self._changed.notify()
+            waiters, self._async_waiters = self._async_waiters, set()
+        # Each retries acquiring; those that lose the race wait again
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    @property
+    def in_use(self):
+        with self._changed:
+            return self._in_use
+
+
+class TokenBucket:
+    """Token-bucket rate limiter shared by every thread and coroutine.
+
+    ``reserve()`` takes a token now or books the next free one and returns
+    how long the caller has to wait for it, so the same bucket serves
+    blocking callers (time.sleep) and asyncio callers (asyncio.sleep).
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait):
+        """Seconds to wait for a token, or None if that would exceed max_wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+
+class CircuitBreaker:
+    """Fail fast while the judge is down.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    calls are refused for ``reset_seconds``; then a single trial call is let
+    through (half-open) and its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_seconds=30):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.opened_count = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self._trial_running = False
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opened_count += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_running = False
+
+    def release_trial(self):
+        """Let another trial through if this one ended without reaching the judge."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_running = False
+
+    def snapshot(self):
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self._failures, "opened": self.opened_count}
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram (Prometheus-style buckets, in seconds)."""
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self):
+        self._counts = [0] * (len(self.BUCKETS) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._counts[bisect_left(self.BUCKETS, seconds)] += 1
+            self._sum += seconds
+
+    def snapshot(self):
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative, running = {}, 0
+        for bound, count in zip(self.BUCKETS + (float("inf"),), counts):
+            running += count
+            cumulative["+Inf" if bound == float("inf") else str(bound)] = running
+        return {"count": running, "sum": round(total, 6), "buckets": cumulative}
+
+
+class JudgeClient:
+    """Client for any Judge0-compatible API.
+
+    One pooled keep-alive ``requests.Session`` (and, for asyncio callers, one
+    httpx.AsyncClient) is shared by every caller. Calls go through, in order:
+    the circuit breaker, a concurrency limit shared by the blocking and the
+    asyncio paths, a token-bucket rate limit, then the request itself,
+    retried with jittered exponential backoff. GETs are retried on
+    connection errors, timeouts and 429/5xx answers; POSTs, which create a
+    submission, only when the judge cannot have received them (see
+    _should_retry). Every call ends in a result dict; failures are reported
+    as ``{"error": ...}``, as before.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, auth_token=None, max_concurrency=32, rate_per_second=20,
+                 burst=None, retries=3, backoff_base=0.25, backoff_max=4.0, connect_timeout=3.05,
+                 read_timeout=15, queue_timeout=10, failure_threshold=5, reset_seconds=30):
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"X-Auth-Token": auth_token} if auth_token else {}
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        # Longest a call may wait for a concurrency slot or a rate token
+        self.queue_timeout = queue_timeout
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self._slots = ConcurrencyLimit(max_concurrency)
+        self._async_client = None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.histograms = {}
+        self._counters = {"calls": 0, "retries": 0, "errors": 0, "rejected": 0}
+        self._lock = threading.Lock()
+
+    # ---------- bookkeeping ----------
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _observe(self, operation, seconds):
+        histogram = self.histograms.get(operation)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(operation, LatencyHistogram())
+        histogram.observe(seconds)
+        JUDGE_REQUEST_SECONDS.observe(seconds, operation=operation)
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        # Full jitter: spreads retries from many workers over the window
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _retry_after(headers):
+        try:
+            return float(headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _should_retry(method, status=None, retry_after=None, error=None):
+        """Whether a failed attempt (a retry status or a transport error) may be sent again."""
+        if method == "GET":
+            return True
+        if error is not None:
+            # A read timeout or dropped connection may come after the judge
+            # accepted the submission: sending it again would run it twice
+            return never_sent(error)
+        return status in POST_RETRY_STATUSES and retry_after is not None
+
+    # ---------- blocking transport ----------
+    def _request(self, operation, method, path, **kwargs):
+        """One logical call with limits, retries and breaker; returns the response."""
+        self._count("calls")
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise JudgeUnavailable("Judge unavailable (circuit open)")
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self.breaker.release_trial()
+            self._count("rejected")
+            raise JudgeUnavailable("Judge busy (too many calls in flight)")
+        try:
+            for attempt in range(self.retries + 1):
+                wait = self.bucket.reserve(self.queue_timeout)
+                if wait is None:
+                    self._count("rejected")
+                    raise JudgeUnavailable("Judge rate limit exceeded")
+                if wait:
+                    time.sleep(wait)
+                start = time.perf_counter()
+                retry_after = None
+                try:
+                    response = self.session.request(method, f"{self.base_url}{path}", headers=self.headers,
+                                                    timeout=(self.connect_timeout, self.read_timeout), **kwargs)
+                    self._observe(operation, time.perf_counter() - start)
+                    if response.status_code not in RETRY_STATUSES:
+                        # 4xx other than 429 is the caller's problem, not the judge's health
+                        self.breaker.record_success()
+                        return response
+                    retry_after = self._retry_after(response.headers)
+                    failure = requests.HTTPError(f"Judge0 error {response.status_code}", response=response)
+                    retry = self._should_retry(method, response.status_code, retry_after)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    self._observe(operation, time.perf_counter() - start)
+                    failure = e
+                    retry = self._should_retry(method, error=e)
+                if not retry or attempt == self.retries:
+                    break
+                self._count("retries")
+                time.sleep(self._backoff(attempt, retry_after))
+            self.breaker.record_failure()
+            self._count("errors")
+            raise failure
+        finally:
+            self.breaker.release_trial()
+            self._slots.release()
+
+    # ---------- asyncio transport ----------
+    async def _request_async(self, operation, method, path, **kwargs):
+        self._count("calls")
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise JudgeUnavailable("Judge unavailable (circuit open)")
+        if self._async_client is None:
+            # Created on first use so that it binds to the serving event loop
+            self._async_client = httpx.AsyncClient(
+                headers=self.headers,
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout))
+        if not await self._slots.acquire_async(self.queue_timeout):
+            self.breaker.release_trial()
+            self._count("rejected")
+            raise JudgeUnavailable("Judge busy (too many calls in flight)")
+        try:
+            for attempt in range(self.retries + 1):
+                wait = self.bucket.reserve(self.queue_timeout)
+                if wait is None:
+                    self._count("rejected")
+                    raise JudgeUnavailable("Judge rate limit exceeded")
+                if wait:
+                    await asyncio.sleep(wait)
+                start = time.perf_counter()
+                retry_after = None
+                try:
+                    response = await self._async_client.request(method, f"{self.base_url}{path}", **kwargs)
+                    self._observe(operation, time.perf_counter() - start)
+                    if response.status_code not in RETRY_STATUSES:
+                        self.breaker.record_success()
+                        return response
+                    retry_after = self._retry_after(response.headers)
+                    failure = JudgeUnavailable(f"Judge0 error {response.status_code}")
+                    retry = self._should_retry(method, response.status_code, retry_after)
+                except httpx.TransportError as e:
+                    self._observe(operation, time.perf_counter() - start)
+                    failure = e
+                    retry = self._should_retry(method, error=e)
+                if not retry or attempt == self.retries:
+                    break
+                self._count("retries")
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+            self.breaker.record_failure()
+            self._count("errors")
+            raise failure
+        finally:
+            self.breaker.release_trial()
+            self._slots.release()
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    # ---------- Judge0 API ----------
+    @staticmethod
+    def _submission(source_code, language_id, stdin):
+        return {"source_code": source_code, "language_id": language_id, "stdin": stdin}
+
+    @staticmethod
+    def _run_result(response):
+        if response.status_code in [200, 201]:
+            res = response.json()
+            return {
+                "stdout": res.get("stdout", ""),
+                "stderr": res.get("stderr", ""),
+                "status": res.get("status", {}).get("description", "")
+            }
+        return {"error": f"Judge0 error {response.status_code}"}
+
+    def run(self, source_code, language_id, stdin=""):
+        """Run one submission synchronously (wait=true); returns stdout/stderr/status."""
+        try:
+            response = self._request("run", "POST", "/submissions/?base64_encoded=false&wait=true",
+                                     json=self._submission(source_code, language_id, stdin))
+            return self._run_result(response)
+        except Exception as e:
+            return {"error": str(e) or type(e).__name__}
+
+    async def run_async(self, source_code, language_id, stdin=""):
+        try:
+            response = await self._request_async("run", "POST", "/submissions/?base64_encoded=false&wait=true",
+                                                 json=self._submission(source_code, language_id, stdin))
+            return self._run_result(response)
+        except Exception as e:
+            return {"error": str(e) or type(e).__name__}
+
+    def run_batch(self, source_code, language_id, stdins, poll_interval=0.5, timeout=30):
+        """Run one program against several inputs through the batch API."""
+        payload = {"submissions": [self._submission(source_code, language_id, stdin) for stdin in stdins]}
+        try:
+            r = self._request("batch_create", "POST", "/submissions/batch?base64_encoded=false", json=payload)
+            if r.status_code not in [200, 201]:
+                return {"error": f"Judge0 error {r.status_code}"}
+            tokens = ",".join(item["token"] for item in r.json())
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                time.sleep(poll_interval)
+                r = self._request("batch_poll", "GET", "/submissions/batch",
+                                  params={"tokens": tokens, "base64_encoded": "false",
+                                          "fields": "stdout,stderr,compile_output,status,time"})
+                if r.status_code != 200:
+                    return {"error": f"Judge0 error {r.status_code}"}
+                submissions = r.json().get("submissions", [])
+                if all(s.get("status", {}).get("id", 0) not in PENDING_STATUS_IDS for s in submissions):
+                    return {"results": [{
+                        "stdout": s.get("stdout") or "",
+                        "stderr": s.get("compile_output") or s.get("stderr") or "",
+                        "status": s.get("status", {}).get("description", ""),
+                        "time": float(s.get("time") or 0.0),
+                    } for s in submissions]}
+            return {"error": "Judge0 batch timed out"}
+        except Exception as e:
+            return {"error": str(e) or type(e).__name__}
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            "base_url": self.base_url,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._slots.in_use,
+            "rate_per_second": self.bucket.rate,
+            "breaker": self.breaker.snapshot(),
+            **counters,
+            "latency_seconds": {op: h.snapshot() for op, h in sorted(self.histograms.items())},
+        }
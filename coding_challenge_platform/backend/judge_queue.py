@@ -0,0 +1,297 @@
+import os
+import json
+import time
+import uuid
+import queue
+import random
+import threading
+from datetime import datetime
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED_STATES = (DONE, FAILED)
+
+
+class QueueFull(Exception):
+    pass
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+class JudgeQueue:
+    """Durable background queue for judging submissions.
+
+    Every job is written to ``jobs_dir/<job_id>.json`` before it is acked,
+    so jobs that were still queued or running when the process died are
+    replayed by ``start()``. A job is claimed with an O_EXCL lock file, so
+    several processes sharing jobs_dir never judge the same job twice.
+    Finished jobs are deleted once finished_ttl seconds old, by replay()
+    and by a sweep every sweep_interval seconds.
+    """
+
+    def __init__(self, jobs_dir, handler, workers=4, max_pending=1000, max_attempts=3, retry_base_delay=1.0,
+                 finished_ttl=86400, sweep_interval=600):
+        self.jobs_dir = jobs_dir
+        self.handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.finished_ttl = finished_ttl
+        self.sweep_interval = sweep_interval
+        self._expired = 0
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+        # Distinguishes our own locks from ones left by an earlier process
+        # that happened to have the same pid (e.g. pid 1 in a container)
+        self._owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        self._threads = []
+        self._started = False
+
+    # ---------- persistence ----------
+    def _path(self, job_id, suffix=".json"):
+        return os.path.join(self.jobs_dir, f"{job_id}{suffix}")
+
+    def _write(self, job):
+        job["updated_at"] = datetime.now().isoformat()
+        tmp_path = self._path(job["id"], f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path(job["id"]))
+
+    def _expire(self, job, cutoff):
+        """Delete job's file if it finished before cutoff (epoch seconds); True if gone."""
+        if job["state"] not in FINISHED_STATES:
+            return False
+        try:
+            if os.path.getmtime(self._path(job["id"])) >= cutoff:
+                return False
+            os.remove(self._path(job["id"]))
+        except FileNotFoundError:
+            return True  # swept by another process
+        with self._lock:
+            self._expired += 1
+        return True
+
+    def _read(self, job_id):
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _claim(self, job_id):
+        lock_path = self._path(job_id, ".lock")
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                with open(lock_path, "r") as f:
+                    owner = f.read().strip()
+                pid = int(owner.split(":")[0])
+            except (OSError, ValueError):
+                return False
+            if owner == self._owner or (pid != os.getpid() and pid_alive(pid)):
+                return False
+            # Left behind by a dead process: take it over
+            os.remove(lock_path)
+            return self._claim(job_id)
+        with os.fdopen(fd, "w") as f:
+            f.write(self._owner)
+        return True
+
+    def _release(self, job_id):
+        try:
+            os.remove(self._path(job_id, ".lock"))
+        except FileNotFoundError:
+            pass
+
+    # ---------- lifecycle ----------
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self.replay()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"judge-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        t = threading.Thread(target=self._sweeper, name="judge-sweeper", daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def _jobs(self):
+        for name in sorted(os.listdir(self.jobs_dir)):
+            if name.endswith(".json"):
+                job = self._read(name[:-len(".json")])
+                if job:
+                    yield job
+
+    def replay(self):
+        """Queue the jobs left unfinished by earlier processes; expire old finished ones."""
+        replayed = 0
+        cutoff = time.time() - self.finished_ttl
+        for job in self._jobs():
+            if job["state"] in FINISHED_STATES:
+                self._expire(job, cutoff)
+                continue
+            with self._lock:
+                self._pending += 1
+            self._queue.put(job["id"])
+            replayed += 1
+        return replayed
+
+    def sweep(self):
+        """Delete the jobs that finished more than finished_ttl seconds ago; returns how many."""
+        cutoff = time.time() - self.finished_ttl
+        expired = 0
+        for name in os.listdir(self.jobs_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                if os.path.getmtime(os.path.join(self.jobs_dir, name)) >= cutoff:
+                    continue  # too recent to expire: not worth reading
+            except FileNotFoundError:
+                continue
+            job = self._read(name[:-len(".json")])
+            if job and self._expire(job, cutoff):
+                expired += 1
+        return expired
+
+    def _sweeper(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print("Could not sweep finished judge jobs:", e)
+
+    def submit(self, payload, owner=None):
+        """Queue payload for judging; only owner (and callers passing no owner) may see its status."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFull(f"{self._pending} submissions are waiting to be judged")
+            self._pending += 1
+        job = {
+            "id": uuid.uuid4().hex,
+            "owner": owner,
+            "state": QUEUED,
+            "attempts": 0,
+            "created_at": datetime.now().isoformat(),
+            "payload": payload,
+            "result": None,
+            "error": None,
+        }
+        try:
+            self._write(job)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        self._queue.put(job["id"])
+        return job["id"]
+
+    def status(self, job_id, owner=None):
+        """The job's progress, or None if unknown or (given owner) submitted by someone else."""
+        job = self._read(job_id)
+        if job is None or (owner is not None and job.get("owner") != owner):
+            return None
+        return {
+            "job_id": job["id"],
+            "state": job["state"],
+            "attempts": job["attempts"],
+            "result": job["result"],
+            "error": job["error"],
+            "updated_at": job.get("updated_at"),
+        }
+
+    def wait_for_change(self, job_id, last_state, timeout):
+        """Block until job_id leaves last_state (or timeout); returns status."""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                current = self.status(job_id)
+                remaining = deadline - time.monotonic()
+                if current is None or current["state"] != last_state or remaining <= 0:
+                    return current
+                self._changed.wait(min(remaining, 1.0))
+
+    def stats(self):
+        with self._lock:
+            return {"pending": self._pending, "max_pending": self.max_pending, "workers": self.workers,
+                    "expired": self._expired}
+
+    # ---------- workers ----------
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def _finish(self, job_id):
+        with self._lock:
+            self._pending -= 1
+
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._process(job_id)
+            finally:
+                self._queue.task_done()
+
+    def _process(self, job_id):
+        if not self._claim(job_id):
+            # Owned by another live process
+            self._finish(job_id)
+            return
+        requeued = False
+        try:
+            job = self._read(job_id)
+            if job is None or job["state"] in FINISHED_STATES:
+                return
+            job["state"] = RUNNING
+            job["attempts"] += 1
+            self._write(job)
+            self._notify()
+
+            final_attempt = job["attempts"] >= self.max_attempts
+            try:
+                job["result"] = self.handler(job["payload"], final_attempt)
+                job["state"] = DONE
+                job["error"] = None
+            except Exception as e:
+                job["error"] = str(e)
+                if final_attempt:
+                    job["state"] = FAILED
+                else:
+                    job["state"] = QUEUED
+                    requeued = True
+            # Drop the code once judged; the saved submission file keeps it
+            if job["state"] == DONE:
+                job["payload"].pop("code", None)
+            self._write(job)
+            self._notify()
+        finally:
+            self._release(job_id)
+            if requeued:
+                delay = self.retry_base_delay * (2 ** (job["attempts"] - 1)) * random.uniform(0.5, 1.5)
+                timer = threading.Timer(delay, self._queue.put, args=(job_id,))
+                timer.daemon = True
+                timer.start()
+            else:
+                self._finish(job_id)
@@ -0,0 +1,201 @@
+import time
+import threading
+from bisect import bisect_left, insort
+
+ROUNDS = ("MCQ", "Scramble", "Debugging")
+
+
+def round_points(round_name, fields):
+    """Points a round contributes to the total, on a 0-100 scale.
+
+    MCQ stores a raw count of correct answers, so its percentage is used to
+    keep it comparable with the percentage scores of the code rounds.
+    """
+    if round_name == "MCQ" and fields.get("percentage") is not None:
+        return float(fields["percentage"])
+    return float(fields.get("score") or 0)
+
+
+class Leaderboard:
+    """Per-user totals kept sorted in memory and updated on every score write.
+
+    Entries are ordered by (-total, -remaining_time, username), so ties go to
+    whoever had more time left. Rank lookups are a bisect (O(log n)); top-N is
+    a slice. Each process keeps its own copy, updated incrementally: by
+    update() for its own writes, and by apply_events() for the score events
+    every worker publishes to the shared live event log. A "reset" event
+    (scores deleted or regraded on any worker) reloads it from storage.
+    Events are best effort, so one background thread (see start()) also
+    reloads it every max_age seconds to reconcile. Readers never reload:
+    they get the last good copy, and only wait for the very first load.
+    """
+
+    def __init__(self, storage, max_age=30, unflushed=None, first_load_timeout=10):
+        self.storage = storage
+        self.max_age = max_age
+        # Optional callable returning [username, round, fields] (oldest first)
+        # for score writes accepted but not yet in storage (write-behind)
+        self.unflushed = unflushed
+        self.first_load_timeout = first_load_timeout
+        self._lock = threading.RLock()
+        self._rebuild_lock = threading.Lock()
+        self._users = {}   # username -> {"rounds": {round: (points, remaining)}, "key": tuple}
+        self._keys = []    # sorted sort-keys
+        self._loaded_at = None
+        self._loaded = threading.Event()
+        self._rebuilding = False
+        self._pending = []
+        self._refresher = None
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._stats = {"rebuilds": 0, "rebuild_errors": 0, "rebuild_seconds": 0.0}
+
+    @staticmethod
+    def _key(username, rounds):
+        total = sum(points for points, _ in rounds.values())
+        remaining = sum(remaining or 0 for _, remaining in rounds.values())
+        return (-round(total, 4), -remaining, username)
+
+    def _apply(self, username, round_name, points, remaining_time):
+        entry = self._users.get(username)
+        if entry:
+            i = bisect_left(self._keys, entry["key"])
+            del self._keys[i]
+        else:
+            entry = self._users[username] = {"rounds": {}}
+        entry["rounds"][round_name] = (points, remaining_time or 0)
+        entry["key"] = self._key(username, entry["rounds"])
+        insort(self._keys, entry["key"])
+
+    def update(self, username, round_name, fields):
+        """Record a round score that was just written to storage."""
+        if round_name not in ROUNDS or not username:
+            return
+        points = round_points(round_name, fields)
+        remaining_time = fields.get("remaining_time") or 0
+        with self._lock:
+            if self._rebuilding:
+                self._pending.append((username, round_name, points, remaining_time))
+            if self._loaded_at is not None:
+                self._apply(username, round_name, points, remaining_time)
+
+    def rebuild(self):
+        """Reload every user's totals from storage in one pass."""
+        with self._rebuild_lock:
+            return self._rebuild()
+
+    def _rebuild(self):
+        started = time.perf_counter()
+        with self._lock:
+            self._rebuilding = True
+            self._pending = []
+        try:
+            users = {}
+            for username, docs in self.storage.scores_by_user(ROUNDS):
+                if not username:
+                    continue
+                rounds = {r["round"]: (round_points(r["round"], r), r.get("remaining_time") or 0) for r in docs}
+                users[username] = {"rounds": rounds, "key": self._key(username, rounds)}
+            if self.unflushed:
+                for username, round_name, fields in self.unflushed():
+                    if round_name not in ROUNDS or not username:
+                        continue
+                    entry = users.setdefault(username, {"rounds": {}})
+                    entry["rounds"][round_name] = (round_points(round_name, fields), fields.get("remaining_time") or 0)
+                    entry["key"] = self._key(username, entry["rounds"])
+            keys = sorted(entry["key"] for entry in users.values())
+            with self._lock:
+                self._users, self._keys = users, keys
+                # Writes that raced with the aggregation
+                for update in self._pending:
+                    self._apply(*update)
+                self._loaded_at = time.monotonic()
+                self._stats["rebuilds"] += 1
+                self._stats["rebuild_seconds"] += time.perf_counter() - started
+            self._loaded.set()
+            return len(users)
+        finally:
+            with self._lock:
+                self._rebuilding = False
+                self._pending = []
+
+    def clear(self):
+        """Forget every score here; other workers reload on the "reset" event that follows."""
+        with self._lock:
+            self._users, self._keys = {}, []
+
+    def apply_events(self, events):
+        """Live event log listener: other workers' score writes, and resets."""
+        for _, event_type, data in events:
+            if event_type == "score":
+                self.update(data.get("username"), data.get("round"), data)
+            elif event_type == "reset":
+                self._wakeup.set()  # reload from storage now
+
+    # ---------- background refresh ----------
+    def start(self):
+        """Start the refresh thread (once per serving process, after fork)."""
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._stop.clear()
+            self._refresher = threading.Thread(target=self._refresh_loop, name="leaderboard-refresh", daemon=True)
+            self._refresher.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._refresher is not None:
+            self._refresher.join(timeout=5)
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            # Cleared first, so a reset arriving during the rebuild triggers another
+            self._wakeup.clear()
+            try:
+                self.rebuild()
+            except Exception as e:
+                # Keep serving the last good copy
+                with self._lock:
+                    self._stats["rebuild_errors"] += 1
+                print("Could not refresh the leaderboard:", e)
+            # Retry a failed first load sooner than the regular refresh
+            self._wakeup.wait(self.max_age if self._loaded.is_set() else min(self.max_age, 2))
+
+    def _wait_loaded(self):
+        if not self._loaded.is_set():
+            self.start()  # a process that never called start(), e.g. the flask CLI
+            self._loaded.wait(self.first_load_timeout)
+
+    def _row(self, rank, key):
+        total, remaining, username = -key[0], -key[1], key[2]
+        rounds = self._users[username]["rounds"]
+        return {
+            "rank": rank,
+            "username": username,
+            "total": total,
+            "remaining_time": remaining,
+            "rounds": {name: points for name, (points, _) in rounds.items()},
+        }
+
+    def top(self, n=10):
+        self._wait_loaded()
+        with self._lock:
+            return [self._row(i + 1, key) for i, key in enumerate(self._keys[:n])]
+
+    def rank(self, username):
+        self._wait_loaded()
+        with self._lock:
+            entry = self._users.get(username)
+            if not entry:
+                return None
+            return self._row(bisect_left(self._keys, entry["key"]) + 1, entry["key"])
+
+    def __len__(self):
+        return len(self._keys)
+
+    def stats(self):
+        with self._lock:
+            age = time.monotonic() - self._loaded_at if self._loaded_at is not None else None
+            return dict(self._stats, participants=len(self._keys),
+                        age_seconds=round(age, 3) if age is not None else None)
@@ -0,0 +1,145 @@
+"""Server-side MCQ grading against the uploaded answer key.
+
+Students send the option text they picked for each question; the score is
+computed here and the raw answers are stored with it, so a corrected answer
+key can be applied to every attempt afterwards with ``regrade()``.
+"""
+import time
+import hashlib
+
+try:
+    import numpy as np
+except ImportError:  # attempts are regraded one at a time
+    np = None
+
+OPTION_FIELDS = ("optionA", "optionB", "optionC", "optionD")
+UNANSWERED = -1  # skipped, or text that matches no option
+NO_KEY = -2      # question without a usable correct answer: nobody gets it
+
+
+def option_text(value):
+    """Option/answer cell as the browser shows it (2.0 -> "2")."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+class AnswerKey:
+    """The correct option of every question, as an index array in question order."""
+
+    def __init__(self, questions):
+        self.ids = [str(q.get("id")) for q in questions]
+        self.position = {qid: i for i, qid in enumerate(self.ids)}
+        # Per question: option text -> option index
+        self.options = []
+        correct = []
+        for q in questions:
+            texts = [option_text(q.get(field)) for field in OPTION_FIELDS]
+            lookup = {}
+            for i, text in enumerate(texts):
+                if text:
+                    lookup.setdefault(text, i)
+            self.options.append(lookup)
+            correct.append(self._correct_index(option_text(q.get("correct_answer")), lookup))
+        self.correct = correct
+        self.array = np.array(correct, dtype=np.int8) if np is not None else None
+        self.digest = hashlib.sha256(repr(list(zip(self.ids, correct))).encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _correct_index(answer, lookup):
+        # The sheet gives the option text; accept "B" / "Option B" as well
+        if answer in lookup:
+            return lookup[answer]
+        letter = answer.upper().replace("OPTION", "").strip()
+        if len(letter) == 1 and letter in "ABCD":
+            return "ABCD".index(letter)
+        return NO_KEY
+
+    def __len__(self):
+        return len(self.ids)
+
+    def encode(self, answers):
+        """Chosen option index per question for one attempt's [[question id, text], ...]."""
+        row = [UNANSWERED] * len(self.ids)
+        for qid, text in answers or ():
+            i = self.position.get(str(qid))
+            if i is not None:
+                row[i] = self.options[i].get(option_text(text), UNANSWERED)
+        return row
+
+    def fields(self, correct):
+        """Score fields for an attempt with `correct` right answers."""
+        total = len(self.ids)
+        return {
+            "score": correct,
+            "percentage": round(correct * 100 / total, 2) if total else 0,
+            "total_questions": total,
+            "answer_key": self.digest,
+        }
+
+    def grade(self, answers):
+        row = self.encode(answers)
+        return self.fields(sum(1 for chosen, key in zip(row, self.correct) if chosen == key))
+
+    def grade_many(self, attempts):
+        """Correct-answer counts for many attempts in one pass."""
+        rows = [self.encode(answers) for answers in attempts]
+        if not rows or not self.ids:
+            return [0] * len(rows)
+        if np is None:
+            return [sum(1 for chosen, key in zip(row, self.correct) if chosen == key) for row in rows]
+        matrix = np.array(rows, dtype=np.int8)
+        return (matrix == self.array).sum(axis=1).tolist()
+
+
+def answers_list(answers):
+    """Normalize submitted {question id: text} to sorted [[id, text], ...].
+
+    Stored as a list because score upserts merge nested objects (SQLite
+    json_patch), which would keep answers from an earlier attempt.
+    """
+    if not isinstance(answers, dict):
+        raise ValueError("answers must map question ids to the chosen option")
+    return sorted([str(qid), option_text(text)] for qid, text in answers.items() if text is not None)
+
+
+def regrade(storage, key, round_name="MCQ"):
+    """Rescore every stored attempt against key and write the changes in one bulk write.
+
+    Each write is conditional on the answers and answer key that were read,
+    so an attempt submitted meanwhile keeps the score it was graded with.
+    """
+    started = time.perf_counter()
+    usernames, attempts, previous = [], [], []
+    skipped = 0
+    for doc in storage.find_scores(round_name=round_name):
+        if "answers" not in doc:
+            skipped += 1  # submitted before answers were stored: nothing to regrade
+            continue
+        usernames.append(doc["username"])
+        attempts.append(doc["answers"])
+        previous.append((doc.get("score"), doc.get("total_questions"), doc.get("answer_key"), doc["answers"]))
+    read = time.perf_counter()
+    counts = key.grade_many(attempts)
+
+    batch = {}
+    for username, count, before in zip(usernames, counts, previous):
+        fields = key.fields(count)
+        if before[:3] != (fields["score"], fields["total_questions"], fields["answer_key"]):
+            batch[(username, round_name)] = ({"answers": before[3], "answer_key": before[2]}, fields)
+    graded = time.perf_counter()
+    written = storage.update_scores_if(batch)
+    done = time.perf_counter()
+    return {
+        "attempts": len(attempts),
+        "changed": written,
+        "resubmitted": len(batch) - written,  # replaced by a new attempt while regrading
+        "skipped": skipped,
+        "answer_key": key.digest,
+        "seconds": round(done - started, 3),
+        "read_seconds": round(read - started, 3),
+        "grade_seconds": round(graded - read, 3),
+        "write_seconds": round(done - graded, 3),
+    }
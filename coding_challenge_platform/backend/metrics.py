@@ -0,0 +1,310 @@
+"""In-process metrics, exposed in the Prometheus text format at /metrics.
+
+Counters and histograms are recorded where the work happens (the request
+hooks, ``timed("mcq_parse")``, the storage proxy from ``instrument()``).
+Gauges are read at scrape time from the components' existing ``stats()``
+dicts, registered with ``REGISTRY.add_stats``.
+
+Under gunicorn every worker has its own registry. With ``share()`` each
+process also writes its state to a shared directory every few seconds and
+``render()`` merges the live processes: counters and histograms are summed,
+gauges are reported per ``pid``, so a scrape that lands on any worker
+covers all of them.
+"""
+import os
+import json
+import time
+import inspect
+import threading
+from contextlib import contextmanager
+
+from judge_queue import pid_alive
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return json.dumps([str(labels.get(n, "")) for n in self.labelnames])
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def state(self):
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(into, state):
+        for key, value in state.items():
+            into[key] = into.get(key, 0.0) + value
+
+    def lines(self, state):
+        for key, value in sorted(state.items()):
+            yield f"{self.name}{_labels(list(zip(self.labelnames, json.loads(key))))} {_format(value)}"
+
+
+class Histogram(Counter):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket (not cumulative) counts, the +Inf bucket last, then the sum
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    break
+            else:
+                i = len(self.buckets)
+            series[i] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def state(self):
+        with self._lock:
+            return {key: list(series) for key, series in self._values.items()}
+
+    @staticmethod
+    def merge(into, state):
+        for key, series in state.items():
+            current = into.get(key)
+            into[key] = list(series) if current is None else [a + b for a, b in zip(current, series)]
+
+    def lines(self, state):
+        for key, series in sorted(state.items()):
+            pairs = list(zip(self.labelnames, json.loads(key)))
+            running = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                running += count
+                yield f"{self.name}_bucket{_labels(pairs + [('le', _format(bound))])} {running}"
+            yield f"{self.name}_sum{_labels(pairs)} {_format(series[-1])}"
+            yield f"{self.name}_count{_labels(pairs)} {running}"
+
+
+def _flatten(prefix, stats):
+    """Numeric leaves of a stats() dict as {metric name: value}."""
+    values = {}
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            values.update(_flatten(name, value))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = value
+    return values
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._stats = []  # (prefix, stats_fn, documentation)
+        self._lock = threading.Lock()
+        self.share_dir = None
+
+    def _get(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, documentation, labelnames, buckets)
+
+    def add_stats(self, prefix, stats_fn, documentation):
+        """Export the numeric fields of stats_fn() as gauges named prefix_<field>."""
+        self._stats.append((prefix, stats_fn, documentation))
+
+    def _gauges(self):
+        gauges = {}
+        for prefix, stats_fn, documentation in self._stats:
+            try:
+                stats = stats_fn()
+            except Exception:
+                continue  # a component that is down must not break the scrape
+            for name, value in _flatten(prefix, stats or {}).items():
+                gauges[name] = (documentation, value)
+        return gauges
+
+    def state(self):
+        return {
+            "pid": os.getpid(),
+            "metrics": {name: metric.state() for name, metric in self._metrics.items()},
+            "gauges": self._gauges(),
+        }
+
+    # ---------- multi-process ----------
+    def share(self, directory, interval=5.0):
+        """Publish this process's state under directory every interval seconds."""
+        os.makedirs(directory, exist_ok=True)
+        self.share_dir = directory
+        self._share_interval = interval
+        threading.Thread(target=self._share_loop, name="metrics-share", daemon=True).start()
+
+    def _write_state(self):
+        path = os.path.join(self.share_dir, f"{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state(), f)
+        os.replace(tmp, path)
+
+    def _share_loop(self):
+        while True:
+            try:
+                self._write_state()
+            except Exception as e:
+                print("Could not publish metrics:", e)
+            time.sleep(self._share_interval)
+
+    def _peer_states(self):
+        states = []
+        stale_after = max(60.0, self._share_interval * 6)
+        for name in os.listdir(self.share_dir):
+            if not name.endswith(".json"):
+                continue
+            pid = int(name[:-5]) if name[:-5].isdigit() else None
+            path = os.path.join(self.share_dir, name)
+            if pid == os.getpid():
+                continue
+            try:
+                if pid is None or not pid_alive(pid):
+                    os.remove(path)
+                    continue
+                if time.time() - os.path.getmtime(path) > stale_after:
+                    continue
+                with open(path, "r", encoding="utf-8") as f:
+                    states.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # replaced or removed while reading
+        return states
+
+    # ---------- exposition ----------
+    def render(self):
+        states = [self.state()]
+        if self.share_dir:
+            states += self._peer_states()
+        per_pid = len(states) > 1 or self.share_dir is not None
+
+        out = []
+        for name, metric in sorted(self._metrics.items()):
+            merged = {}
+            for state in states:
+                metric.merge(merged, state["metrics"].get(name, {}))
+            out.append(f"# HELP {name} {metric.documentation}")
+            out.append(f"# TYPE {name} {metric.kind}")
+            out.extend(metric.lines(merged))
+
+        gauges = {}
+        for state in states:
+            for name, (documentation, value) in state["gauges"].items():
+                gauges.setdefault(name, (documentation, []))[1].append((state["pid"], value))
+        for name, (documentation, samples) in sorted(gauges.items()):
+            out.append(f"# HELP {name} {documentation}")
+            out.append(f"# TYPE {name} gauge")
+            for pid, value in sorted(samples):
+                out.append(f"{name}{_labels([('pid', pid)] if per_pid else [])} {_format(value)}")
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram("ccp_http_request_duration_seconds",
+                                     "Time to produce a response (first byte for streams)", ("method", "endpoint"))
+REQUESTS = REGISTRY.counter("ccp_http_requests_total", "Responses sent", ("method", "endpoint", "status"))
+OPERATION_SECONDS = REGISTRY.histogram("ccp_operation_seconds", "Time spent in instrumented helpers", ("operation",))
+
+
+def observe_request(method, endpoint, status, seconds):
+    REQUEST_SECONDS.observe(seconds, method=method, endpoint=endpoint)
+    REQUESTS.inc(method=method, endpoint=endpoint, status=status)
+
+
+def timed(operation):
+    """Context manager timing a block into ccp_operation_seconds{operation=...}."""
+    return OPERATION_SECONDS.time(operation=operation)
+
+
+class Instrumented:
+    """Proxy that times every public method call of target into histogram.
+
+    Generator methods are timed until exhausted (or closed) and coroutine
+    methods until awaited, so streamed reads are measured end to end.
+    """
+
+    def __init__(self, target, histogram):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_histogram", histogram)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        wrapped = _timed_call(attr, self._histogram, name)
+        object.__setattr__(self, name, wrapped)
+        return wrapped
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+
+def _timed_call(fn, histogram, operation):
+    if inspect.iscoroutinefunction(fn):
+        async def call(*args, **kwargs):
+            with histogram.time(operation=operation):
+                return await fn(*args, **kwargs)
+    elif inspect.isgeneratorfunction(fn):
+        def call(*args, **kwargs):
+            with histogram.time(operation=operation):
+                yield from fn(*args, **kwargs)
+    else:
+        def call(*args, **kwargs):
+            with histogram.time(operation=operation):
+                return fn(*args, **kwargs)
+    call.__name__ = operation
+    call.__doc__ = fn.__doc__
+    return call
+
+
+def instrument(target, histogram):
+    return Instrumented(target, histogram)
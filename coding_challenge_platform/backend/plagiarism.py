@@ -0,0 +1,363 @@
+"""Near-duplicate detection over scramble and debug submissions.
+
+Each submission is tokenized (comments dropped, identifiers and string
+literals normalized, so renaming variables does not hide a copy), cut into
+overlapping k-token shingles and summarized by a MinHash signature. A
+locality-sensitive index over signature bands finds the few earlier
+submissions of the same problem that can be similar, so adding a file
+costs about the same with 50 or 50,000 files already indexed, instead of
+comparing it against all of them.
+
+Shingles that also appear in the problem's own files (the original and, for
+scramble files, every pre-shuffled variant) are ignored: everybody starts
+from that code, so only what a student changed counts.
+
+Candidates whose estimated Jaccard similarity reaches ``threshold`` are
+merged into a cluster (union-find). Clusters are kept up to date as files
+arrive, so listing them is proportional to what is flagged, not to the
+number of submissions.
+"""
+import os
+import re
+import time
+import hashlib
+import threading
+from operator import eq
+
+from submission_catalog import SCRAMBLE
+
+# Comments, string/char literals, numbers, words, then any other single character.
+# Numbers are kept: constants survive copying and tell independent solutions apart.
+TOKEN = re.compile(
+    r"(?P<comment>#[^\n]*|//[^\n]*|/\*.*?\*/)"
+    r"|(?P<string>\"\"\".*?\"\"\"|'''.*?'''|\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*')"
+    r"|(?P<number>\d+(?:\.\d+)?)"
+    r"|(?P<word>[A-Za-z_]\w*)"
+    r"|(?P<other>\S)",
+    re.DOTALL,
+)
+
+# Kept as-is; every other identifier becomes "v"
+KEYWORDS = frozenset("""
+    and as assert async await break case catch char class const continue def default del do double elif else
+    enum except extends final finally float for from global if implements import in include int interface is
+    lambda long new nonlocal not or pass private protected public raise return short signed sizeof static
+    struct switch this throw throws try typedef union unsigned using void volatile while with yield
+    True False None true false null nullptr bool boolean string String std cin cout endl printf scanf
+    print input range len System out println Scanner main
+""".split())
+
+
+def tokens(text):
+    """Normalized token stream of a source file (Python, C, C++ or Java)."""
+    out = []
+    for match in TOKEN.finditer(text):
+        kind = match.lastgroup
+        if kind == "comment":
+            continue
+        if kind == "word":
+            word = match.group()
+            out.append(word if word in KEYWORDS else "v")
+        elif kind == "string":
+            out.append("s")
+        else:
+            out.append(match.group())
+    return out
+
+
+def shingles(text, size=5):
+    """Set of 64-bit hashes of every run of ``size`` consecutive tokens."""
+    stream = tokens(text)
+    if len(stream) < size:
+        stream = stream + [""] * (size - len(stream)) if stream else []
+    hashes = set()
+    for i in range(len(stream) - size + 1):
+        digest = hashlib.blake2b("\0".join(stream[i:i + size]).encode("utf-8"), digest_size=8).digest()
+        hashes.add(int.from_bytes(digest, "little"))
+    return hashes
+
+
+def minhash(hashes, bins=128):
+    """One-permutation MinHash signature of a non-empty shingle set.
+
+    Each shingle hash picks a bin with its low bits and competes for that
+    bin's minimum with the rest, so a signature costs one pass over the
+    shingles rather than one per permutation. Empty bins borrow the next
+    non-empty bin's value (offset by the distance), which keeps the
+    fraction of equal bins an estimate of the Jaccard similarity.
+    """
+    shift = bins.bit_length() - 1
+    slots = [None] * bins
+    for h in hashes:
+        i = h & (bins - 1)
+        value = h >> shift
+        if slots[i] is None or value < slots[i]:
+            slots[i] = value
+    if None in slots:
+        offset = 1 << (64 - shift)
+        for i in range(bins):
+            if slots[i] is None:
+                for distance in range(1, bins):
+                    borrowed = slots[(i + distance) % bins]
+                    if borrowed is not None and borrowed < offset:
+                        slots[i] = borrowed + distance * offset
+                        break
+    return tuple(slots)
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(map(eq, a, b)) / len(a)
+
+
+def problem_name(username, filename):
+    """Problem file a saved submission answers.
+
+    Submissions are saved as <username>_<problem stem>_<YYYYmmdd_HHMMSS><ext>.
+    """
+    stem, ext = os.path.splitext(filename)
+    if username and stem.startswith(f"{username}_"):
+        stem = stem[len(username) + 1:]
+    if re.search(r"_\d{8}_\d{6}$", stem):
+        stem = stem[:-16]
+    return stem + ext
+
+
+class _Problem:
+    """LSH buckets and clusters for the submissions of one problem."""
+
+    def __init__(self, bands):
+        self.buckets = [{} for _ in range(bands)]  # band -> {band values: [shape ids]}
+        self.shapes = {}      # signature -> shape id (identical signatures share one)
+        self.signatures = []  # shape id -> signature
+        self.members = []     # shape id -> [path]
+        self.parent = []      # union-find over shape ids
+        self.clusters = {}    # root shape id -> {"shapes": set, "pairs": {(a, b): similarity}}
+
+    def find(self, sid):
+        while self.parent[sid] != sid:
+            self.parent[sid] = self.parent[self.parent[sid]]
+            sid = self.parent[sid]
+        return sid
+
+    def union(self, a, b, score):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            first = self.clusters.pop(ra, None) or {"shapes": {ra}, "pairs": {}}
+            second = self.clusters.pop(rb, None) or {"shapes": {rb}, "pairs": {}}
+            if len(first["shapes"]) < len(second["shapes"]):
+                ra, rb, first, second = rb, ra, second, first
+            self.parent[rb] = ra
+            first["shapes"] |= second["shapes"]
+            first["pairs"].update(second["pairs"])
+            self.clusters[ra] = first
+        self.clusters.setdefault(ra, {"shapes": {ra}, "pairs": {}})["pairs"][(min(a, b), max(a, b))] = score
+
+
+class SimilarityIndex:
+    """Incremental near-duplicate index over the catalogued code submissions.
+
+    ``add()`` indexes a file as it is saved. Each process keeps its own
+    index and, like the leaderboard, picks up files saved by other worker
+    processes by syncing with the submission catalog once it is older than
+    max_age seconds; only files it has not seen are read.
+
+    ``base_texts(round, lang, problem)`` returns the problem's own files,
+    whose shingles are ignored. ``locate(path, sha256)`` finds a catalogued
+    file's content (e.g. in the blob store); by default upload_root/path.
+    """
+
+    def __init__(self, storage, upload_root, base_texts=None, threshold=0.8, shingle_size=5,
+                 bins=128, bands=16, max_age=30, locate=None):
+        if bins % bands or bins & (bins - 1):
+            raise ValueError("bins must be a power of two and a multiple of bands")
+        self.storage = storage
+        self.upload_root = upload_root
+        self.base_texts = base_texts
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.bins = bins
+        self.bands = bands
+        self.rows = bins // bands
+        self.max_age = max_age
+        self.locate = locate
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._problems = {}  # (round, lang, problem) -> _Problem
+        self._docs = {}      # path -> {"username", "path", "round", "language", "problem", "shape"}
+        self._base = {}      # (round, lang, problem) -> (texts, shingle set)
+        self._synced_at = None
+        self.skipped = 0     # files with nothing beyond the problem's own code
+
+    # ---------- ingest ----------
+    def _base_shingles(self, round_name, lang, problem):
+        texts = tuple(self.base_texts(round_name, lang, problem) or ()) if self.base_texts else ()
+        key = (round_name, lang, problem)
+        cached = self._base.get(key)
+        if cached is None or cached[0] != texts:
+            combined = set()
+            for text in texts:
+                combined |= shingles(text, self.shingle_size)
+            cached = self._base[key] = (texts, combined)
+        return cached[1]
+
+    def add(self, username, round_name, lang, problem, path, text):
+        """Index one saved submission; returns the paths it is now clustered with."""
+        own = shingles(text, self.shingle_size) - self._base_shingles(round_name, lang, problem)
+        with self._lock:
+            if path in self._docs:
+                return []
+            if not own:
+                self._docs[path] = None
+                self.skipped += 1
+                return []
+            signature = minhash(own, self.bins)
+            state = self._problems.get((round_name, lang, problem))
+            if state is None:
+                state = self._problems[(round_name, lang, problem)] = _Problem(self.bands)
+            self._docs[path] = {"username": username, "path": path, "round": round_name,
+                                "language": lang, "problem": problem}
+
+            sid = state.shapes.get(signature)
+            if sid is not None:
+                # Exactly the same signature as files already indexed
+                state.members[sid].append(path)
+                self._docs[path]["shape"] = sid
+                state.union(sid, sid, 1.0)  # a cluster even if nothing else matched
+                return self._cluster_paths(state, sid, path)
+
+            sid = state.shapes[signature] = len(state.signatures)
+            state.signatures.append(signature)
+            state.members.append([path])
+            state.parent.append(sid)
+            self._docs[path]["shape"] = sid
+
+            candidates = set()
+            for band, buckets in enumerate(state.buckets):
+                key = signature[band * self.rows:(band + 1) * self.rows]
+                bucket = buckets.setdefault(key, [])
+                candidates.update(bucket)
+                bucket.append(sid)
+            for other in candidates:
+                score = similarity(signature, state.signatures[other])
+                if score >= self.threshold:
+                    state.union(sid, other, round(score, 3))
+            return self._cluster_paths(state, sid, path)
+
+    def _cluster_paths(self, state, sid, path):
+        cluster = state.clusters.get(state.find(sid))
+        if not cluster:
+            return []
+        return [p for s in cluster["shapes"] for p in state.members[s] if p != path]
+
+    def add_file(self, username, round_name, lang, problem, path, sha256=None):
+        located = self.locate(path, sha256) if self.locate else os.path.join(self.upload_root, path)
+        if located is None:
+            raise FileNotFoundError(path)
+        with open(located, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        return self.add(username, round_name, lang, problem, path, text)
+
+    # ---------- other processes ----------
+    def _catalogued(self):
+        """{path: (username, round, lang, problem, sha256)} for every catalogued scramble/debug file."""
+        listed = {}
+        for label, round_name in ((SCRAMBLE, "scramble"), ("Debug", "debug")):
+            docs, _ = self.storage.query_submissions(round_contains=label, with_sha256=True)
+            for doc in docs:
+                path = doc.get("path")
+                if path and doc.get("language"):
+                    username = doc.get("username")
+                    listed[path] = (username, round_name, doc["language"],
+                                    problem_name(username, doc.get("filename") or os.path.basename(path)),
+                                    doc.get("sha256"))
+        return listed
+
+    def sync(self):
+        """Index catalogued submissions this process has not seen yet."""
+        with self._sync_lock:
+            listed = self._catalogued()
+            with self._lock:
+                if any(path not in listed for path in self._docs):
+                    # Files were pruned from the catalog: start over without them
+                    self._problems, self._docs = {}, {}
+                    self.skipped = 0
+            for path, (username, round_name, lang, problem, sha256) in listed.items():
+                if path in self._docs:
+                    continue
+                try:
+                    self.add_file(username, round_name, lang, problem, path, sha256)
+                except (OSError, UnicodeError):
+                    continue  # removed since it was catalogued
+            self._synced_at = time.monotonic()
+            return len(self._docs)
+
+    def _ensure_fresh(self):
+        if self.storage is None:
+            return  # standalone index: only what was add()ed
+        synced_at = self._synced_at
+        if synced_at is None or time.monotonic() - synced_at > self.max_age:
+            if self._sync_lock.locked() and synced_at is not None:
+                return  # another thread is syncing; answer from the current index
+            self.sync()
+
+    def clear(self):
+        with self._lock:
+            self._problems, self._docs, self._base = {}, {}, {}
+            self.skipped = 0
+            self._synced_at = None
+
+    # ---------- queries ----------
+    def clusters(self, round_name=None, lang=None, problem=None, min_users=2):
+        """Groups of similar submissions by at least min_users different users.
+
+        Returns [{"round", "language", "problem", "users", "similarity",
+        "submissions": [...], "pairs": [...]}], most users first.
+        """
+        self._ensure_fresh()
+        out = []
+        with self._lock:
+            for (r, l, p), state in self._problems.items():
+                if (round_name and r != round_name) or (lang and l != lang) or (problem and p != problem):
+                    continue
+                for cluster in state.clusters.values():
+                    paths = [path for sid in cluster["shapes"] for path in state.members[sid]]
+                    docs = [self._docs[path] for path in paths]
+                    users = {doc["username"] for doc in docs}
+                    if len(users) < min_users:
+                        continue
+                    pairs = []
+                    for (a, b), score in cluster["pairs"].items():
+                        pair = self._pair(state.members[a], state.members[b])
+                        if pair:
+                            pairs.append({"a": pair[0], "b": pair[1], "similarity": score})
+                    pairs.sort(key=lambda pair: -pair["similarity"])
+                    out.append({
+                        "round": r,
+                        "language": l,
+                        "problem": p,
+                        "users": sorted(users),
+                        "similarity": pairs[0]["similarity"] if pairs else 1.0,
+                        "submissions": [{"username": doc["username"], "path": doc["path"]} for doc in docs],
+                        "pairs": pairs,
+                    })
+        out.sort(key=lambda c: (-len(c["users"]), -c["similarity"], c["problem"]))
+        return out
+
+    def _pair(self, first, second):
+        """Two paths by different users, one from each shape, or None."""
+        for a in first:
+            for b in second:
+                if self._docs[a]["username"] != self._docs[b]["username"]:
+                    return a, b
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "submissions": sum(1 for doc in self._docs.values() if doc),
+                "skipped": self.skipped,
+                "problems": len(self._problems),
+                "clusters": sum(len(state.clusters) for state in self._problems.values()),
+                "threshold": self.threshold,
+            }
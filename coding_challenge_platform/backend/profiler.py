@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+
+
+def _stack(frame):
+    """A frame's call stack in collapsed ("folded") form, outermost first."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Samples the stacks of threads that are serving requests.
+
+    One background thread wakes every ``interval`` seconds and records the
+    current stack of each thread between ``begin()`` and ``end()``. Requests
+    that took at least ``threshold`` seconds have their samples written to
+    ``out_dir`` in the folded format read by flamegraph.pl and speedscope;
+    faster requests are discarded. Only the newest ``keep`` profiles are kept.
+
+    Samples real threads only: under gevent, greenlets share one thread.
+    """
+
+    def __init__(self, out_dir, threshold, interval=0.005, keep=50):
+        self.out_dir = out_dir
+        self.threshold = threshold
+        self.interval = interval
+        self.keep = keep
+        self._active = {}  # thread id -> Counter of stacks
+        self._lock = threading.Lock()
+        self._thread = None
+        self.saved = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        os.makedirs(self.out_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, samples in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None and ident != own:
+                        samples[_stack(frame)] += 1
+
+    def begin(self):
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+
+    def end(self, label, elapsed):
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+        if not samples or elapsed < self.threshold:
+            return None
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed * 1000)}ms-{label}.folded"
+        path = os.path.join(self.out_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        self.saved += 1
+        self._prune()
+        return name
+
+    def _prune(self):
+        profiles = sorted(self.list(), key=lambda p: p["modified"])
+        for profile in profiles[:max(0, len(profiles) - self.keep)]:
+            try:
+                os.remove(os.path.join(self.out_dir, profile["name"]))
+            except FileNotFoundError:
+                pass
+
+    def list(self):
+        profiles = []
+        for entry in os.scandir(self.out_dir):
+            if entry.name.endswith(".folded"):
+                st = entry.stat()
+                profiles.append({"name": entry.name, "bytes": st.st_size, "modified": st.st_mtime})
+        return sorted(profiles, key=lambda p: p["modified"], reverse=True)
@@ -0,0 +1,148 @@
+import os
+import json
+import hashlib
+import threading
+
+from openpyxl import load_workbook
+
+from metrics import timed
+from mcq_grader import AnswerKey
+
+
+def normalize_header(header):
+    h = str(header).strip().lower()
+    if 'id' in h or 'question_id' in h or 'q_id' in h:
+        return 'id'
+    elif 'question' in h and 'text' in h:
+        return 'question_text'
+    elif 'question' in h:
+        return 'question_text'
+    elif 'option' in h and 'a' in h:
+        return 'optionA'
+    elif 'option' in h and 'b' in h:
+        return 'optionB'
+    elif 'option' in h and 'c' in h:
+        return 'optionC'
+    elif 'option' in h and 'd' in h:
+        return 'optionD'
+    elif 'correct' in h or 'answer' in h:
+        return 'correct_answer'
+    return header
+
+
+def parse_questions(file_path):
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        rows = ws.iter_rows(values_only=True)
+        raw_headers = next(rows, ())
+
+        # Normalize headers to expected format
+        header_map = {}
+        for i, header in enumerate(raw_headers):
+            if header:
+                header_map[i] = normalize_header(header)
+
+        questions = []
+        for row in rows:
+            if any(row):  # Skip empty rows
+                question = {}
+                for i, value in enumerate(row):
+                    if i in header_map:
+                        question[header_map[i]] = value
+
+                # Ensure required fields exist
+                if 'question_text' in question and question['question_text']:
+                    if 'id' not in question:
+                        question['id'] = len(questions) + 1
+                    questions.append(question)
+        return questions
+    finally:
+        wb.close()
+
+
+class QuestionBank:
+    """Parses questions.xlsx once and serves the normalized list from memory.
+
+    The cache is keyed by the file's (mtime, size); when those change the
+    file is re-hashed and only re-parsed if its contents actually differ.
+    Students get the list without ``correct_answer`` (``student_snapshot()``);
+    the answers are kept server-side as an ``AnswerKey``.
+    """
+
+    def __init__(self, file_path, dumps=json.dumps):
+        self.file_path = file_path
+        self.dumps = dumps
+        self._lock = threading.Lock()
+        self._snapshot = None  # (stat_key, sha256, questions, json_body, student_json_body, answer_key)
+
+    def _stat_key(self):
+        st = os.stat(self.file_path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self, stat_key):
+        with open(self.file_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        current = self._snapshot
+        if current and current[1] == digest:
+            return (stat_key,) + current[1:]
+        with timed("mcq_parse"):
+            questions = parse_questions(self.file_path)
+        body = self.dumps(questions).encode("utf-8")
+        student_questions = [{k: v for k, v in q.items() if k != "correct_answer"} for q in questions]
+        student_body = self.dumps(student_questions).encode("utf-8")
+        return (stat_key, digest, questions, body, student_body, AnswerKey(questions))
+
+    def _current(self):
+        stat_key = self._stat_key()
+        current = self._snapshot
+        if current is None or current[0] != stat_key:
+            with self._lock:
+                current = self._snapshot
+                if current is None or current[0] != stat_key:
+                    current = self._load(stat_key)
+                    self._snapshot = current
+        return current
+
+    def snapshot(self):
+        """Return (sha256, questions, json_body); raises FileNotFoundError."""
+        current = self._current()
+        return current[1], current[2], current[3]
+
+    def student_snapshot(self):
+        """Return (sha256, json_body without the correct answers)."""
+        current = self._current()
+        return current[1], current[4]
+
+    def answer_key(self):
+        return self._current()[5]
+
+    def questions(self):
+        return self.snapshot()[1]
+
+    def json_body(self):
+        return self.snapshot()[2]
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def replace(self, file_storage):
+        """Atomically swap in an uploaded workbook and drop the cached copy.
+
+        file_storage is a multipart upload, or the path of a finished chunked one.
+        """
+        folder = os.path.dirname(self.file_path)
+        os.makedirs(folder, exist_ok=True)
+        tmp_path = os.path.join(folder, f".questions.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            if isinstance(file_storage, str):
+                os.replace(file_storage, tmp_path)
+            else:
+                file_storage.save(tmp_path)
+            with self._lock:
+                os.replace(tmp_path, self.file_path)
+                self._snapshot = None
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
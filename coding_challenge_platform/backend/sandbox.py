@@ -0,0 +1,235 @@
+"""Limits and isolation for submitted code run by the local executor.
+
+Every compile and run is started as
+
+    python -I -S sandbox.py '<json spec>' <program> <args...>
+
+and this script applies the spec, then execs the program. Doing it in a
+fresh process keeps fork+exec free of Python code (a ``preexec_fn`` is not
+safe while the executor's threads run).
+
+With ``"isolate"`` set (the "namespace" mode, which needs root) the program
+also runs:
+
+- in its own network namespace, with nothing but a loopback that is down;
+- in its own mount namespace, with every ``hide`` path (the project tree,
+  uploads, the database, the session secret) covered by an empty read-only
+  tmpfs;
+- as ``uid`` (one per executor worker, never a real account) with no
+  supplementary groups, so RLIMIT_NPROC caps that worker's processes and a
+  fork bomb stops there. ``reap(uid)`` kills whatever a job left behind.
+  Each server process takes its own block of uids with ``claim_uids()``,
+  so no two workers of different server processes ever share one.
+"""
+import os
+import sys
+import json
+import ctypes
+import signal
+import subprocess
+
+try:
+    import fcntl
+except ImportError:  # Windows: no namespace mode, so nothing to claim
+    fcntl = None
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits or namespaces
+    resource = None
+
+WRAPPER = os.path.abspath(__file__)
+
+CLONE_NEWNS = 0x00020000
+CLONE_NEWUTS = 0x04000000
+CLONE_NEWIPC = 0x08000000
+CLONE_NEWNET = 0x40000000
+MS_RDONLY, MS_NOSUID, MS_NODEV, MS_NOEXEC = 0x1, 0x2, 0x4, 0x8
+MS_REC = 0x4000
+MS_PRIVATE = 0x40000
+
+# Exit codes for failures before the program starts (stderr says which)
+EXIT_NOT_FOUND = 127
+EXIT_SANDBOX = 126
+NOT_FOUND_PREFIX = "Toolchain not available: "
+SANDBOX_PREFIX = "Sandbox unavailable: "
+
+
+class SandboxUnavailable(RuntimeError):
+    pass
+
+
+def command(cmd, spec):
+    """The argv that runs cmd under spec."""
+    return [sys.executable, "-I", "-S", WRAPPER, json.dumps(spec), *cmd]
+
+
+def environment(workdir):
+    # Nothing from the server's environment (secrets, database URIs) reaches the program
+    return {"PATH": os.environ.get("PATH", os.defpath), "LANG": "C.UTF-8", "HOME": workdir, "TMPDIR": workdir}
+
+
+def check(hide, python, uid):
+    """Raise SandboxUnavailable unless python runs under namespace isolation as uid."""
+    if resource is None or not sys.platform.startswith("linux"):
+        raise SandboxUnavailable("namespace isolation needs Linux")
+    if os.geteuid() != 0:
+        raise SandboxUnavailable("namespace isolation needs the server to run as root (it drops to a "
+                                 "per-worker uid itself)")
+    spec = {"isolate": True, "hide": hide, "uid": uid, "cpu_seconds": 10, "output_bytes": 1024 * 1024}
+    # The interpreter submissions use must stay reachable with hide covered
+    probe = subprocess.run(command([python, "-I", "-S", "-c", "pass"], spec),
+                           capture_output=True, text=True, env=environment("/"), cwd="/", timeout=30)
+    if probe.returncode != 0:
+        reason = (probe.stderr or "").strip().removeprefix(SANDBOX_PREFIX) or f"exit status {probe.returncode}"
+        raise SandboxUnavailable(f"{python} does not start in the sandbox as uid {uid}: {reason}")
+
+
+# ---------- uid blocks (one per server process) ----------
+CLAIMS_FILE = "uid_claims.json"
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _update_claims(directory, change):
+    """Apply change(live claims) to the claims file under an exclusive lock."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, CLAIMS_FILE)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    with os.fdopen(fd, "r+", encoding="utf-8") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            claims = json.loads(f.read() or "[]")
+        except ValueError:
+            claims = []
+        # Blocks of server processes that are gone are free again
+        claims = [c for c in claims if _alive(c["pid"])]
+        result = change(claims)
+        f.seek(0)
+        f.truncate()
+        f.write(json.dumps(claims))
+        return result
+
+
+def claim_uids(directory, uid_base, count, limit=10000):
+    """Reserve count consecutive uids from uid_base for this process; returns the first."""
+    def take(claims):
+        for claim in claims:
+            if claim["pid"] == os.getpid():
+                claims.remove(claim)  # e.g. a restarted pool: claim again at the new size
+                break
+        taken = sorted((c["first"], c["first"] + c["count"]) for c in claims)
+        first = uid_base
+        for start, end in taken:
+            if first + count <= start:
+                break
+            first = max(first, end)
+        if first + count > uid_base + limit:
+            raise SandboxUnavailable(f"no free block of {count} uids from {uid_base} "
+                                     f"({len(claims)} server processes hold the rest)")
+        claims.append({"pid": os.getpid(), "first": first, "count": count})
+        return first
+    return _update_claims(directory, take)
+
+
+def release_uids(directory):
+    def drop(claims):
+        claims[:] = [c for c in claims if c["pid"] != os.getpid()]
+    _update_claims(directory, drop)
+
+
+# ---------- cleanup (runs in the executor worker) ----------
+def _pids_of(uid):
+    for name in os.listdir("/proc"):
+        if name.isdigit():
+            try:
+                if os.stat(f"/proc/{name}").st_uid == uid:
+                    yield int(name)
+            except FileNotFoundError:
+                continue
+
+
+def reap(uid, rounds=50):
+    """SIGKILL every process running as uid; returns how many were killed."""
+    killed = 0
+    for _ in range(rounds):
+        # Stop them all first so none can fork while the rest are being killed
+        pids = list(_pids_of(uid))
+        if not pids:
+            break
+        for sig in (signal.SIGSTOP, signal.SIGKILL):
+            for pid in pids:
+                try:
+                    os.kill(pid, sig)
+                except ProcessLookupError:
+                    continue
+        killed += len(pids)
+    return killed
+
+
+# ---------- inside the wrapper process ----------
+def _check_call(result, what):
+    if result != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"{what}: {os.strerror(errno)}")
+
+
+def _isolate(hide):
+    libc = ctypes.CDLL(None, use_errno=True)
+    _check_call(libc.unshare(CLONE_NEWNS | CLONE_NEWNET | CLONE_NEWIPC | CLONE_NEWUTS), "unshare")
+    # Mounts made below must not leak back into the server's namespace
+    _check_call(libc.mount(b"none", b"/", None, MS_REC | MS_PRIVATE, None), "mount --make-rprivate /")
+    for path in hide:
+        if os.path.isdir(path):
+            _check_call(libc.mount(b"tmpfs", os.fsencode(path), b"tmpfs",
+                                   MS_RDONLY | MS_NOSUID | MS_NODEV | MS_NOEXEC, b"size=4k,mode=0"),
+                        f"hide {path}")
+
+
+def _limit(spec):
+    cpu = spec["cpu_seconds"]
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (spec["output_bytes"], spec["output_bytes"]))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    if spec.get("memory_mb"):
+        memory = spec["memory_mb"] * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    if spec.get("uid") is not None and spec.get("processes"):
+        # Counted per uid, which is why every executor worker gets its own
+        resource.setrlimit(resource.RLIMIT_NPROC, (spec["processes"], spec["processes"]))
+
+
+def main(argv):
+    spec, cmd = json.loads(argv[1]), argv[2:]
+    try:
+        if spec.get("isolate"):
+            _isolate(spec.get("hide") or [])
+        if resource is not None:
+            _limit(spec)
+        if spec.get("uid") is not None:
+            os.setgroups([])
+            os.setgid(spec["uid"])
+            os.setuid(spec["uid"])
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f"{SANDBOX_PREFIX}{e}\n")
+        return EXIT_SANDBOX
+    try:
+        os.execvp(cmd[0], cmd)
+    except FileNotFoundError:
+        sys.stderr.write(f"{NOT_FOUND_PREFIX}{cmd[0]}\n")
+        return EXIT_NOT_FOUND
+    except OSError as e:
+        sys.stderr.write(f"{SANDBOX_PREFIX}{e}\n")
+        return EXIT_SANDBOX
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
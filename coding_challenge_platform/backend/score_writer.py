@@ -0,0 +1,397 @@
+import os
+import json
+import time
+import threading
+
+from storage import json_default, json_object_hook
+from judge_queue import pid_alive
+
+# Shared by every writer under journal_root: time of the last "delete all scores"
+CLEARED_MARKER = "scores.cleared"
+# Per writer, in its journal directory: the marker it has applied
+CLEARED_ACK = "cleared"
+
+
+def _read_stamp(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return float(f.read())
+    except (FileNotFoundError, ValueError):
+        return 0.0
+
+
+def _write_stamp(path, value):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(repr(value))
+    os.replace(tmp, path)
+
+
+class ScoreWriter:
+    """Write-behind buffer for per-user round score upserts.
+
+    ``write()`` appends the upsert to a local journal and returns; a
+    background thread coalesces buffered writes per (username, round) and
+    sends them to the storage backend as one bulk upsert once max_batch writes are
+    waiting or flush_interval seconds have passed. Each flush rotates the
+    journal to a numbered segment that is only deleted after storage has
+    acknowledged the batch, so writes not yet flushed when the process dies
+    are replayed by ``start()``.
+
+    Each process journals into ``journal_root/<pid>``, so several server
+    workers can share journal_root; a starting writer also adopts the
+    journals of workers that are no longer running. Every write is stamped
+    with ``written_at``: replayed entries older than the stored document, or
+    than the last ``clear()`` in any worker, are dropped.
+
+    Reads see the writes buffered in every worker, not just this one:
+    ``unflushed()`` also reads the other workers' journals, so a student
+    whose next request lands on another worker still reads back their score.
+    """
+
+    def __init__(self, storage, journal_root, max_batch=200, flush_interval=0.5, fsync=True):
+        self.storage = storage
+        self.journal_root = journal_root
+        self.journal_dir = None
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._pending = {}     # (username, round) -> merged $set fields
+        self._inflight = {}    # batch currently being written
+        self._journal = None
+        self._segment = 0
+        self._segments = []    # journal segments whose writes storage hasn't acknowledged
+        self._cleared_at = 0.0  # last shared clear() this writer has applied
+        self._thread = None
+        self._stats = {
+            "writes": 0, "coalesced": 0, "flushes": 0, "flushed_docs": 0, "errors": 0,
+            "max_batch": 0, "flush_seconds_total": 0.0, "flush_seconds_max": 0.0,
+            "last_flush_seconds": 0.0, "last_error": None,
+        }
+
+    # ---------- journal ----------
+    @property
+    def _journal_path(self):
+        return os.path.join(self.journal_dir, "scores.journal")
+
+    def _segment_paths(self):
+        names = [n for n in os.listdir(self.journal_dir) if n.startswith("scores.") and n.endswith(".segment")]
+        return [os.path.join(self.journal_dir, n) for n in sorted(names, key=lambda n: int(n.split(".")[1]))]
+
+    def _open_journal(self):
+        self._journal = open(self._journal_path, "a", encoding="utf-8")
+
+    def _adopt_orphans(self):
+        """Move journals left by dead worker processes into our own directory."""
+        own_pid = os.getpid()
+        for name in sorted(os.listdir(self.journal_root)):
+            try:
+                owner = int(name.split(".")[0])
+            except ValueError:
+                continue
+            path = os.path.join(self.journal_root, name)
+            if path == self.journal_dir or not os.path.isdir(path):
+                continue
+            if owner != own_pid and pid_alive(owner):
+                continue
+            # Claim it with an atomic rename so two new workers can't both adopt it
+            claimed = os.path.join(self.journal_root, f"{own_pid}.adopting.{name.split('.')[-1]}")
+            if path != claimed:
+                try:
+                    os.rename(path, claimed)
+                except OSError:
+                    continue
+            files = [n for n in os.listdir(claimed) if n.endswith(".segment")]
+            files.sort(key=lambda n: int(n.split(".")[1]))
+            if os.path.exists(os.path.join(claimed, "scores.journal")):
+                files.append("scores.journal")
+            for n in files:
+                self._segment += 1
+                os.replace(os.path.join(claimed, n),
+                           os.path.join(self.journal_dir, f"scores.{self._segment}.segment"))
+            for n in os.listdir(claimed):
+                os.remove(os.path.join(claimed, n))  # its clear() ack
+            os.rmdir(claimed)
+
+    def _replay(self):
+        """Buffer the writes found in our segments, minus those already superseded.
+
+        A segment can outlive the flush that stored it (the process died
+        before removing it), so an entry is only replayed if it is newer
+        than the document in storage and than the last clear().
+        """
+        entries = []
+        for path in self._segments:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line, object_hook=json_object_hook))
+                    except ValueError:
+                        continue  # torn last line from a crash mid-append
+        entries = [e for e in entries if (e[2].get("written_at") or 0) > self._cleared_at]
+        if not entries:
+            return
+        keys = {(username, round_name) for username, round_name, _ in entries}
+        stored = {(doc.get("username"), doc.get("round")): doc.get("written_at") or 0
+                  for doc in self.storage.find_scores() if (doc.get("username"), doc.get("round")) in keys}
+        # Later segments win, as they were written later
+        for username, round_name, fields in entries:
+            key = (username, round_name)
+            if key in stored and (fields.get("written_at") or 0) <= stored[key]:
+                continue
+            self._pending.setdefault(key, {}).update(fields)
+
+    @property
+    def _marker_path(self):
+        return os.path.join(self.journal_root, CLEARED_MARKER)
+
+    def _sync_cleared(self):
+        """Apply a clear() made by any writer; caller holds _flush_lock."""
+        cleared_at = _read_stamp(self._marker_path)
+        if cleared_at <= self._cleared_at or self._journal is None:
+            return
+        with self._lock:
+            self._pending = {key: fields for key, fields in self._pending.items()
+                             if fields.get("written_at", 0) > cleared_at}
+            self._cleared_at = cleared_at
+            if not self._pending:
+                # Nothing in the journal is worth replaying any more
+                self._journal.truncate(0)
+                for segment in self._segments:
+                    os.remove(segment)
+                self._segments = []
+        _write_stamp(os.path.join(self.journal_dir, CLEARED_ACK), cleared_at)
+
+    def _unacknowledged(self, cleared_at):
+        """Pids of running writers that have not yet applied cleared_at."""
+        waiting = []
+        for name in os.listdir(self.journal_root):
+            path = os.path.join(self.journal_root, name)
+            if not name.isdigit() or int(name) == os.getpid() or not os.path.isdir(path):
+                continue
+            if pid_alive(int(name)) and _read_stamp(os.path.join(path, CLEARED_ACK)) < cleared_at:
+                waiting.append(int(name))
+        return waiting
+
+    def _rotate(self):
+        """Move the live journal aside as a segment; caller holds _lock."""
+        self._journal.close()
+        self._segment += 1
+        segment = os.path.join(self.journal_dir, f"scores.{self._segment}.segment")
+        os.replace(self._journal_path, segment)
+        self._segments.append(segment)
+        self._open_journal()
+
+    # ---------- lifecycle ----------
+    def start(self):
+        with self._lock:
+            if self._thread:
+                return
+            # Resolved here rather than in __init__: under a pre-forking
+            # server the writer is created before fork and started after
+            self.journal_dir = os.path.join(self.journal_root, str(os.getpid()))
+            os.makedirs(self.journal_dir, exist_ok=True)
+            self._segment = max([int(os.path.basename(p).split(".")[1]) for p in self._segment_paths()] or [0])
+            if os.path.exists(self._journal_path):
+                self._open_journal()
+                self._rotate()
+            else:
+                self._open_journal()
+            self._adopt_orphans()
+            self._segments = self._segment_paths()
+            # Writes left by a previous process go out with the first flush
+            self._cleared_at = _read_stamp(self._marker_path)
+            self._replay()
+            _write_stamp(os.path.join(self.journal_dir, CLEARED_ACK), self._cleared_at)
+            self._thread = threading.Thread(target=self._run, name="score-writer", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Best-effort final flush; anything left stays in the journal."""
+        try:
+            self.flush()
+        except Exception as e:
+            print("Score flush on shutdown failed, journal kept:", e)
+
+    # ---------- writes ----------
+    def write(self, username, round_name, fields):
+        with self._lock:
+            if self._journal is None:
+                raise RuntimeError("ScoreWriter.start() has not been called")
+            # Stamped under the lock so no write can slip in before a clear() it follows
+            fields = {**fields, "written_at": time.time()}
+            line = json.dumps([username, round_name, fields], default=json_default)
+            self._journal.write(line + "\n")
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            key = (username, round_name)
+            if key in self._pending:
+                self._stats["coalesced"] += 1
+                self._pending[key].update(fields)
+            else:
+                self._pending[key] = dict(fields)
+            self._stats["writes"] += 1
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of documents sent."""
+        with self._flush_lock:
+            self._sync_cleared()
+            with self._lock:
+                if not self._pending or self._journal is None:
+                    return 0
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+                self._rotate()
+                segments = list(self._segments)
+            started = time.perf_counter()
+            try:
+                self.storage.bulk_upsert_scores(batch)
+            except Exception as e:
+                with self._lock:
+                    # Keep the batch (and its segments) for the next attempt;
+                    # fields written since take precedence
+                    for key, fields in batch.items():
+                        merged = dict(fields)
+                        merged.update(self._pending.get(key, {}))
+                        self._pending[key] = merged
+                    self._inflight = {}
+                    self._stats["errors"] += 1
+                    self._stats["last_error"] = str(e)
+                raise
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                for segment in segments:
+                    os.remove(segment)
+                    self._segments.remove(segment)
+                self._inflight = {}
+                stats = self._stats
+                stats["flushes"] += 1
+                stats["flushed_docs"] += len(batch)
+                stats["max_batch"] = max(stats["max_batch"], len(batch))
+                stats["flush_seconds_total"] += elapsed
+                stats["flush_seconds_max"] = max(stats["flush_seconds_max"], elapsed)
+                stats["last_flush_seconds"] = elapsed
+            return len(batch)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print("Score flush failed, will retry:", e)
+                time.sleep(self.flush_interval)
+
+    def clear(self, timeout=30):
+        """Drop the writes buffered in every worker (used when all scores are deleted).
+
+        Publishes a shared marker and waits until each running writer has
+        dropped what it buffered before it and finished any flush under
+        way. Returns the marker: storage rows written before it are the
+        ones to delete (see Storage.delete_scores).
+        """
+        cleared_at = max(time.time(), _read_stamp(self._marker_path))
+        _write_stamp(self._marker_path, cleared_at)
+        with self._flush_lock:
+            self._sync_cleared()
+        deadline = time.monotonic() + timeout
+        while True:
+            waiting = self._unacknowledged(cleared_at)
+            if not waiting:
+                return cleared_at
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"score writers {waiting} did not drop their buffered writes")
+            time.sleep(min(0.05, self.flush_interval))
+
+    # ---------- reads ----------
+    def buffered(self, username=None):
+        """Writes not yet acknowledged by storage, as {(username, round): fields}."""
+        with self._lock:
+            merged = {}
+            for source in (self._inflight, self._pending):
+                for key, fields in source.items():
+                    if username is None or key[0] == username:
+                        merged.setdefault(key, {}).update(fields)
+            return merged
+
+    def _peer_writes(self, username=None):
+        """[username, round, fields] journaled by the other writers and not yet flushed."""
+        entries = []
+        try:
+            names = os.listdir(self.journal_root)
+        except FileNotFoundError:
+            return entries
+        for name in names:
+            folder = os.path.join(self.journal_root, name)
+            if not name.isdigit() or folder == self.journal_dir:
+                continue
+            try:
+                files = os.listdir(folder)
+            except (FileNotFoundError, NotADirectoryError):
+                continue  # adopted meanwhile
+            for file_name in files:
+                if file_name != "scores.journal" and not file_name.endswith(".segment"):
+                    continue
+                try:
+                    with open(os.path.join(folder, file_name), "r", encoding="utf-8") as f:
+                        lines = f.readlines()
+                except FileNotFoundError:
+                    continue  # flushed and removed meanwhile
+                for line in lines:
+                    try:
+                        entry = json.loads(line, object_hook=json_object_hook)
+                    except ValueError:
+                        continue  # still being appended
+                    if username is None or entry[0] == username:
+                        entries.append(entry)
+        return entries
+
+    def unflushed(self, username=None):
+        """Writes accepted by any worker that may not be in storage yet, oldest first.
+
+        Call it before reading the documents to overlay(): a flush finishing
+        in between then shows in storage instead of being missed by both.
+        """
+        entries = [[user, round_name, fields] for (user, round_name), fields in self.buffered(username).items()]
+        entries += self._peer_writes(username)
+        cleared_at = _read_stamp(self._marker_path)
+        entries = [entry for entry in entries if entry[2].get("written_at", 0) > cleared_at]
+        entries.sort(key=lambda entry: entry[2].get("written_at", 0))
+        return entries
+
+    @staticmethod
+    def overlay(docs, writes):
+        """Apply unflushed() writes newer than the score documents read from storage.
+
+        The written_at stamps are internal and left out of the result.
+        """
+        merged = {}
+        for doc in docs:
+            merged[(doc.get("username"), doc.get("round"))] = dict(doc)
+        for user, round_name, fields in writes:
+            doc = merged.get((user, round_name))
+            if doc is None:
+                merged[(user, round_name)] = {"username": user, "round": round_name, **fields}
+            elif fields.get("written_at", 0) > (doc.get("written_at") or 0):
+                doc.update(fields)
+        for doc in merged.values():
+            doc.pop("written_at", None)
+        return list(merged.values())
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending)
+            stats["inflight"] = len(self._inflight)
+        flushes = stats["flushes"]
+        stats["avg_batch"] = stats["flushed_docs"] / flushes if flushes else 0.0
+        stats["avg_flush_seconds"] = stats.pop("flush_seconds_total") / flushes if flushes else 0.0
+        return stats
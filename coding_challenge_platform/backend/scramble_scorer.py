@@ -0,0 +1,91 @@
+from bisect import bisect_left
+from collections import defaultdict, deque
+
+
+def normalize_lines(code):
+    """Split code into line tokens, collapsing whitespace and dropping blanks."""
+    lines = []
+    for line in (code or "").splitlines():
+        token = " ".join(line.split())
+        if token:
+            lines.append(token)
+    return lines
+
+
+def match_positions(original_lines, student_lines):
+    """Map each student line to the index of an unused identical original line.
+
+    Duplicate lines are handed out in original order, so a correctly ordered
+    submission maps onto a strictly increasing sequence. Unknown lines are
+    skipped. O(n).
+    """
+    positions = defaultdict(deque)
+    for i, line in enumerate(original_lines):
+        positions[line].append(i)
+    matched = []
+    for line in student_lines:
+        slots = positions.get(line)
+        if slots:
+            matched.append(slots.popleft())
+    return matched
+
+
+def longest_increasing_subsequence(seq):
+    """Length of the longest strictly increasing subsequence. O(n log n)."""
+    tails = []
+    for x in seq:
+        i = bisect_left(tails, x)
+        if i == len(tails):
+            tails.append(x)
+        else:
+            tails[i] = x
+    return len(tails)
+
+
+def count_inversions(seq):
+    """Number of out-of-order pairs, via a Fenwick tree. O(n log n)."""
+    if not seq:
+        return 0
+    ranks = {v: i + 1 for i, v in enumerate(sorted(set(seq)))}
+    size = len(ranks)
+    tree = [0] * (size + 1)
+    inversions = 0
+    for seen, value in enumerate(seq):
+        r = ranks[value]
+        # count of already-seen values <= r
+        not_greater, i = 0, r
+        while i > 0:
+            not_greater += tree[i]
+            i -= i & -i
+        inversions += seen - not_greater
+        i = r
+        while i <= size:
+            tree[i] += 1
+            i += i & -i
+    return inversions
+
+
+def score_scramble(original_code, student_code):
+    """Score a reassembled program against the original, line by line.
+
+    similarity is the share of original lines that appear in the longest
+    correctly ordered run of the submission, divided by the longer of the two
+    programs so missing and extra lines both cost. It is 1.0 only for an exact
+    (whitespace-insensitive) reconstruction.
+    """
+    original_lines = normalize_lines(original_code)
+    student_lines = normalize_lines(student_code)
+    matched = match_positions(original_lines, student_lines)
+    in_order = longest_increasing_subsequence(matched)
+    longest = max(len(original_lines), len(student_lines))
+    pairs = len(matched) * (len(matched) - 1) // 2
+    inversions = count_inversions(matched)
+    return {
+        "similarity": in_order / longest if longest else 1.0,
+        "matched_lines": len(matched),
+        "in_order_lines": in_order,
+        "original_lines": len(original_lines),
+        "submitted_lines": len(student_lines),
+        "inversions": inversions,
+        "order_score": 1.0 - inversions / pairs if pairs else 1.0,
+    }
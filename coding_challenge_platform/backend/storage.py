@@ -0,0 +1,694 @@
+import re
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from itertools import groupby
+from collections import Counter
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+# Columns of the submissions catalog, in SQLite table order
+SUBMISSION_FIELDS = ("path", "username", "round", "language", "filename", "size", "sha256",
+                     "remaining_time", "timestamp")
+
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def json_object_hook(obj):
+    if len(obj) == 1 and "$dt" in obj:
+        return datetime.fromisoformat(obj["$dt"])
+    return obj
+
+
+def dumps(doc):
+    return json.dumps(doc, default=json_default, separators=(",", ":"))
+
+
+def loads(text):
+    return json.loads(text, object_hook=json_object_hook)
+
+
+# =====================================================
+# MONGODB
+# =====================================================
+class MongoStorage:
+    """Users, scores and the submissions catalog in MongoDB.
+
+    One MongoClient (and so one connection pool) is shared by every request
+    thread, the judge workers and the score writer.
+    """
+
+    name = "mongo"
+
+    def __init__(self, uri=None, db_name="coding_challenge", max_pool_size=100, min_pool_size=0,
+                 connect_timeout_ms=5000, server_selection_timeout_ms=5000, wait_queue_timeout_ms=10000):
+        self.uri = uri
+        self.client_options = dict(maxPoolSize=max_pool_size, minPoolSize=min_pool_size,
+                                   connectTimeoutMS=connect_timeout_ms,
+                                   serverSelectionTimeoutMS=server_selection_timeout_ms,
+                                   waitQueueTimeoutMS=wait_queue_timeout_ms, retryWrites=True)
+        self.client = MongoClient(uri, **self.client_options)
+        self.db = self.client[db_name]
+        self._async_db = None
+        self.scores = self.db["scores"]
+        self.users = self.db["users"]
+        self.submissions = self.db["submissions"]
+        self.revoked_sessions = self.db["revoked_sessions"]
+        self.blobs = self.db["blobs"]
+        self.live_events = self.db["live_events"]
+        self.counters = self.db["counters"]
+
+    def ensure_indexes(self):
+        self.scores.create_index([("username", ASCENDING), ("round", ASCENDING)])
+        self.scores.create_index([("round", ASCENDING), ("saved_file", ASCENDING)])
+        self.users.create_index([("username", ASCENDING)], unique=True)
+        self.submissions.create_index([("path", ASCENDING)], unique=True)
+        self.submissions.create_index([("round", ASCENDING), ("timestamp", DESCENDING)])
+        self.submissions.create_index([("username", ASCENDING), ("round", ASCENDING)])
+        self.submissions.create_index([("language", ASCENDING)])
+        self.submissions.create_index([("sha256", ASCENDING)])
+        self.blobs.create_index([("refs", ASCENDING)])
+        # Mongo deletes revocations once the token would have expired anyway
+        self.revoked_sessions.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+
+    def ping(self):
+        self.client.admin.command("ping")
+
+    def close(self):
+        # The client reopens on next use, so this is also safe before fork
+        self.client.close()
+
+    # ---------- users ----------
+    def get_user(self, username, role=None):
+        query = {"username": username}
+        if role:
+            query["role"] = role
+        return self.users.find_one(query, {"_id": 0})
+
+    def create_user(self, user):
+        """Insert a new user; False if the username is taken."""
+        if self.users.find_one({"username": user["username"]}, {"_id": 1}):
+            return False
+        try:
+            self.users.insert_one(dict(user))
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def update_user(self, username, fields, unset=()):
+        update = {"$set": fields}
+        if unset:
+            update["$unset"] = {name: "" for name in unset}
+        self.users.update_one({"username": username}, update)
+
+    def usernames(self):
+        return [u["username"] for u in self.users.find({}, {"_id": 0, "username": 1})]
+
+    # ---------- sessions ----------
+    def revoke_token(self, jti, expires_at):
+        """Record a logged-out session id until its token expires (epoch seconds)."""
+        self.revoked_sessions.update_one(
+            {"_id": jti}, {"$set": {"expires_at": datetime.fromtimestamp(expires_at, timezone.utc)}}, upsert=True)
+
+    def revoked_tokens(self, now):
+        """{session id: expiry} for revocations that have not expired by now."""
+        cursor = self.revoked_sessions.find({"expires_at": {"$gt": datetime.fromtimestamp(now, timezone.utc)}})
+        return {doc["_id"]: doc["expires_at"].replace(tzinfo=timezone.utc).timestamp() for doc in cursor}
+
+    # ---------- scores ----------
+    def upsert_score(self, username, round_name, fields):
+        self.scores.update_one({"username": username, "round": round_name}, {"$set": fields}, upsert=True)
+
+    def bulk_upsert_scores(self, batch):
+        """batch: {(username, round): fields}, sent as one unordered bulk write."""
+        ops = [UpdateOne({"username": username, "round": round_name}, {"$set": fields}, upsert=True)
+               for (username, round_name), fields in batch.items()]
+        if ops:
+            self.scores.bulk_write(ops, ordered=False)
+
+    def update_scores_if(self, batch):
+        """batch: {(username, round): (expected, fields)}; returns how many were written.
+
+        A score is updated only while its stored values still equal expected,
+        so one rewritten since they were read is left alone.
+        """
+        ops = [UpdateOne({"username": username, "round": round_name, **expected}, {"$set": fields})
+               for (username, round_name), (expected, fields) in batch.items()]
+        if not ops:
+            return 0
+        return self.scores.bulk_write(ops, ordered=False).matched_count
+
+    def find_scores(self, username=None, round_name=None, batch_size=500):
+        query = {}
+        if username:
+            query["username"] = username
+        if round_name:
+            query["round"] = round_name
+        return self.scores.find(query, {"_id": 0}).batch_size(batch_size)
+
+    async def find_scores_async(self, username=None, round_name=None):
+        """find_scores() for asyncio callers, through a Motor client.
+
+        The Motor client is created on first use so that it binds to the
+        serving event loop; it has its own pool with the same settings.
+        """
+        if self._async_db is None:
+            self._async_db = AsyncIOMotorClient(self.uri, **self.client_options)[self.db.name]
+        query = {}
+        if username:
+            query["username"] = username
+        if round_name:
+            query["round"] = round_name
+        return await self._async_db["scores"].find(query, {"_id": 0}).to_list(length=None)
+
+    def scores_by_user(self, rounds):
+        """Yield (username, [score docs]) for the given rounds, one aggregation."""
+        pipeline = [
+            {"$match": {"round": {"$in": list(rounds)}}},
+            {"$project": {"_id": 0, "username": 1, "round": 1, "score": 1,
+                          "percentage": 1, "remaining_time": 1}},
+            {"$group": {"_id": "$username", "rounds": {"$push": "$$ROOT"}}},
+        ]
+        for doc in self.scores.aggregate(pipeline):
+            yield doc["_id"], doc["rounds"]
+
+    def delete_scores(self, written_before=None):
+        """Delete every score, or those a ScoreWriter stamped before written_before."""
+        query = {}
+        if written_before is not None:
+            query = {"$or": [{"written_at": {"$exists": False}}, {"written_at": {"$lt": written_before}}]}
+        self.scores.delete_many(query)
+
+    # ---------- live events ----------
+    # One sequence for every worker (counters "live_events"), so a viewer's
+    # cursor means the same on all of them
+    def append_event(self, event_type, data):
+        """Store an event under the next sequence number, which is returned."""
+        seq = self.counters.find_one_and_update({"_id": "live_events"}, {"$inc": {"seq": 1}}, upsert=True,
+                                                return_document=ReturnDocument.AFTER)["seq"]
+        self.live_events.insert_one({"_id": seq, "type": event_type, "data": data})
+        return seq
+
+    def events_after(self, seq, limit=1000):
+        """[(seq, type, data)] after seq, oldest first. Numbers can briefly be
+        missing: an event is inserted just after its number is taken."""
+        cursor = self.live_events.find({"_id": {"$gt": seq}}).sort("_id", ASCENDING).limit(limit)
+        return [(doc["_id"], doc["type"], doc["data"]) for doc in cursor]
+
+    def last_event_seq(self):
+        doc = self.counters.find_one({"_id": "live_events"})
+        return doc["seq"] if doc else 0
+
+    def first_event_seq(self):
+        doc = self.live_events.find_one({}, {"_id": 1}, sort=[("_id", ASCENDING)])
+        return doc["_id"] if doc else None
+
+    def trim_events(self, upto):
+        self.live_events.delete_many({"_id": {"$lte": upto}})
+
+    # ---------- submissions catalog ----------
+    # Every entry is a reference to the blob with its sha256; blobs.refs counts
+    # them (not atomically with the catalog write: recount_blob_refs() repairs drift)
+    def _adjust_refs(self, changes):
+        ops = [UpdateOne({"_id": digest}, {"$inc": {"refs": n}}, upsert=True)
+               for digest, n in changes.items() if digest and n]
+        if ops:
+            self.blobs.bulk_write(ops, ordered=False)
+
+    def put_submission(self, entry):
+        old = self.submissions.find_one_and_replace({"path": entry["path"]}, dict(entry), upsert=True,
+                                                    projection={"_id": 0, "sha256": 1})
+        old_digest = (old or {}).get("sha256")
+        if old_digest != entry.get("sha256"):
+            self._adjust_refs(Counter({entry.get("sha256"): 1, old_digest: -1}))
+
+    def put_submissions(self, entries):
+        entries = list(entries)
+        if not entries:
+            return
+        previous = {doc["path"]: doc.get("sha256") for doc in self.submissions.find(
+            {"path": {"$in": [entry["path"] for entry in entries]}}, {"_id": 0, "path": 1, "sha256": 1})}
+        self.submissions.bulk_write([ReplaceOne({"path": entry["path"]}, dict(entry), upsert=True)
+                                     for entry in entries], ordered=False)
+        changes = Counter()
+        for entry in entries:
+            changes[entry.get("sha256")] += 1
+            if entry["path"] in previous:
+                changes[previous[entry["path"]]] -= 1
+        self._adjust_refs(changes)
+
+    def get_submission(self, path):
+        return self.submissions.find_one({"path": path}, {"_id": 0})
+
+    def query_submissions(self, round_contains=None, language=None, username=None,
+                          sort=None, descending=False, skip=0, limit=None, count=False, with_sha256=False):
+        """Catalog entries matching the filters; returns (docs, total or None)."""
+        query = {}
+        if round_contains:
+            query["round"] = {"$regex": re.escape(round_contains), "$options": "i"}
+        if language:
+            query["language"] = language
+        if username:
+            query["username"] = username
+        cursor = self.submissions.find(query, {"_id": 0} if with_sha256 else {"_id": 0, "sha256": 0})
+        if sort:
+            cursor = cursor.sort(sort, DESCENDING if descending else ASCENDING)
+        else:
+            cursor = cursor.sort([("round", ASCENDING), ("timestamp", ASCENDING)])
+        if skip:
+            cursor = cursor.skip(skip)
+        if limit:
+            cursor = cursor.limit(limit)
+        total = self.submissions.count_documents(query) if count else None
+        return cursor.batch_size(500), total
+
+    def forget_submissions(self, entries):
+        """Drop the catalog entries given as (path, sha256), unless the path was
+        saved again (with other content) since they were read."""
+        dropped = Counter()
+        for path, digest in entries:
+            if self.submissions.delete_one({"path": path, "sha256": digest}).deleted_count:
+                dropped[digest] -= 1
+        self._adjust_refs(dropped)
+
+    # ---------- blob references ----------
+    def unreferenced_blobs(self):
+        """Digests whose reference count has dropped to zero."""
+        return [doc["_id"] for doc in self.blobs.find({"refs": {"$lte": 0}}, {"_id": 1})]
+
+    def blob_refs(self, digest):
+        doc = self.blobs.find_one({"_id": digest})
+        return doc["refs"] if doc else 0
+
+    def forget_blob(self, digest):
+        """Drop the counter of a deleted blob, unless it was referenced again meanwhile."""
+        self.blobs.delete_one({"_id": digest, "refs": {"$lte": 0}})
+
+    def recount_blob_refs(self):
+        """Rebuild every reference count from the catalog; returns {digest: refs}."""
+        counts = {doc["_id"]: doc["refs"] for doc in self.submissions.aggregate([
+            {"$match": {"sha256": {"$ne": None}}},
+            {"$group": {"_id": "$sha256", "refs": {"$sum": 1}}},
+        ])}
+        ops = [UpdateOne({"_id": digest}, {"$set": {"refs": refs}}, upsert=True) for digest, refs in counts.items()]
+        if ops:
+            self.blobs.bulk_write(ops, ordered=False)
+        self.blobs.update_many({"_id": {"$nin": list(counts)}}, {"$set": {"refs": 0}})
+        return counts
+
+
+# =====================================================
+# SQLITE
+# =====================================================
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    role TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scores (
+    username TEXT NOT NULL,
+    round TEXT NOT NULL,
+    doc TEXT NOT NULL,
+    PRIMARY KEY (username, round)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS scores_round ON scores (round);
+CREATE TABLE IF NOT EXISTS submissions (
+    path TEXT PRIMARY KEY,
+    username TEXT,
+    round TEXT,
+    language TEXT,
+    filename TEXT,
+    size INTEGER,
+    sha256 TEXT,
+    remaining_time INTEGER,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS submissions_round_timestamp ON submissions (round, timestamp);
+CREATE INDEX IF NOT EXISTS submissions_username_round ON submissions (username, round);
+CREATE INDEX IF NOT EXISTS submissions_language ON submissions (language);
+CREATE INDEX IF NOT EXISTS submissions_sha256 ON submissions (sha256);
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    refs INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS blobs_refs ON blobs (refs);
+-- Catalog entries are references to the blob with their sha256: keep blobs.refs in step
+CREATE TRIGGER IF NOT EXISTS submissions_blob_ref AFTER INSERT ON submissions WHEN new.sha256 IS NOT NULL BEGIN
+    INSERT OR IGNORE INTO blobs (sha256, refs) VALUES (new.sha256, 0);
+    UPDATE blobs SET refs = refs + 1 WHERE sha256 = new.sha256;
+END;
+CREATE TRIGGER IF NOT EXISTS submissions_blob_unref AFTER DELETE ON submissions WHEN old.sha256 IS NOT NULL BEGIN
+    UPDATE blobs SET refs = refs - 1 WHERE sha256 = old.sha256;
+END;
+CREATE TRIGGER IF NOT EXISTS submissions_blob_reref AFTER UPDATE OF sha256 ON submissions
+WHEN old.sha256 IS NOT new.sha256 BEGIN
+    UPDATE blobs SET refs = refs - 1 WHERE sha256 = old.sha256;
+    INSERT OR IGNORE INTO blobs (sha256, refs) SELECT new.sha256, 0 WHERE new.sha256 IS NOT NULL;
+    UPDATE blobs SET refs = refs + 1 WHERE sha256 = new.sha256;
+END;
+CREATE TABLE IF NOT EXISTS revoked_sessions (
+    jti TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+);
+-- AUTOINCREMENT: sequence numbers are never reused, even after trimming
+CREATE TABLE IF NOT EXISTS live_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+"""
+
+# Merge the new fields into the stored document, like Mongo's $set
+SQL_UPSERT_SCORE = ("INSERT INTO scores (username, round, doc) VALUES (?, ?, ?) "
+                    "ON CONFLICT (username, round) DO UPDATE SET doc = json_patch(doc, excluded.doc)")
+# An upsert rather than INSERT OR REPLACE, whose implicit delete would skip the unref trigger
+SQL_PUT_SUBMISSION = (f"INSERT INTO submissions ({', '.join(SUBMISSION_FIELDS)}) "
+                      f"VALUES ({', '.join('?' * len(SUBMISSION_FIELDS))}) ON CONFLICT (path) DO UPDATE SET "
+                      + ", ".join(f"{field} = excluded.{field}" for field in SUBMISSION_FIELDS[1:]))
+
+
+class SQLiteStorage:
+    """Users, scores and the submissions catalog in a local SQLite file.
+
+    For single-box deployments with no MongoDB. The database runs in WAL
+    mode so readers never block the writer; each thread keeps its own
+    connection, and statements are fixed strings with ? parameters so
+    sqlite3's per-connection statement cache reuses the prepared plans.
+    Score documents are stored as JSON and merged with json_patch, which
+    gives the same per-field upsert semantics as Mongo's $set.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path, busy_timeout_ms=5000, synchronous="NORMAL"):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000,
+                                   isolation_level=None, check_same_thread=False, cached_statements=128)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self._local.conn = conn
+            if not self._schema_ready:
+                with self._schema_lock:
+                    if not self._schema_ready:
+                        conn.executescript(SQLITE_SCHEMA)
+                        self._schema_ready = True
+        return conn
+
+    def ensure_indexes(self):
+        self._connect()
+
+    def ping(self):
+        self._connect().execute("SELECT 1").fetchone()
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ---------- users ----------
+    def get_user(self, username, role=None):
+        if role:
+            row = self._connect().execute("SELECT doc FROM users WHERE username = ? AND role = ?",
+                                          (username, role)).fetchone()
+        else:
+            row = self._connect().execute("SELECT doc FROM users WHERE username = ?", (username,)).fetchone()
+        return loads(row[0]) if row else None
+
+    def create_user(self, user):
+        """Insert a new user; False if the username is taken."""
+        try:
+            self._connect().execute("INSERT INTO users (username, role, doc) VALUES (?, ?, ?)",
+                                    (user["username"], user.get("role", "student"), dumps(user)))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def update_user(self, username, fields, unset=()):
+        # json_patch removes keys set to null
+        patch = dict(fields, **{name: None for name in unset})
+        self._connect().execute("UPDATE users SET doc = json_patch(doc, ?) WHERE username = ?",
+                                (dumps(patch), username))
+
+    def usernames(self):
+        return [row[0] for row in self._connect().execute("SELECT username FROM users")]
+
+    # ---------- sessions ----------
+    def revoke_token(self, jti, expires_at):
+        """Record a logged-out session id until its token expires (epoch seconds)."""
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO revoked_sessions (jti, expires_at) VALUES (?, ?)", (jti, expires_at))
+        conn.execute("DELETE FROM revoked_sessions WHERE expires_at <= ?", (time.time(),))
+
+    def revoked_tokens(self, now):
+        """{session id: expiry} for revocations that have not expired by now."""
+        rows = self._connect().execute("SELECT jti, expires_at FROM revoked_sessions WHERE expires_at > ?", (now,))
+        return dict(rows)
+
+    # ---------- scores ----------
+    def upsert_score(self, username, round_name, fields):
+        self._connect().execute(SQL_UPSERT_SCORE, (username, round_name, dumps(fields)))
+
+    def bulk_upsert_scores(self, batch):
+        """batch: {(username, round): fields}, written in one transaction."""
+        if not batch:
+            return
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(SQL_UPSERT_SCORE, ((username, round_name, dumps(fields))
+                                                for (username, round_name), fields in batch.items()))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def update_scores_if(self, batch):
+        """batch: {(username, round): (expected, fields)}; returns how many were written.
+
+        Checked and written in one transaction, so a score rewritten since
+        expected was read is left alone.
+        """
+        if not batch:
+            return 0
+        conn = self._connect()
+        written = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for (username, round_name), (expected, fields) in batch.items():
+                row = conn.execute("SELECT doc FROM scores WHERE username = ? AND round = ?",
+                                   (username, round_name)).fetchone()
+                if row is None:
+                    continue
+                doc = loads(row[0])
+                if any(doc.get(name) != value for name, value in expected.items()):
+                    continue
+                conn.execute("UPDATE scores SET doc = json_patch(doc, ?) WHERE username = ? AND round = ?",
+                             (dumps(fields), username, round_name))
+                written += 1
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return written
+
+    @staticmethod
+    def _score_doc(username, round_name, doc):
+        return {"username": username, "round": round_name, **loads(doc)}
+
+    def find_scores(self, username=None, round_name=None, batch_size=500):
+        sql, params = "SELECT username, round, doc FROM scores", []
+        clauses = []
+        if username:
+            clauses.append("username = ?")
+            params.append(username)
+        if round_name:
+            clauses.append("round = ?")
+            params.append(round_name)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        cursor = self._connect().execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield self._score_doc(*row)
+
+    async def find_scores_async(self, username=None, round_name=None):
+        # Local file reads are short; a worker thread keeps them off the loop
+        return await asyncio.to_thread(lambda: list(self.find_scores(username, round_name)))
+
+    def scores_by_user(self, rounds):
+        """Yield (username, [score docs]) for the given rounds."""
+        rounds = list(rounds)
+        cursor = self._connect().execute(
+            f"SELECT username, round, doc FROM scores WHERE round IN ({', '.join('?' * len(rounds))}) "
+            "ORDER BY username", rounds)
+        for username, rows in groupby(cursor, key=lambda row: row[0]):
+            yield username, [self._score_doc(*row) for row in rows]
+
+    def delete_scores(self, written_before=None):
+        if written_before is None:
+            self._connect().execute("DELETE FROM scores")
+        else:
+            self._connect().execute("DELETE FROM scores WHERE COALESCE(json_extract(doc, '$.written_at'), 0) < ?",
+                                    (written_before,))
+
+    # ---------- live events ----------
+    # Each insert commits on its own, so events become visible in sequence order
+    def append_event(self, event_type, data):
+        return self._connect().execute("INSERT INTO live_events (type, data) VALUES (?, ?)",
+                                       (event_type, dumps(data))).lastrowid
+
+    def events_after(self, seq, limit=1000):
+        rows = self._connect().execute("SELECT seq, type, data FROM live_events WHERE seq > ? ORDER BY seq LIMIT ?",
+                                       (seq, limit))
+        return [(row_seq, event_type, loads(data)) for row_seq, event_type, data in rows]
+
+    def last_event_seq(self):
+        row = self._connect().execute("SELECT seq FROM sqlite_sequence WHERE name = 'live_events'").fetchone()
+        return row[0] if row else 0
+
+    def first_event_seq(self):
+        return self._connect().execute("SELECT MIN(seq) FROM live_events").fetchone()[0]
+
+    def trim_events(self, upto):
+        self._connect().execute("DELETE FROM live_events WHERE seq <= ?", (upto,))
+
+    # ---------- submissions catalog ----------
+    @staticmethod
+    def _submission_row(entry):
+        row = [entry.get(field) for field in SUBMISSION_FIELDS]
+        if isinstance(row[-1], datetime):
+            row[-1] = row[-1].isoformat(sep=" ")
+        return row
+
+    def put_submission(self, entry):
+        self._connect().execute(SQL_PUT_SUBMISSION, self._submission_row(entry))
+
+    def put_submissions(self, entries):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(SQL_PUT_SUBMISSION, (self._submission_row(entry) for entry in entries))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def get_submission(self, path):
+        row = self._connect().execute(f"SELECT {', '.join(SUBMISSION_FIELDS)} FROM submissions WHERE path = ?",
+                                      (path,)).fetchone()
+        if row is None:
+            return None
+        doc = dict(zip(SUBMISSION_FIELDS, row))
+        if doc["timestamp"]:
+            doc["timestamp"] = datetime.fromisoformat(doc["timestamp"])
+        return doc
+
+    def query_submissions(self, round_contains=None, language=None, username=None,
+                          sort=None, descending=False, skip=0, limit=None, count=False, with_sha256=False):
+        """Catalog entries matching the filters; returns (docs, total or None)."""
+        clauses, params = [], []
+        if round_contains:
+            # LIKE is case-insensitive for ASCII, matching the Mongo regex
+            clauses.append("round LIKE ? ESCAPE '\\'")
+            escaped = round_contains.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        if language:
+            clauses.append("language = ?")
+            params.append(language)
+        if username:
+            clauses.append("username = ?")
+            params.append(username)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        columns = [field for field in SUBMISSION_FIELDS if with_sha256 or field != "sha256"]
+        if sort in SUBMISSION_FIELDS:
+            order = f"{sort} {'DESC' if descending else 'ASC'}"
+        else:
+            order = "round ASC, timestamp ASC"
+        sql = f"SELECT {', '.join(columns)} FROM submissions{where} ORDER BY {order}"
+        if limit:
+            sql += " LIMIT ? OFFSET ?"
+            params_page = params + [limit, skip]
+        else:
+            params_page = params
+        conn = self._connect()
+        docs = []
+        for row in conn.execute(sql, params_page):
+            doc = dict(zip(columns, row))
+            if doc["timestamp"]:
+                doc["timestamp"] = datetime.fromisoformat(doc["timestamp"])
+            docs.append(doc)
+        total = conn.execute(f"SELECT COUNT(*) FROM submissions{where}", params).fetchone()[0] if count else None
+        return docs, total
+
+    def forget_submissions(self, entries):
+        """Drop the catalog entries given as (path, sha256), unless the path was
+        saved again (with other content) since they were read."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("DELETE FROM submissions WHERE path = ? AND sha256 IS ?", entries)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # ---------- blob references ----------
+    def unreferenced_blobs(self):
+        """Digests whose reference count has dropped to zero."""
+        return [row[0] for row in self._connect().execute("SELECT sha256 FROM blobs WHERE refs <= 0")]
+
+    def blob_refs(self, digest):
+        row = self._connect().execute("SELECT refs FROM blobs WHERE sha256 = ?", (digest,)).fetchone()
+        return row[0] if row else 0
+
+    def forget_blob(self, digest):
+        """Drop the counter of a deleted blob, unless it was referenced again meanwhile."""
+        self._connect().execute("DELETE FROM blobs WHERE sha256 = ? AND refs <= 0", (digest,))
+
+    def recount_blob_refs(self):
+        """Rebuild every reference count from the catalog; returns {digest: refs}."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            counts = dict(conn.execute("SELECT sha256, COUNT(*) FROM submissions WHERE sha256 IS NOT NULL "
+                                       "GROUP BY sha256").fetchall())
+            conn.execute("UPDATE blobs SET refs = 0")
+            conn.executemany("INSERT INTO blobs (sha256, refs) VALUES (?, ?) "
+                             "ON CONFLICT (sha256) DO UPDATE SET refs = excluded.refs", counts.items())
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return counts
+
+
+def create_storage(backend="mongo", **options):
+    if backend == "sqlite":
+        return SQLiteStorage(**options)
+    if backend == "mongo":
+        return MongoStorage(**options)
+    raise ValueError(f"Unknown storage backend: {backend}")
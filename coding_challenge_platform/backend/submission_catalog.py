@@ -0,0 +1,231 @@
+import os
+import hashlib
+from datetime import datetime
+
+# Admin-facing round labels, as shown in the submissions table
+FRONTEND = "Frontend Challenge"
+SCRAMBLE = "Code Scramble"
+DEBUG_CORRECT = "Debug - Correct"
+DEBUG_WRONG = "Debug - Wrong"
+
+# ?sort= names accepted by the listing, mapped to catalog fields
+SORT_FIELDS = {
+    "team": "username",
+    "round": "round",
+    "filename": "filename",
+    "language": "language",
+    "remaining_time": "remaining_time",
+    "timestamp": "timestamp",
+    "size": "size",
+}
+
+
+def file_sha256(path, chunk_size=64 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def guess_username(filename, known_users):
+    """Best effort owner for <username>_<problem>_<timestamp>.ext files.
+
+    Prefers the longest known username that prefixes the name, so users
+    with underscores in their names are not cut at the first '_'.
+    """
+    matches = [u for u in known_users if filename.startswith(f"{u}_")]
+    if matches:
+        return max(matches, key=len)
+    return filename.split("_")[0]
+
+
+class SubmissionCatalog:
+    """Metadata for every submitted file, recorded when the file is written.
+
+    The admin listing is served from here instead of walking uploads/.
+    With a BlobStore, contents live there and path is only the name an
+    entry is listed under; files saved before that stay at upload_root/path.
+    """
+
+    def __init__(self, storage, upload_root, blobs=None):
+        self.storage = storage
+        self.upload_root = upload_root
+        self.blobs = blobs
+
+    def _entry(self, username, round_label, path, language=None, remaining_time=None, timestamp=None,
+               sha256=None, size=None):
+        if sha256 is None:
+            full_path = os.path.join(self.upload_root, path)
+            sha256, size = file_sha256(full_path), os.path.getsize(full_path)
+        return {
+            "username": username,
+            "round": round_label,
+            "language": language,
+            "path": path,
+            "filename": os.path.basename(path),
+            "size": size,
+            "sha256": sha256,
+            "remaining_time": remaining_time,
+            "timestamp": timestamp or datetime.now(),
+        }
+
+    def record(self, username, round_label, path, language=None, remaining_time=None, timestamp=None,
+               sha256=None, size=None):
+        """Catalog a file just written at upload_root/path (or stored as blob sha256)."""
+        entry = self._entry(username, round_label, path, language, remaining_time, timestamp, sha256, size)
+        self.storage.put_submission(entry)
+        return entry
+
+    def save(self, username, round_label, path, data, **details):
+        """Store data (bytes, text, or a readable stream) and catalog it under path."""
+        if self.blobs is None:
+            full_path = os.path.join(self.upload_root, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "wb") as f:
+                if hasattr(data, "read"):
+                    for piece in iter(lambda: data.read(64 * 1024), b""):
+                        f.write(piece)
+                else:
+                    f.write(data.encode("utf-8") if isinstance(data, str) else data)
+            return self.record(username, round_label, path, **details)
+        sha256, size = self.blobs.put_stream(data) if hasattr(data, "read") else self.blobs.put(data)
+        return self.record(username, round_label, path, sha256=sha256, size=size, **details)
+
+    def locate(self, path, sha256=None):
+        """Filesystem path holding a catalogued file's content, or None."""
+        if sha256 is None and self.blobs is not None:
+            doc = self.storage.get_submission(path)
+            sha256 = doc.get("sha256") if doc else None
+        if self.blobs is not None and self.blobs.exists(sha256):
+            return self.blobs.path(sha256)
+        full_path = os.path.join(self.upload_root, path)
+        if os.path.isfile(full_path) and os.path.commonpath(
+                [os.path.abspath(full_path), os.path.abspath(self.upload_root)]) == os.path.abspath(self.upload_root):
+            return full_path
+        return None
+
+    def iter_files(self, prefixes=None):
+        """(path, filesystem path, timestamp) for every catalogued file that has content."""
+        docs, _ = self.storage.query_submissions(with_sha256=True)
+        for doc in docs:
+            path = doc.get("path") or ""
+            if prefixes and not any(path.startswith(f"{prefix}/") for prefix in prefixes):
+                continue
+            located = self.locate(path, doc.get("sha256") or "")
+            if located:
+                yield path, located, doc.get("timestamp")
+
+    def query(self, args):
+        """Filter/sort/page by ?round=&language=&team=&sort=[-]field&page=&page_size=.
+
+        Returns (rows shaped like the admin listing, total matching).
+        """
+        sort = args.get("sort") or ""
+        page = args.get("page", type=int)
+        page_size = min(max(args.get("page_size", 50, type=int), 1), 500)
+        docs, total = self.storage.query_submissions(
+            round_contains=args.get("round"),
+            language=args.get("language"),
+            username=args.get("team"),
+            sort=SORT_FIELDS.get(sort.lstrip("-")),
+            descending=sort.startswith("-"),
+            skip=(max(page, 1) - 1) * page_size if page else 0,
+            limit=page_size if page else None,
+            count=bool(page),
+        )
+        rows = [self.to_row(doc) for doc in docs]
+        return rows, len(rows) if total is None else total
+
+    def iter_rows(self):
+        """Every catalogued file as listing rows, streamed from the cursor."""
+        docs, _ = self.storage.query_submissions()
+        for doc in docs:
+            yield self.to_row(doc)
+
+    @staticmethod
+    def to_row(doc):
+        timestamp = doc.get("timestamp")
+        return {
+            "team": doc.get("username"),
+            "round": doc.get("round"),
+            "filename": doc.get("filename"),
+            "language": doc.get("language"),
+            "remaining_time": doc.get("remaining_time"),
+            "timestamp": timestamp.strftime('%Y-%m-%d %H:%M:%S') if timestamp else 'N/A',
+            "size": doc.get("size", 0),
+            "path": doc.get("path"),
+        }
+
+    # =====================================================
+    # BACKFILL
+    # =====================================================
+    def scan_upload_tree(self, score_index, known_users):
+        """Yield catalog entries for every file already under the submission folders."""
+        frontend = os.path.join(self.upload_root, "frontend_submissions")
+        if os.path.isdir(frontend):
+            for user_entry in os.scandir(frontend):
+                if not user_entry.is_dir():
+                    continue
+                for entry in os.scandir(user_entry.path):
+                    if entry.is_file():
+                        yield self._entry(user_entry.name, FRONTEND,
+                                          f"frontend_submissions/{user_entry.name}/{entry.name}",
+                                          timestamp=datetime.fromtimestamp(entry.stat().st_mtime))
+
+        for prefix, round_label, score_round in [
+            ("scramble_submissions", SCRAMBLE, "Scramble"),
+            ("debug_submissions/correct", DEBUG_CORRECT, "Debugging"),
+            ("debug_submissions/wrong", DEBUG_WRONG, "Debugging"),
+        ]:
+            folder = os.path.join(self.upload_root, prefix)
+            if not os.path.isdir(folder):
+                continue
+            for lang_entry in os.scandir(folder):
+                if not lang_entry.is_dir():
+                    continue
+                for entry in os.scandir(lang_entry.path):
+                    if not entry.is_file():
+                        continue
+                    score_data = score_index.get((score_round, entry.name)) or {}
+                    yield self._entry(
+                        score_data.get("username") or guess_username(entry.name, known_users),
+                        round_label,
+                        f"{prefix}/{lang_entry.name}/{entry.name}",
+                        language=lang_entry.name,
+                        remaining_time=score_data.get("remaining_time"),
+                        timestamp=score_data.get("timestamp") or datetime.fromtimestamp(entry.stat().st_mtime),
+                    )
+
+    def rebuild(self, batch_size=500):
+        """Backfill the catalog from the existing upload folders; returns count."""
+        score_index = {}
+        for round_name in ("Scramble", "Debugging"):
+            for s in self.storage.find_scores(round_name=round_name):
+                if s.get("saved_file"):
+                    score_index[(s["round"], s["saved_file"])] = s
+        known_users = set(self.storage.usernames())
+
+        self.storage.ensure_indexes()
+        count = 0
+        batch = []
+        for entry in self.scan_upload_tree(score_index, known_users):
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                self.storage.put_submissions(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            self.storage.put_submissions(batch)
+            count += len(batch)
+        # Forget entries whose content is gone. Read after the scan, so submissions
+        # recorded meanwhile (content first, then the entry) are never among them
+        docs, _ = self.storage.query_submissions(with_sha256=True)
+        missing = [(doc["path"], doc.get("sha256")) for doc in docs if not self._content_exists(doc)]
+        self.storage.forget_submissions(missing)
+        return count
+
+    def _content_exists(self, doc):
+        if self.blobs is not None and self.blobs.exists(doc.get("sha256")):
+            return True
+        return os.path.isfile(os.path.join(self.upload_root, doc["path"]))
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the backend modules the way app.py does: as top-level modules
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture
+def sqlite_storage(tmp_path):
+    from storage import create_storage
+    storage = create_storage("sqlite", path=str(tmp_path / "test.db"))
+    storage.ensure_indexes()
+    yield storage
+    storage.close()
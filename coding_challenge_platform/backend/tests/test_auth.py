@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import stat
+import time
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from auth import SessionTokens, RevocationList, PasswordHasher, InvalidToken, load_secret, _b64encode
+from conftest import BACKEND_DIR
+
+
+def forge(claims, secret):
+    payload = _b64encode(json.dumps(claims).encode("utf-8"))
+    return f"{payload}.{SessionTokens(secret)._sign(payload)}"
+
+
+def test_issue_and_verify():
+    tokens = SessionTokens(b"k" * 32, ttl=60)
+    token, claims = tokens.issue("alice", "student")
+    assert tokens.verify(token) == claims
+    assert tokens.verify(token) == claims
+    assert tokens.stats()["cache_hits"] == 1
+
+
+def test_forged_tokens_are_rejected():
+    tokens = SessionTokens(b"k" * 32, ttl=60)
+    token, claims = tokens.issue("alice", "student")
+    admin = dict(claims, role="admin")
+    # Signed with another key
+    with pytest.raises(InvalidToken):
+        tokens.verify(forge(admin, b"x" * 32))
+    # Claims changed, signature kept
+    payload, signature = token.split(".")
+    with pytest.raises(InvalidToken):
+        tokens.verify(f"{_b64encode(json.dumps(admin).encode('utf-8'))}.{signature}")
+    for bad in ("", ".", token + "x", "not-a-token", f"{payload}.", "é.é"):
+        with pytest.raises(InvalidToken):
+            tokens.verify(bad)
+    # Right key but missing claims
+    with pytest.raises(InvalidToken):
+        tokens.verify(forge({"sub": "alice"}, b"k" * 32))
+
+
+def test_expired_tokens_are_rejected(monkeypatch):
+    tokens = SessionTokens(b"k" * 32, ttl=60)
+    token, _ = tokens.issue("alice", "student")
+    tokens.verify(token)  # now cached
+    later = time.time() + 61
+    monkeypatch.setattr(time, "time", lambda: later)
+    with pytest.raises(InvalidToken, match="expired"):
+        tokens.verify(token)
+
+
+def test_revocation_reaches_other_processes(sqlite_storage):
+    worker_a = SessionTokens(b"k" * 32, revocations=RevocationList(sqlite_storage, refresh_seconds=0))
+    worker_b = SessionTokens(b"k" * 32, revocations=RevocationList(sqlite_storage, refresh_seconds=0))
+    token, claims = worker_a.issue("alice", "student")
+    other, _ = worker_a.issue("bob", "student")
+    assert worker_b.verify(token)["sub"] == "alice"
+    worker_a.revoke(claims)
+    with pytest.raises(InvalidToken, match="ended"):
+        worker_a.verify(token)
+    with pytest.raises(InvalidToken, match="ended"):
+        worker_b.verify(token)
+    assert worker_b.verify(other)["sub"] == "bob"
+
+
+def test_load_secret_is_private_and_shared(tmp_path):
+    path = str(tmp_path / "keys" / "session_secret")
+    with ThreadPoolExecutor(8) as pool:
+        secrets = set(pool.map(lambda _: load_secret(path), range(16)))
+    assert len(secrets) == 1 and len(secrets.pop()) == 32
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(os.path.dirname(path)).st_mode) == 0o700
+    assert os.listdir(os.path.dirname(path)) == ["session_secret"]
+    assert load_secret(path, "from-env") == b"from-env"
+
+
+def test_production_requires_session_secret(tmp_path):
+    env = {key: value for key, value in os.environ.items() if key != "SESSION_SECRET"}
+    env.update(PYTHONPATH=BACKEND_DIR, STORAGE_BACKEND="sqlite", SQLITE_PATH=str(tmp_path / "app.db"))
+
+    def run(extra):
+        return subprocess.run([sys.executable, "-c", "import app; print(app.session_tokens.secret.hex())"],
+                              cwd=tmp_path, env=dict(env, **extra), capture_output=True, text=True, timeout=60)
+
+    refused = run({"SESSION_SECRET_REQUIRED": "1"})
+    assert refused.returncode != 0 and "SESSION_SECRET is not set" in refused.stderr
+    assert run({"SESSION_SECRET_REQUIRED": "1", "SESSION_SECRET": "abc"}).stdout.split()[-1] == b"abc".hex()
+    # Development fallback: a private file, never under uploads/
+    dev = run({"SESSION_SECRET_FILE": str(tmp_path / "config" / "secret")})
+    assert dev.returncode == 0, dev.stderr
+    assert not os.path.exists(tmp_path / "uploads" / ".session_secret")
+    assert dev.stdout.split()[-1] == load_secret(str(tmp_path / "config" / "secret")).hex()
+    inside = run({"SESSION_SECRET_FILE": str(tmp_path / "uploads" / "secret")})
+    assert inside.returncode != 0 and "must be outside" in inside.stderr
+
+
+def test_password_hasher():
+    hasher = PasswordHasher(workers=2, iterations=1000)
+    stored = hasher.hash("hunter2")
+    assert stored.startswith("pbkdf2_sha256$1000$")
+    assert hasher.check("hunter2", {"password_hash": stored}) == (True, None)
+    assert hasher.check("wrong", {"password_hash": stored}) == (False, None)
+    assert hasher.check("hunter2", None) == (False, None)
+    # Accounts from before hashing match their plain password once and get a hash
+    matches, upgraded = hasher.check("old", {"password": "old"})
+    assert matches and hasher.check("old", {"password_hash": upgraded}) == (True, None)
+    assert hasher.check("nope", {"password": "old"}) == (False, None)
+
+
+def test_started_revocation_list_refreshes_off_the_request_path(sqlite_storage):
+    revocations = RevocationList(sqlite_storage, refresh_seconds=0.05)
+    revocations.start()
+    readers = []
+    revoked_tokens = sqlite_storage.revoked_tokens
+
+    def record_reader(now):
+        readers.append(threading.current_thread().name)
+        return revoked_tokens(now)
+    sqlite_storage.revoked_tokens = record_reader
+    sqlite_storage.revoke_token("gone", time.time() + 60)
+    deadline = time.monotonic() + 5
+    while not revocations.is_revoked("gone"):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert set(readers) == {"session-revocations"}
+
+
+def test_metrics_need_an_admin_or_the_scrape_token(tmp_path):
+    script = """
+import app
+client = app.app.test_client()
+def bearer(token): return {"Authorization": "Bearer " + token}
+for headers in ({}, bearer(app.session_tokens.issue("alice", "student")[0]),
+                bearer(app.session_tokens.issue("root", "admin")[0]), bearer("scrape-me"), bearer("guess")):
+    print(client.get("/metrics", headers=headers).status_code)
+"""
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, STORAGE_BACKEND="sqlite", SQLITE_PATH=str(tmp_path / "app.db"),
+               SESSION_SECRET="abc", METRICS_TOKEN="scrape-me", METRICS_DIR="")
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env, capture_output=True, text=True,
+                            timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split()[-5:] == ["401", "403", "200", "200", "401"]
@@ -0,0 +1,142 @@
+import os
+import io
+import time
+import threading
+
+import pytest
+
+from blob_store import BlobStore
+
+
+@pytest.fixture
+def blobs(tmp_path):
+    return BlobStore(str(tmp_path / "blobs"), grace_seconds=60)
+
+
+def entry(path, digest, size=1):
+    return {"path": path, "username": "alice", "round": "Scramble", "sha256": digest, "size": size}
+
+
+def age(blobs, digest, seconds=3600):
+    old = time.time() - seconds
+    os.utime(blobs.path(digest), (old, old))
+
+
+def test_identical_content_is_stored_once(blobs):
+    first = blobs.put("print(1)\n")
+    assert blobs.put(b"print(1)\n") == first
+    assert blobs.put_stream(io.BytesIO(b"print(1)\n")) == first
+    assert list(blobs.iter_digests()) == [first[0]]
+    assert blobs.read_text(first[0]) == "print(1)\n"
+    stats = blobs.stats()
+    assert (stats["stored"], stats["deduplicated"]) == (1, 2)
+    assert not [name for name in os.listdir(blobs.root) if name.endswith(".tmp")]
+
+
+def test_rejects_non_digests(blobs):
+    with pytest.raises(ValueError):
+        blobs.path("../../etc/passwd")
+    assert not blobs.exists("nope")
+
+
+def test_catalog_keeps_reference_counts(sqlite_storage, blobs):
+    a, _ = blobs.put("a")
+    b, _ = blobs.put("b")
+    sqlite_storage.put_submission(entry("x/1.py", a))
+    sqlite_storage.put_submission(entry("x/2.py", a))
+    assert sqlite_storage.blob_refs(a) == 2
+    # Re-saving a path with new content moves its reference
+    sqlite_storage.put_submission(entry("x/2.py", b))
+    assert (sqlite_storage.blob_refs(a), sqlite_storage.blob_refs(b)) == (1, 1)
+    sqlite_storage.forget_submissions([("x/1.py", a)])
+    assert sqlite_storage.unreferenced_blobs() == [a]
+    # Drifted counts are rebuilt from the catalog
+    sqlite_storage._connect().execute("UPDATE blobs SET refs = 7")
+    assert sqlite_storage.recount_blob_refs() == {b: 1}
+    assert sqlite_storage.blob_refs(a) == 0
+
+
+def test_gc_deletes_only_old_unreferenced_blobs(sqlite_storage, blobs):
+    kept, _ = blobs.put("referenced")
+    sqlite_storage.put_submission(entry("x/1.py", kept))
+    dropped, size = blobs.put("dropped")
+    sqlite_storage.put_submission(entry("x/2.py", dropped))
+    sqlite_storage.forget_submissions([("x/2.py", dropped)])
+    orphan, _ = blobs.put("never catalogued")
+    fresh, _ = blobs.put("written just now, entry not yet")
+    for digest in (kept, dropped, orphan):
+        age(blobs, digest)
+
+    assert blobs.gc(sqlite_storage, dry_run=True)["blobs"] == 2
+    assert blobs.exists(dropped)
+    result = blobs.gc(sqlite_storage)
+    assert result["blobs"] == 2
+    assert result["bytes"] == size + len("never catalogued")
+    assert sorted(blobs.iter_digests()) == sorted([kept, fresh])
+    # The zero count is forgotten with the blob
+    assert sqlite_storage.unreferenced_blobs() == []
+
+
+def test_gc_keeps_a_blob_referenced_while_it_runs(sqlite_storage, blobs):
+    digest, _ = blobs.put("late reference")
+    age(blobs, digest)
+    real = sqlite_storage.blob_refs
+
+    def blob_refs(d):
+        # A submission naming the blob is catalogued between gc's listing and its re-check
+        sqlite_storage.put_submission(entry("x/late.py", d))
+        return real(d)
+    sqlite_storage.blob_refs = blob_refs
+    assert blobs.gc(sqlite_storage)["blobs"] == 0
+    sqlite_storage.blob_refs = real
+    assert blobs.exists(digest)
+    assert sqlite_storage.blob_refs(digest) == 1
+
+
+def test_put_during_collection_rewrites_the_blob(sqlite_storage, blobs):
+    digest, _ = blobs.put("resubmitted")
+    age(blobs, digest)
+    real = sqlite_storage.blob_refs
+
+    def blob_refs(d):
+        # The blob is parked for deletion; a student resubmits the same code
+        if os.path.exists(blobs.path(d) + ".gc"):
+            assert blobs.put("resubmitted") == (d, len("resubmitted"))
+        return real(d)
+    sqlite_storage.blob_refs = blob_refs
+    blobs.gc(sqlite_storage)
+    sqlite_storage.blob_refs = real
+    assert blobs.read_text(digest) == "resubmitted"
+    assert not os.path.exists(blobs.path(digest) + ".gc")
+
+
+def test_concurrent_puts_and_gc_never_lose_a_referenced_blob(sqlite_storage, tmp_path):
+    blobs = BlobStore(str(tmp_path / "blobs"), grace_seconds=0.5)
+    stop = threading.Event()
+    errors = []
+
+    def submitter(n):
+        try:
+            for i in range(40):
+                digest, size = blobs.put(f"code {i % 5}")
+                sqlite_storage.put_submission(entry(f"s{n}/{i}.py", digest, size))
+        except Exception as e:
+            errors.append(e)
+
+    def collector():
+        while not stop.is_set():
+            blobs.gc(sqlite_storage)
+
+    gc_thread = threading.Thread(target=collector)
+    gc_thread.start()
+    submitters = [threading.Thread(target=submitter, args=(n,)) for n in range(4)]
+    for t in submitters:
+        t.start()
+    for t in submitters:
+        t.join()
+    stop.set()
+    gc_thread.join()
+    assert errors == []
+    docs, _ = sqlite_storage.query_submissions(with_sha256=True)
+    for doc in docs:
+        assert blobs.read_text(doc["sha256"]).startswith("code ")
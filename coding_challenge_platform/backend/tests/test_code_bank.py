@@ -0,0 +1,31 @@
+from code_bank import CodeBank, CodeFile
+
+CODE = "a = 1\nb = 2\nc = 3\nprint(a + b + c)\n"
+
+
+def test_variants_are_stable_per_user():
+    code_file = CodeFile("p1.py", CODE, variants=8)
+    index = code_file.variant_for("alice")
+    assert index == CodeFile("p1.py", CODE, variants=8).variant_for("alice")
+    assert sorted(code_file.variant(index).splitlines()) == sorted(CODE.splitlines())
+    assert all(variant != CODE for variant in code_file.variants)
+
+
+def test_no_variants_falls_back_to_the_original_order():
+    code_file = CodeFile("p1.py", CODE, variants=0)
+    assert code_file.variant_for("alice") == 0
+    assert code_file.variant_for(None) == 0
+    assert code_file.variant(0) == CODE
+
+
+def test_bank_reloads_after_touch(tmp_path):
+    folder = tmp_path / "scramble" / "py"
+    folder.mkdir(parents=True)
+    (folder / "p1.py").write_text(CODE)
+    bank = CodeBank(str(tmp_path), scramble_variants=0)
+    assert bank.list_files("scramble", "py") == ["p1.py"]
+    (folder / "p1.py").write_text("x = 1\n")
+    bank.touch("scramble", "py")
+    assert bank.get("scramble", "py", "p1.py").text == "x = 1\n"
+    assert bank.get("scramble", "py", "missing.py") is None
+    assert bank.list_files("debug", "py") == []
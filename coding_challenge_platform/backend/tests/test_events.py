@@ -0,0 +1,139 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from events import EventLog, TRIM_EVERY
+
+
+@pytest.fixture
+def log(sqlite_storage):
+    return EventLog(sqlite_storage, max_events=50, poll_interval=0.02)
+
+
+def test_resume_after_cursor(log):
+    start = log.parse_cursor("")
+    first = log.publish("score", {"username": "alice", "score": 1})
+    log.publish("submission", {"path": "a.py"})
+    log._poll()
+    assert [event[1] for event in log.since(start)] == ["score", "submission"]
+    seq = log.parse_cursor(log.event_id(first))
+    assert seq == first
+    assert log.since(seq) == [(first + 1, "submission", {"path": "a.py"})]
+    assert log.since(log.last_seq) == []
+
+
+def test_cursor_from_another_worker(sqlite_storage):
+    publisher = EventLog(sqlite_storage, poll_interval=0.02)
+    viewer = EventLog(sqlite_storage, poll_interval=0.02)
+    viewer.parse_cursor("")
+    seq = publisher.publish("score", {"username": "bob"})
+    # Not polled yet by the viewer's worker: resuming there still works
+    assert viewer.parse_cursor(publisher.event_id(seq)) == seq
+    assert viewer.parse_cursor(publisher.event_id(seq - 1)) == seq - 1
+    assert viewer.since(seq - 1) == [(seq, "score", {"username": "bob"})]
+
+
+def test_new_worker_resumes_old_cursor_from_storage(sqlite_storage):
+    publisher = EventLog(sqlite_storage, max_events=500)
+    seqs = [publisher.publish("score", {"n": n}) for n in range(30)]
+    late = EventLog(sqlite_storage, max_events=10)
+    cursor = late.parse_cursor(late.event_id(seqs[4]))
+    assert cursor == seqs[4]
+    seen = []
+    while cursor < late.last_seq:
+        # Older than the buffer: read from storage, max_events at a time
+        batch = late.since(cursor)
+        seen += [event[2]["n"] for event in batch]
+        cursor = batch[-1][0]
+    assert seen == list(range(5, 30))
+
+
+def test_unknown_or_trimmed_cursors_reset(log):
+    log.parse_cursor("")
+    for n in range(TRIM_EVERY):
+        log.publish("score", {"n": n})
+    log._poll()
+    assert log.last_seq == TRIM_EVERY
+    assert log.parse_cursor("1") is None  # trimmed from storage and buffer
+    assert log.parse_cursor("abc") is None
+    assert log.parse_cursor("1a2b3c4d-5") is None  # id from before events were shared
+    assert log.parse_cursor(str(log.last_seq + 10)) is None
+    assert log.parse_cursor(str(log.last_seq)) == log.last_seq
+
+
+def test_wait_wakes_on_publish_from_another_worker(sqlite_storage):
+    viewer = EventLog(sqlite_storage, poll_interval=0.02)
+    seq = viewer.parse_cursor("")
+    publisher = EventLog(sqlite_storage)
+    threading.Timer(0.1, publisher.publish, ("score", {"username": "carol"})).start()
+    events = viewer.wait(seq, timeout=5)
+    assert [event[2] for event in events] == [{"username": "carol"}]
+    assert viewer.wait(events[-1][0], timeout=0.05) == []
+
+
+def test_wait_async_holds_no_thread(sqlite_storage):
+    viewer = EventLog(sqlite_storage, poll_interval=0.02)
+    seq = viewer.parse_cursor("")
+    publisher = EventLog(sqlite_storage)
+
+    async def watch():
+        waits = [asyncio.ensure_future(viewer.wait_async(seq, timeout=5)) for _ in range(20)]
+        threads = threading.active_count()
+        await asyncio.sleep(0.05)
+        assert viewer.stats()["async_waiters"] == 20
+        publisher.publish("score", {"username": "dave"})
+        results = await asyncio.gather(*waits)
+        return threads, results
+
+    threads, results = asyncio.run(watch())
+    assert threading.active_count() <= threads + 1
+    assert all([event[2] for event in result] == [{"username": "dave"}] for result in results)
+    assert viewer.stats()["async_waiters"] == 0
+    assert asyncio.run(viewer.wait_async(viewer.last_seq, timeout=0.05)) == []
+
+
+class GappyStorage:
+    """Event 2 has its number but is not stored yet, as can happen on Mongo."""
+
+    def __init__(self):
+        self.events = [(1, "score", {}), (3, "score", {})]
+
+    def last_event_seq(self):
+        return 0
+
+    def first_event_seq(self):
+        return self.events[0][0]
+
+    def events_after(self, seq, limit=1000):
+        return [event for event in self.events if event[0] > seq][:limit]
+
+
+def test_poll_waits_for_missing_numbers():
+    log = EventLog(GappyStorage(), gap_timeout=0.2)
+    log._poll()
+    log._poll()
+    assert log.last_seq == 1  # 3 is held back until 2 shows up or the wait runs out
+    log.storage.events.insert(1, (2, "submission", {}))
+    log._poll()
+    assert [event[0] for event in log.since(0)] == [1, 2, 3]
+
+
+def test_poll_skips_numbers_that_never_appear():
+    log = EventLog(GappyStorage(), gap_timeout=0.1)
+    log._poll()
+    log._poll()
+    time.sleep(0.15)
+    log._poll()
+    assert [event[0] for event in log.since(0)] == [1, 3]
+    assert log.stats()["skipped_gaps"] == 1
+
+
+def test_publish_failure_is_not_raised():
+    class Down:
+        def append_event(self, event_type, data):
+            raise ConnectionError("storage down")
+    log = EventLog(Down())
+    assert log.publish("score", {}) is None
+    assert log.stats()["publish_errors"] == 1
@@ -0,0 +1,202 @@
+import os
+import shutil
+import pathlib
+import subprocess
+
+import pytest
+
+import executor
+import sandbox
+from executor import LocalExecutor, compile_source, summarize_cases, judge_case, CACHEABLE_STATUSES, DEFAULT_LIMITS
+
+
+def test_missing_toolchain_is_an_internal_error(tmp_path, monkeypatch):
+    monkeypatch.setitem(executor.LANGUAGES, "c", dict(executor.LANGUAGES["c"], compile=["no-such-compiler", "main.c"]))
+    _, error = compile_source("c", "int main(void) { return 0; }", str(tmp_path), DEFAULT_LIMITS)
+    assert error["status"] == "Internal Error"
+    assert not error["status"].startswith(CACHEABLE_STATUSES)
+
+
+def test_compile_timeout_is_not_cached(tmp_path, monkeypatch):
+    slow = [executor.sys.executable, "-c", "import time; time.sleep(5)"]
+    monkeypatch.setitem(executor.LANGUAGES, "c", dict(executor.LANGUAGES["c"], compile=slow))
+    limits = dict(DEFAULT_LIMITS, compile_seconds=1)
+    _, error = compile_source("c", "int main(void) { return 0; }", str(tmp_path), limits)
+    assert error["status"] == "Compilation Time Limit Exceeded"
+    assert not error["status"].startswith(CACHEABLE_STATUSES)
+    batch = summarize_cases([{"name": "1", "input": "", "expected": ""}], [], compile_error=error)
+    assert batch["status"] == "Compilation Time Limit Exceeded"
+
+
+def test_judge_case_verdicts():
+    assert judge_case({"status": "Accepted", "stdout": "3  \n\n"}, "3") == "Accepted"
+    assert judge_case({"status": "Accepted", "stdout": "4"}, "3") == "Wrong Answer"
+    assert judge_case({"status": "Time Limit Exceeded"}, "3") == "Time Limit Exceeded"
+    assert judge_case({"error": "down"}, "3") == "Internal Error"
+
+
+@pytest.fixture
+def local_executor(tmp_path):
+    local = LocalExecutor(workers=1, scratch_dir=str(tmp_path / "scratch"), result_cache_entries=16,
+                          limits={"wall_seconds": 2, "cpu_seconds": 1}, sandbox="none")
+    yield local
+    local.shutdown()
+
+
+def sandbox_python(hide):
+    """An interpreter that starts under namespace isolation here, or None."""
+    for python in (executor.PYTHON, "/usr/bin/python3", "/usr/local/bin/python3"):
+        if os.path.exists(python):
+            try:
+                sandbox.check(hide, python, 100000)
+                return python
+            except sandbox.SandboxUnavailable:
+                continue
+    return None
+
+
+@pytest.fixture
+def isolated_executor():
+    # World-readable, so only the tmpfs over it keeps the job out
+    project = pathlib.Path(f"/tmp/ccp-project-test-{os.getpid()}")
+    (project / "uploads").mkdir(parents=True, exist_ok=True)
+    (project / "uploads" / "answers.txt").write_text("the answer key")
+    for path in (project, project / "uploads"):
+        path.chmod(0o755)
+    scratch = f"/tmp/ccp-sandbox-test-{os.getpid()}"
+    python = sandbox_python([str(project)])
+    if python is None:
+        pytest.skip("namespace sandbox unavailable (needs root and a world-readable python)")
+    local = LocalExecutor(workers=1, scratch_dir=scratch, result_cache_entries=0, sandbox="namespace",
+                          hide_paths=[str(project)], python=python, uid_base=190000,
+                          limits={"wall_seconds": 3, "cpu_seconds": 2, "processes": 32})
+    local.start()
+    yield local, project
+    local.shutdown()
+    shutil.rmtree(scratch, ignore_errors=True)
+    shutil.rmtree(project, ignore_errors=True)
+
+
+def test_local_python_run_and_result_cache(local_executor):
+    result = local_executor.run("print(int(input()) * 2)", "py", "21\n")
+    assert result["status"] == "Accepted"
+    assert result["stdout"].strip() == "42"
+    assert local_executor.run("print(int(input()) * 2)", "py", "21\n") == result
+    assert local_executor.result_cache.stats()["hits"] == 1
+
+
+def test_local_timeouts_are_not_cached(local_executor):
+    result = local_executor.run("while True: pass", "py")
+    assert result["status"] == "Time Limit Exceeded"
+    assert local_executor.result_cache.stats()["entries"] == 0
+
+
+def test_namespace_sandbox_hides_the_project_and_the_network(isolated_executor):
+    local, project = isolated_executor
+    probe = (f"import os, socket\n"
+             f"print(os.getuid(), sorted(os.environ))\n"
+             f"print(os.path.exists({str(project / 'uploads' / 'answers.txt')!r}))\n"
+             f"try:\n    socket.create_connection(('1.1.1.1', 80), timeout=1)\n"
+             f"except OSError as e:\n    print('no network')\n")
+    result = local.run(probe, "py")
+    assert result["status"] == "Accepted", result
+    uid_line, exists, network = result["stdout"].splitlines()
+    assert uid_line == "190000 ['HOME', 'LANG', 'PATH', 'TMPDIR']"
+    assert exists == "False"
+    assert network == "no network"
+
+
+def test_namespace_sandbox_caps_and_reaps_a_fork_bomb(isolated_executor):
+    local, _ = isolated_executor
+    bomb = ("import os, time\n"
+            "forked = 0\n"
+            "try:\n"
+            "    while True:\n"
+            "        if os.fork() == 0:\n"
+            "            os.setsid(); time.sleep(60); os._exit(0)\n"
+            "        forked += 1\n"
+            "except OSError:\n"
+            "    print(forked)\n")
+    result = local.run(bomb, "py")
+    assert result["status"] == "Accepted", result
+    assert int(result["stdout"]) < 32
+    running = subprocess.run(["ps", "-o", "stat=", "-u", "190000"], capture_output=True, text=True).stdout.split()
+    assert all(state.startswith("Z") for state in running)  # killed, waiting for init to reap them
+
+
+def test_namespace_scratch_dir_must_be_outside_hidden_paths(tmp_path):
+    with pytest.raises(ValueError):
+        LocalExecutor(scratch_dir=str(tmp_path / "scratch"), hide_paths=[str(tmp_path)])
+
+
+@pytest.mark.skipif(shutil.which("gcc") is None, reason="gcc not installed")
+def test_local_c_compile_error(local_executor):
+    result = local_executor.run("int main(void) { return }", "c")
+    assert result["status"] == "Compilation Error"
+    assert local_executor.result_cache.stats()["entries"] == 1
+
+
+CLAIM_SCRIPT = """
+import sys
+sys.path.insert(0, {backend!r})
+import sandbox
+print(sandbox.claim_uids({directory!r}, 1000, 4), flush=True)
+sys.stdin.read()
+"""
+
+
+def test_uid_claims_never_overlap_across_processes(tmp_path):
+    from conftest import BACKEND_DIR
+    script = CLAIM_SCRIPT.format(backend=BACKEND_DIR, directory=str(tmp_path))
+
+    def claimant():
+        proc = subprocess.Popen([executor.sys.executable, "-c", script], stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, text=True)
+        return proc, int(proc.stdout.readline())
+
+    procs = [claimant() for _ in range(3)]
+    try:
+        firsts = sorted(first for _, first in procs)
+        assert firsts == [1000, 1004, 1008]
+        # A block is free again once its server process is gone
+        gone, first = procs.pop(1)
+        gone.kill()
+        gone.wait()
+        procs.append(claimant())
+        assert procs[-1][1] == first
+    finally:
+        for proc, _ in procs:
+            proc.kill()
+            proc.wait()
+
+
+EXECUTOR_SCRIPT = """
+import sys
+sys.path.insert(0, {backend!r})
+from executor import LocalExecutor
+local = LocalExecutor(workers=2, scratch_dir={scratch!r}, result_cache_entries=0, sandbox="namespace",
+                      hide_paths={hide!r}, python={python!r}, uid_base=190000)
+local.start()
+uids = {{local.run("import os, time; time.sleep(0.2); print(os.getuid(), {{n}})".format(n=n), "py")["stdout"].split()[0]
+        for n in range(6)}}
+print(" ".join(sorted(uids)), flush=True)
+sys.stdin.read()
+local.shutdown()
+"""
+
+
+def test_executors_in_separate_processes_never_share_a_uid(isolated_executor):
+    from conftest import BACKEND_DIR
+    local, project = isolated_executor
+    script = EXECUTOR_SCRIPT.format(backend=BACKEND_DIR, scratch=local.scratch_dir, hide=[str(project)],
+                                    python=local._sandbox_config["python"])
+    other = subprocess.Popen([executor.sys.executable, "-c", script], stdin=subprocess.PIPE,
+                             stdout=subprocess.PIPE, text=True)
+    try:
+        other_uids = set(other.stdout.readline().split())
+        ours = {local.run(f"import os; print(os.getuid(), {n})", "py")["stdout"].split()[0] for n in range(3)}
+    finally:
+        other.communicate("", timeout=30)
+    assert ours == {"190000"}
+    assert other_uids and other_uids.isdisjoint(ours)
+    assert local.describe()["uids"] == [190000, 190000]
@@ -0,0 +1,135 @@
+import json
+import time
+import socket
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from judge_client import JudgeClient, ConcurrencyLimit
+
+
+class FakeJudge(ThreadingHTTPServer):
+    """Answers each request with the next (status, headers, delay) of a script."""
+
+    daemon_threads = True
+
+    def __init__(self, script):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.script = list(script)
+        self.requests = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _answer(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.server.requests.append((self.command, self.path))
+        status, headers, delay = self.server.script.pop(0) if self.server.script else (200, {}, 0)
+        time.sleep(delay)
+        body = json.dumps({"stdout": "ok", "status": {"description": "Accepted"}}).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _answer
+
+
+@pytest.fixture
+def judge():
+    servers = []
+
+    def start(*script):
+        server = FakeJudge(script)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def client(url, **options):
+    options = dict(dict(retries=2, backoff_base=0.01, read_timeout=0.3, failure_threshold=100), **options)
+    return JudgeClient(url, **options)
+
+
+def test_post_is_not_resent_after_a_read_timeout(judge):
+    server = judge((200, {}, 1.0), (200, {}, 1.0))
+    blocking, asynchronous = client(server.url), client(server.url)
+    assert "error" in blocking.run("print(1)", 71)
+    assert "error" in asyncio.run(asynchronous.run_async("print(1)", 71))
+    # The judge may have accepted each submission: one request apiece
+    assert len(server.requests) == 2
+    assert blocking.stats()["retries"] == asynchronous.stats()["retries"] == 0
+
+
+def test_post_is_resent_only_on_statuses_that_mean_not_processed(judge):
+    server = judge((503, {"Retry-After": "0"}, 0), (429, {"Retry-After": "0"}, 0))
+    assert client(server.url).run("print(1)", 71)["stdout"] == "ok"
+    assert len(server.requests) == 3
+
+    server = judge((503, {}, 0), (200, {}, 0))
+    assert "error" in client(server.url).run("print(1)", 71)
+    assert len(server.requests) == 1
+
+    server = judge((502, {}, 0), (200, {}, 0))
+    assert "error" in asyncio.run(client(server.url).run_async("print(1)", 71))
+    assert len(server.requests) == 1
+
+
+def test_get_is_retried_on_any_retry_status(judge):
+    server = judge((502, {}, 0), (504, {}, 0))
+    c = client(server.url)
+    assert c._request("poll", "GET", "/submissions/x").status_code == 200
+    assert c.stats()["retries"] == 2
+
+
+def test_post_is_resent_when_the_connection_is_refused():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        url = f"http://127.0.0.1:{s.getsockname()[1]}"
+    blocking, asynchronous = client(url), client(url)
+    assert "error" in blocking.run("print(1)", 71)
+    assert "error" in asyncio.run(asynchronous.run_async("print(1)", 71))
+    assert blocking.stats()["retries"] == asynchronous.stats()["retries"] == 2
+
+
+def test_blocking_and_async_calls_share_one_concurrency_budget(judge):
+    server = judge((200, {}, 0.5))
+    c = client(server.url, max_concurrency=1, queue_timeout=0.1, read_timeout=5)
+    blocking = threading.Thread(target=c.run, args=("print(1)", 71))
+    blocking.start()
+    time.sleep(0.2)
+    assert asyncio.run(c.run_async("print(2)", 71)) == {"error": "Judge busy (too many calls in flight)"}
+    blocking.join()
+    assert asyncio.run(c.run_async("print(3)", 71))["stdout"] == "ok"
+
+
+def test_concurrency_limit_wakes_async_waiters_from_threads():
+    limit = ConcurrencyLimit(1)
+    assert limit.acquire(0)
+    assert not limit.acquire(0.01)
+
+    async def wait_for_slot():
+        threading.Timer(0.05, limit.release).start()
+        return await limit.acquire_async(2)
+    assert asyncio.run(wait_for_slot())
+    assert limit.in_use == 1
+
+    async def time_out():
+        return await limit.acquire_async(0.05)
+    assert not asyncio.run(time_out())
+    limit.release()
+    assert limit.in_use == 0
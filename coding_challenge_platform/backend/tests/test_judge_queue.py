@@ -0,0 +1,60 @@
+import os
+import time
+
+from judge_queue import JudgeQueue, DONE, FAILED, QUEUED
+
+
+def make_queue(tmp_path, handler=lambda payload, final: {"ok": payload["n"]}, **options):
+    return JudgeQueue(str(tmp_path / "jobs"), handler, workers=1, retry_base_delay=0.01, **options)
+
+
+def wait_finished(queue, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = queue.status(job_id)
+        if status["state"] in (DONE, FAILED):
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"{job_id} still {status['state']}")
+
+
+def age(queue, job_id, seconds):
+    path = queue._path(job_id)
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_status_is_only_shown_to_the_owner(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.start()
+    job_id = queue.submit({"n": 1}, owner="alice")
+    assert wait_finished(queue, job_id)["result"] == {"ok": 1}
+    assert queue.status(job_id, "alice")["state"] == DONE
+    assert queue.status(job_id, "bob") is None
+    assert queue.status("missing", "alice") is None
+
+
+def test_sweep_deletes_only_old_finished_jobs(tmp_path):
+    queue = make_queue(tmp_path, finished_ttl=60)
+    queue.start()
+    old, recent = queue.submit({"n": 1}), queue.submit({"n": 2})
+    for job_id in (old, recent):
+        wait_finished(queue, job_id)
+    age(queue, old, 120)
+    assert queue.sweep() == 1
+    assert queue.status(old) is None
+    assert queue.status(recent)["state"] == DONE
+    assert queue.stats()["expired"] == 1
+
+
+def test_replay_expires_old_finished_jobs_and_requeues_the_rest(tmp_path):
+    queue = make_queue(tmp_path, finished_ttl=60)
+    os.makedirs(queue.jobs_dir)
+    queue._write({"id": "old", "owner": None, "state": DONE, "attempts": 1, "payload": {}, "result": 1, "error": None})
+    queue._write({"id": "left", "owner": None, "state": QUEUED, "attempts": 0, "payload": {"n": 3},
+                  "result": None, "error": None})
+    age(queue, "old", 120)
+    age(queue, "left", 120)  # unfinished jobs are replayed however old
+    queue.start()
+    assert queue.status("old") is None
+    assert wait_finished(queue, "left")["result"] == {"ok": 3}
@@ -0,0 +1,136 @@
+import time
+import threading
+
+from events import EventLog
+from leaderboard import Leaderboard, round_points
+
+
+def scores(storage, *rows):
+    for username, round_name, fields in rows:
+        storage.upsert_score(username, round_name, fields)
+
+
+def test_round_points_uses_mcq_percentage():
+    assert round_points("MCQ", {"score": 7, "percentage": 70.0}) == 70.0
+    assert round_points("Scramble", {"score": 42}) == 42.0
+    assert round_points("Debugging", {}) == 0.0
+
+
+def test_order_and_tie_break_on_remaining_time(sqlite_storage):
+    scores(sqlite_storage,
+           ("alice", "Scramble", {"score": 50, "remaining_time": 10}),
+           ("bob", "Scramble", {"score": 50, "remaining_time": 30}),
+           ("carol", "MCQ", {"score": 9, "percentage": 90.0}))
+    board = Leaderboard(sqlite_storage)
+    assert [row["username"] for row in board.top()] == ["carol", "bob", "alice"]
+    assert board.rank("alice")["rank"] == 3
+    assert board.rank("nobody") is None
+
+
+def test_update_is_incremental(sqlite_storage):
+    board = Leaderboard(sqlite_storage)
+    board.rebuild()
+    board.update("alice", "Scramble", {"score": 20})
+    board.update("alice", "Debugging", {"score": 30})
+    board.update("bob", "Scramble", {"score": 40})
+    assert [(row["username"], row["total"]) for row in board.top()] == [("alice", 50.0), ("bob", 40.0)]
+    # Re-scoring a round replaces it rather than adding to it
+    board.update("alice", "Scramble", {"score": 0})
+    assert [row["username"] for row in board.top()] == ["bob", "alice"]
+
+
+def test_readers_never_rebuild(sqlite_storage):
+    board = Leaderboard(sqlite_storage, max_age=0)
+    board.rebuild()
+    calls = []
+    real = sqlite_storage.scores_by_user
+    sqlite_storage.scores_by_user = lambda rounds: calls.append(rounds) or real(rounds)
+    for _ in range(20):
+        board.top()
+        board.rank("alice")
+    assert calls == []
+
+
+def test_cold_start_loads_once_for_concurrent_readers(sqlite_storage):
+    scores(sqlite_storage, ("alice", "Scramble", {"score": 10}))
+    board = Leaderboard(sqlite_storage, max_age=60)
+    calls = []
+    real = sqlite_storage.scores_by_user
+
+    def slow(rounds):
+        calls.append(rounds)
+        time.sleep(0.2)
+        return real(rounds)
+    sqlite_storage.scores_by_user = slow
+    results = []
+    readers = [threading.Thread(target=lambda: results.append(board.top())) for _ in range(8)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    board.stop()
+    assert len(calls) == 1
+    assert all(result == [results[0][0]] for result in results)
+
+
+def test_failed_refresh_keeps_last_copy(sqlite_storage):
+    scores(sqlite_storage, ("alice", "Scramble", {"score": 10}))
+    board = Leaderboard(sqlite_storage, max_age=0.05)
+    board.rebuild()
+
+    def broken(rounds):
+        raise RuntimeError("storage down")
+    sqlite_storage.scores_by_user = broken
+    board.start()
+    time.sleep(0.2)
+    board.stop()
+    assert board.stats()["rebuild_errors"] >= 1
+    assert [row["username"] for row in board.top()] == ["alice"]
+
+
+def test_background_refresh_picks_up_other_writers(sqlite_storage):
+    board = Leaderboard(sqlite_storage, max_age=0.05)
+    board.start()
+    assert board.top() == []
+    # Written by "another worker": straight to storage, not through update()
+    scores(sqlite_storage, ("bob", "Debugging", {"score": 70}))
+    deadline = time.monotonic() + 5
+    while not board.top() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    board.stop()
+    assert [row["username"] for row in board.top()] == ["bob"]
+
+
+def test_buffered_writes_count_after_rebuild(sqlite_storage):
+    unflushed = [["alice", "Scramble", {"score": 20}], ["alice", "Scramble", {"score": 35}]]
+    board = Leaderboard(sqlite_storage, unflushed=lambda: list(unflushed))
+    board.rebuild()
+    assert board.rank("alice")["total"] == 35.0
+
+
+def test_events_from_other_workers_update_incrementally(sqlite_storage):
+    scores(sqlite_storage, ("alice", "Scramble", {"score": 10}))
+    board = Leaderboard(sqlite_storage, max_age=60)
+    log = EventLog(sqlite_storage)
+    log.add_listener(board.apply_events)
+    board.start()
+    board.top()
+    log._poll()
+    calls = []
+    real = sqlite_storage.scores_by_user
+    sqlite_storage.scores_by_user = lambda rounds: calls.append(rounds) or real(rounds)
+    # Published by another worker, whose write is still buffered there
+    log.publish("score", {"username": "bob", "round": "Debugging", "score": 70, "remaining_time": 5})
+    log._poll()
+    assert [row["username"] for row in board.top()] == ["bob", "alice"]
+    assert calls == []
+
+    # All scores deleted on another worker: a reset reloads from storage
+    sqlite_storage.delete_scores()
+    log.publish("reset", {})
+    log._poll()
+    deadline = time.monotonic() + 5
+    while board.top() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    board.stop()
+    assert board.top() == [] and len(calls) >= 1
@@ -0,0 +1,126 @@
+import pytest
+
+import mcq_grader
+from mcq_grader import AnswerKey, UNANSWERED, NO_KEY, answers_list, option_text, regrade
+
+
+def question(qid, options, correct):
+    return {"id": qid, **dict(zip(mcq_grader.OPTION_FIELDS, options)), "correct_answer": correct}
+
+
+QUESTIONS = [
+    question(1, ["Paris", "Rome", "Oslo", "Bern"], "Paris"),
+    question(2, [1.0, 2.0, 3.0, 4.0], 2.0),           # numeric cells from the sheet
+    question(3, ["int", "str", "list", "dict"], "C"),  # correct given as a letter
+    question(4, ["yes", "no", None, None], "Option B"),
+    question(5, ["a", "b", "c", "d"], "e"),            # no usable answer
+]
+
+
+@pytest.fixture
+def key():
+    return AnswerKey(QUESTIONS)
+
+
+def test_option_text():
+    assert option_text(2.0) == "2"
+    assert option_text(2.5) == "2.5"
+    assert option_text("  Paris ") == "Paris"
+    assert option_text(None) == ""
+
+
+def test_answer_key_resolves_text_letters_and_missing_answers(key):
+    assert key.correct == [0, 1, 2, 1, NO_KEY]
+
+
+def test_encode_matches_option_text(key):
+    row = key.encode([["1", "Paris"], [2, "2"], ["3", "tuple"], ["99", "Paris"]])
+    # Unknown question ids are ignored, text that matches no option is unanswered
+    assert row == [0, 1, UNANSWERED, UNANSWERED, UNANSWERED]
+
+
+def test_grade(key):
+    fields = key.grade([["1", "Paris"], ["2", "2"], ["3", "list"], ["4", "yes"], ["5", "e"]])
+    assert fields["score"] == 3
+    assert fields["percentage"] == 60.0
+    assert fields["total_questions"] == 5
+    assert fields["answer_key"] == key.digest
+
+
+def test_nobody_scores_a_question_without_an_answer(key):
+    # NO_KEY never equals an encoded answer, not even an unanswered one
+    assert key.grade([])["score"] == 0
+
+
+def test_digest_changes_with_the_key_only(key):
+    assert AnswerKey(QUESTIONS).digest == key.digest
+    corrected = list(QUESTIONS)
+    corrected[0] = question(1, ["Paris", "Rome", "Oslo", "Bern"], "Rome")
+    assert AnswerKey(corrected).digest != key.digest
+
+
+def test_grade_many_matches_grade_with_and_without_numpy(key, monkeypatch):
+    attempts = [
+        [["1", "Paris"], ["2", "2"], ["3", "list"], ["4", "no"]],
+        [["1", "Rome"], ["3", "list"]],
+        [],
+    ]
+    expected = [key.grade(a)["score"] for a in attempts]
+    assert key.grade_many(attempts) == expected == [4, 1, 0]
+    monkeypatch.setattr(mcq_grader, "np", None)
+    assert AnswerKey(QUESTIONS).grade_many(attempts) == expected
+    assert key.grade_many([]) == []
+
+
+def test_answers_list():
+    assert answers_list({2: 2.0, "1": " Paris ", "3": None}) == [["1", "Paris"], ["2", "2"]]
+    with pytest.raises(ValueError):
+        answers_list([["1", "Paris"]])
+
+
+def test_regrade_writes_only_changed_attempts(sqlite_storage, key):
+    right = answers_list({"1": "Paris", "2": "2"})
+    wrong = answers_list({"1": "Rome", "2": "2"})
+    for username, answers in (("alice", right), ("bob", wrong)):
+        sqlite_storage.upsert_score(username, "MCQ", {"answers": answers, **key.grade(answers)})
+    sqlite_storage.upsert_score("carol", "MCQ", {"score": 5})  # from before answers were stored
+
+    result = regrade(sqlite_storage, key)
+    assert (result["attempts"], result["changed"], result["skipped"]) == (2, 0, 1)
+
+    corrected = list(QUESTIONS)
+    corrected[0] = question(1, ["Paris", "Rome", "Oslo", "Bern"], "Rome")
+    new_key = AnswerKey(corrected)
+    result = regrade(sqlite_storage, new_key)
+    # Everyone's answer_key digest changes; scores swap for question 1
+    assert result["changed"] == 2
+    scores = {doc["username"]: doc for doc in sqlite_storage.find_scores(round_name="MCQ")}
+    assert (scores["alice"]["score"], scores["bob"]["score"]) == (1, 2)
+    assert scores["bob"]["answer_key"] == new_key.digest
+    assert scores["bob"]["answers"] == wrong
+    assert scores["carol"] == {"username": "carol", "round": "MCQ", "score": 5}
+    assert regrade(sqlite_storage, new_key)["changed"] == 0
+
+
+def test_regrade_leaves_attempts_submitted_meanwhile(sqlite_storage, key):
+    old = answers_list({"1": "Rome", "2": "2"})
+    sqlite_storage.upsert_score("alice", "MCQ", {"answers": old, **key.grade(old)})
+    corrected = list(QUESTIONS)
+    corrected[0] = question(1, ["Paris", "Rome", "Oslo", "Bern"], "Rome")
+    new_key = AnswerKey(corrected)
+
+    find_scores = sqlite_storage.find_scores
+
+    def find_then_resubmit(**kwargs):
+        docs = list(find_scores(**kwargs))
+        # alice submits again after the regrade has read her old answers
+        new = answers_list({"1": "Paris", "2": "2"})
+        sqlite_storage.upsert_score("alice", "MCQ", {"answers": new, **new_key.grade(new)})
+        return docs
+    sqlite_storage.find_scores = find_then_resubmit
+    result = regrade(sqlite_storage, new_key)
+    assert (result["changed"], result["resubmitted"]) == (0, 1)
+    del sqlite_storage.find_scores
+    (doc,) = sqlite_storage.find_scores(round_name="MCQ")
+    assert doc["answers"] == answers_list({"1": "Paris", "2": "2"})
+    assert doc["score"] == 1
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import subprocess
+import multiprocessing
+
+import pytest
+
+from storage import create_storage
+from score_writer import ScoreWriter, CLEARED_ACK
+
+
+def stored(storage):
+    return {(doc["username"], doc["round"]): doc for doc in storage.find_scores()}
+
+
+def test_writes_coalesce_and_flush(sqlite_storage, tmp_path):
+    writer = ScoreWriter(sqlite_storage, str(tmp_path / "journal"), flush_interval=60, fsync=False)
+    writer.start()
+    writer.write("alice", "MCQ", {"score": 1})
+    writer.write("alice", "MCQ", {"score": 2, "percentage": 20.0})
+    assert stored(sqlite_storage) == {}
+    assert writer.overlay([], writer.unflushed()) == [{"username": "alice", "round": "MCQ", "score": 2,
+                                                      "percentage": 20.0}]
+    assert writer.flush() == 1
+    doc = stored(sqlite_storage)[("alice", "MCQ")]
+    assert (doc["score"], doc["percentage"]) == (2, 20.0)
+    assert writer.stats()["coalesced"] == 1
+    assert not any(name.endswith(".segment") for name in os.listdir(writer.journal_dir))
+
+
+def orphan(root, pid, *entries):
+    path = os.path.join(root, str(pid))
+    os.makedirs(path)
+    with open(os.path.join(path, "scores.1.segment"), "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+        f.write('["torn')
+
+
+def dead_pid():
+    proc = subprocess.Popen(["true"])
+    proc.wait()
+    return proc.pid
+
+
+def test_orphans_replay_only_what_storage_lacks(sqlite_storage, tmp_path):
+    root = str(tmp_path / "journal")
+    now = time.time()
+    # Flushed by the dead worker, then overwritten by a newer write elsewhere
+    sqlite_storage.upsert_score("alice", "MCQ", {"score": 9, "written_at": now})
+    orphan(root, dead_pid(),
+           ["alice", "MCQ", {"score": 1, "written_at": now - 10}],
+           ["bob", "MCQ", {"score": 5, "written_at": now - 10}],
+           ["bob", "MCQ", {"score": 6, "written_at": now - 5}])
+    writer = ScoreWriter(sqlite_storage, root, flush_interval=60, fsync=False)
+    writer.start()
+    writer.flush()
+    scores = stored(sqlite_storage)
+    assert scores[("alice", "MCQ")]["score"] == 9
+    assert scores[("bob", "MCQ")]["score"] == 6
+    assert sorted(os.listdir(root)) == [str(os.getpid())]
+
+
+def test_orphans_written_before_a_clear_are_dropped(sqlite_storage, tmp_path):
+    root = str(tmp_path / "journal")
+    os.makedirs(root)
+    written_at = time.time()
+    # Another worker deletes all scores, then this one starts
+    ScoreWriter(sqlite_storage, root).clear()
+    orphan(root, dead_pid(), ["bob", "MCQ", {"score": 5, "written_at": written_at}])
+    writer = ScoreWriter(sqlite_storage, root, flush_interval=60, fsync=False)
+    writer.start()
+    assert writer.flush() == 0
+    assert stored(sqlite_storage) == {}
+
+
+def test_delete_keeps_rows_written_after_the_clear(sqlite_storage, tmp_path):
+    writer = ScoreWriter(sqlite_storage, str(tmp_path / "journal"), flush_interval=60, fsync=False)
+    writer.start()
+    writer.write("alice", "MCQ", {"score": 1})
+    writer.flush()
+    sqlite_storage.upsert_score("carol", "MCQ", {"score": 4})  # not through a writer: no stamp
+    cutoff = writer.clear()
+    writer.write("bob", "MCQ", {"score": 2})
+    writer.flush()
+    sqlite_storage.delete_scores(written_before=cutoff)
+    assert list(stored(sqlite_storage)) == [("bob", "MCQ")]
+
+
+def test_clear_waits_for_running_writers(sqlite_storage, tmp_path):
+    root = str(tmp_path / "journal")
+    writer = ScoreWriter(sqlite_storage, root, flush_interval=60, fsync=False)
+    writer.start()
+    peer = subprocess.Popen(["sleep", "30"])
+    try:
+        os.makedirs(os.path.join(root, str(peer.pid)))
+        with pytest.raises(TimeoutError):
+            writer.clear(timeout=0.2)
+        with open(os.path.join(root, str(peer.pid), CLEARED_ACK), "w") as f:
+            f.write(repr(time.time() + 60))
+        writer.clear(timeout=5)
+    finally:
+        peer.kill()
+        peer.wait()
+
+
+def _peer_worker(db_path, root, written, stop):
+    storage = create_storage("sqlite", path=db_path)
+    writer = ScoreWriter(storage, root, flush_interval=0.05, max_batch=10 ** 6, fsync=False)
+    writer.start()
+    # Keep the write buffered until the other worker has deleted everything
+    writer.storage = type("Stalled", (), {"bulk_upsert_scores": lambda self, batch: time.sleep(0.2) or
+                                          storage.bulk_upsert_scores(batch)})()
+    writer.write("alice", "MCQ", {"score": 7})
+    written.set()
+    stop.wait(10)
+    writer.flush()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_delete_all_clears_other_workers_buffers(tmp_path):
+    db_path, root = str(tmp_path / "scores.db"), str(tmp_path / "journal")
+    storage = create_storage("sqlite", path=db_path)
+    storage.ensure_indexes()
+    ctx = multiprocessing.get_context("fork")
+    written, stop = ctx.Event(), ctx.Event()
+    peer = ctx.Process(target=_peer_worker, args=(db_path, root, written, stop))
+    peer.start()
+    try:
+        assert written.wait(10)
+        writer = ScoreWriter(storage, root, flush_interval=60, fsync=False)
+        writer.start()
+        storage.delete_scores(written_before=writer.clear(timeout=10))
+    finally:
+        stop.set()
+        peer.join(10)
+    assert stored(storage) == {}
+
+
+def _buffering_worker(db_path, root, written, stop):
+    writer = ScoreWriter(create_storage("sqlite", path=db_path), root, flush_interval=60, fsync=False)
+    writer.start()
+    writer.write("alice", "Scramble", {"score": 3})
+    writer.write("bob", "Scramble", {"score": 4})
+    written.set()
+    stop.wait(10)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_reads_see_writes_buffered_in_other_workers(tmp_path):
+    db_path, root = str(tmp_path / "scores.db"), str(tmp_path / "journal")
+    storage = create_storage("sqlite", path=db_path)
+    storage.ensure_indexes()
+    ctx = multiprocessing.get_context("fork")
+    written, stop = ctx.Event(), ctx.Event()
+    peer = ctx.Process(target=_buffering_worker, args=(db_path, root, written, stop))
+    peer.start()
+    try:
+        assert written.wait(10)
+        writer = ScoreWriter(storage, root, flush_interval=60, fsync=False)
+        writer.start()
+        writer.write("alice", "MCQ", {"score": 1})
+        # A newer score already in storage wins over the peer's buffered one
+        storage.upsert_score("bob", "Scramble", {"score": 9, "written_at": time.time()})
+        writes = writer.unflushed("alice")
+        docs = writer.overlay(list(storage.find_scores(username="alice")), writes)
+        assert sorted(docs, key=lambda doc: doc["round"]) == [
+            {"username": "alice", "round": "MCQ", "score": 1},
+            {"username": "alice", "round": "Scramble", "score": 3},
+        ]
+        docs = writer.overlay(list(storage.find_scores(username="bob")), writer.unflushed("bob"))
+        assert docs == [{"username": "bob", "round": "Scramble", "score": 9}]
+    finally:
+        stop.set()
+        peer.join(10)
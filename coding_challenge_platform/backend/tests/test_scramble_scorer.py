@@ -0,0 +1,81 @@
+import random
+
+from scramble_scorer import (normalize_lines, match_positions, longest_increasing_subsequence,
+                             count_inversions, score_scramble)
+
+ORIGINAL = "def add(a, b):\n    total = a + b\n    return total\n\nprint(add(1, 2))\n"
+
+
+def brute_inversions(seq):
+    return sum(1 for i in range(len(seq)) for j in range(i + 1, len(seq)) if seq[i] > seq[j])
+
+
+def test_normalize_lines_collapses_whitespace_and_drops_blanks():
+    assert normalize_lines("  a  =  1\n\n\t\nb=2  \r\n") == ["a = 1", "b=2"]
+    assert normalize_lines(None) == []
+
+
+def test_exact_reconstruction_scores_one():
+    result = score_scramble(ORIGINAL, ORIGINAL)
+    assert result["similarity"] == 1.0
+    assert result["order_score"] == 1.0
+    assert result["inversions"] == 0
+    assert result["matched_lines"] == result["original_lines"] == 4
+
+
+def test_whitespace_and_blank_lines_are_ignored():
+    reindented = "def add(a,  b):\n\n        total = a + b\n  return total\nprint(add(1, 2))   \n"
+    assert score_scramble(ORIGINAL, reindented)["similarity"] == 1.0
+
+
+def test_reversed_order_keeps_one_line_in_order():
+    lines = ORIGINAL.splitlines()
+    result = score_scramble(ORIGINAL, "\n".join(reversed(lines)))
+    assert result["in_order_lines"] == 1
+    assert result["similarity"] == 0.25
+    assert result["order_score"] == 0.0
+    assert result["inversions"] == 6
+
+
+def test_missing_and_extra_lines_both_cost():
+    missing = "def add(a, b):\n    total = a + b\n    return total\n"
+    assert score_scramble(ORIGINAL, missing)["similarity"] == 0.75
+    extra = ORIGINAL + "print('extra')\nprint('more')\n"
+    result = score_scramble(ORIGINAL, extra)
+    assert result["similarity"] == 4 / 6
+    assert result["matched_lines"] == 4
+
+
+def test_duplicate_lines_are_matched_in_original_order():
+    original = "x = 1\ny = 2\nx = 1\n"
+    assert match_positions(normalize_lines(original), ["x = 1", "x = 1", "y = 2"]) == [0, 2, 1]
+    # A student line repeated more often than in the original only matches once per copy
+    assert match_positions(["a", "b"], ["a", "a", "b"]) == [0, 1]
+    assert score_scramble(original, original)["similarity"] == 1.0
+
+
+def test_empty_programs():
+    assert score_scramble("", "")["similarity"] == 1.0
+    assert score_scramble(ORIGINAL, "")["similarity"] == 0.0
+    assert score_scramble("", "print(1)\n")["similarity"] == 0.0
+    assert score_scramble(ORIGINAL, None)["submitted_lines"] == 0
+
+
+def test_unknown_lines_only():
+    result = score_scramble(ORIGINAL, "import os\nimport sys\n")
+    assert result["matched_lines"] == 0
+    assert result["similarity"] == 0.0
+    assert result["order_score"] == 1.0
+
+
+def test_lis_and_inversions_match_brute_force():
+    rng = random.Random(5)
+    for _ in range(200):
+        seq = rng.sample(range(50), rng.randint(0, 12))
+        assert count_inversions(seq) == brute_inversions(seq)
+        best = 0
+        for mask in range(1 << len(seq)):
+            picked = [x for i, x in enumerate(seq) if mask >> i & 1]
+            if all(a < b for a, b in zip(picked, picked[1:])):
+                best = max(best, len(picked))
+        assert longest_increasing_subsequence(seq) == best
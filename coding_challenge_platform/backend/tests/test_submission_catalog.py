@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from blob_store import BlobStore
+from submission_catalog import SubmissionCatalog, SCRAMBLE, guess_username
+
+
+@pytest.fixture
+def catalog(sqlite_storage, tmp_path):
+    root = tmp_path / "uploads"
+    return SubmissionCatalog(sqlite_storage, str(root), blobs=BlobStore(str(root / "blobs")))
+
+
+def write(catalog, path, text):
+    full_path = os.path.join(catalog.upload_root, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def paths(storage):
+    docs, _ = storage.query_submissions()
+    return sorted(doc["path"] for doc in docs)
+
+
+def test_guess_username_prefers_the_longest_known_user():
+    assert guess_username("ann_lee_p1_0001.py", {"ann", "ann_lee"}) == "ann_lee"
+    assert guess_username("bob_p1_0001.py", set()) == "bob"
+
+
+def test_rebuild_catalogs_files_and_forgets_deleted_ones(catalog, sqlite_storage):
+    write(catalog, "scramble_submissions/py/alice_p1_1.py", "a = 1\n")
+    write(catalog, "scramble_submissions/py/bob_p1_1.py", "b = 1\n")
+    catalog.save("carol", SCRAMBLE, "scramble_submissions/py/carol_p1_1.py", "c = 1\n", language="py")
+    assert catalog.rebuild() == 2
+    assert len(paths(sqlite_storage)) == 3
+
+    os.remove(os.path.join(catalog.upload_root, "scramble_submissions/py/bob_p1_1.py"))
+    catalog.rebuild()
+    # The blob-backed entry has no file in the tree but keeps its content
+    assert paths(sqlite_storage) == ["scramble_submissions/py/alice_p1_1.py",
+                                     "scramble_submissions/py/carol_p1_1.py"]
+
+
+def test_submission_recorded_during_rebuild_is_kept(catalog, sqlite_storage):
+    write(catalog, "scramble_submissions/py/alice_p1_1.py", "a = 1\n")
+    scan = catalog.scan_upload_tree
+
+    def scan_with_submit(*args):
+        for entry in scan(*args):
+            # A student submits while the backfill walks the tree
+            catalog.save("dave", SCRAMBLE, "scramble_submissions/py/dave_p1_1.py", "d = 1\n", language="py")
+            yield entry
+    catalog.scan_upload_tree = scan_with_submit
+    catalog.rebuild()
+    assert "scramble_submissions/py/dave_p1_1.py" in paths(sqlite_storage)
+    digest = sqlite_storage.get_submission("scramble_submissions/py/dave_p1_1.py")["sha256"]
+    assert sqlite_storage.blob_refs(digest) == 1
+
+
+def test_forget_skips_paths_saved_again(catalog, sqlite_storage):
+    old = catalog.save("erin", SCRAMBLE, "x/erin.py", "old\n")
+    new = catalog.save("erin", SCRAMBLE, "x/erin.py", "new\n")
+    # Read before the resubmit: must not drop the new entry
+    sqlite_storage.forget_submissions([("x/erin.py", old["sha256"])])
+    assert sqlite_storage.get_submission("x/erin.py")["sha256"] == new["sha256"]
+    sqlite_storage.forget_submissions([("x/erin.py", new["sha256"])])
+    assert paths(sqlite_storage) == []
+    assert sqlite_storage.blob_refs(new["sha256"]) == 0
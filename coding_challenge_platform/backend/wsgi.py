@@ -0,0 +1,41 @@
+"""Production entry point: ``gunicorn -c gunicorn.conf.py wsgi:app``.
+
+With preload_app (the default in gunicorn.conf.py) this module is imported
+once in the gunicorn master, so folders/indexes are set up and the question
+bank, code files and frontend build are loaded a single time before the
+workers are forked.
+"""
+import os
+
+# Production refuses to start without SESSION_SECRET (see app.py)
+os.environ.setdefault("SESSION_SECRET_REQUIRED", "1")
+
+_app = None
+
+
+def create_app():
+    """Import the app, initialize storage once and warm the shared caches."""
+    global _app
+    if _app is not None:
+        return _app
+
+    import app as app_module
+
+    app_module.init_db()
+    app_module.warm_caches()
+
+    # Connections must not be shared across fork; both backends reconnect
+    # lazily in each worker
+    if app_module.storage is not None:
+        app_module.storage.close()
+
+    # Outside gunicorn (e.g. another WSGI server) nobody calls post_fork,
+    # so start the background services here
+    if os.environ.get("SERVER_SOFTWARE", "").split("/")[0] != "gunicorn":
+        app_module.start_background_services()
+
+    _app = app_module.app
+    return _app
+
+
+app = create_app()